@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""Exports badger.sqlite3 tracking observations to a columnar archive,
+and answers questions about them without touching SQLite.
+
+For example:
+
+    ./archive.py export
+    ./archive.py prevalence --days 365 --no-blocking --daily
+    ./archive.py seen doubleclick.net
+    ./archive.py cooccur doubleclick.net --days 30
+"""
+
+import argparse
+import sqlite3
+import sys
+
+from datetime import datetime, timedelta
+
+from lib.archive import Archive, export
+
+
+def create_argument_parser():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    ap.add_argument('--db', default="badger.sqlite3",
+                    help="path to the database to export")
+    ap.add_argument('--archive', default="badger.archive",
+                    help="path to the archive directory")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--days', type=int, default=None,
+                         help="limit to scans started in the last DAYS days")
+    filters.add_argument('--browser', action='append', default=None,
+                         help="limit to scans in this browser (repeatable)")
+    filters.add_argument('--no-blocking', action='store_true', default=None,
+                         help="limit to --no-blocking mode scans")
+    filters.add_argument('--daily', action='store_true', default=None,
+                         help="limit to daily (not distributed) scans")
+    filters.add_argument('--limit', type=int, default=40,
+                         help="number of results to show")
+
+    commands = ap.add_subparsers(dest='command', required=True)
+    commands.add_parser('export', help="export new scans from the database")
+    prevalence = commands.add_parser('prevalence', parents=[filters],
+                                     help="most prevalent trackers")
+    prevalence.add_argument('--type', default=None,
+                            help="limit to this tracking type, for example canvas")
+    seen = commands.add_parser('seen', parents=[filters],
+                               help="when trackers were first and last seen")
+    seen.add_argument('trackers', nargs='+')
+    cooccur = commands.add_parser('cooccur', parents=[filters],
+                                  help="trackers seen alongside a tracker")
+    cooccur.add_argument('tracker')
+
+    return ap
+
+
+def scan_filters(args):
+    return {
+        "since": datetime.now() - timedelta(days=args.days) if args.days else None,
+        "browsers": args.browser,
+        "no_blocking": args.no_blocking,
+        "daily_scan": args.daily,
+    }
+
+
+def main():
+    args = create_argument_parser().parse_args()
+
+    if args.command == 'export':
+        with sqlite3.connect(args.db, detect_types=sqlite3.PARSE_DECLTYPES) as db:
+            num_scans = export(db.cursor(), args.archive)
+        print(f"Exported {num_scans} new scans to {args.archive}")
+        return
+
+    archive = Archive(args.archive)
+
+    if args.command == 'prevalence':
+        filters = scan_filters(args)
+        total_sites = archive.total_sites(**filters)
+        if not total_sites:
+            print("No scans found for selected filters", file=sys.stderr)
+            return
+        for base, num_sites in archive.prevalence(
+                limit=args.limit, tracking_type=args.type, **filters):
+            print(f"  {total_sites}  {num_sites:>6}  "
+                  f"{round(num_sites / total_sites, 2):.2f}  {base}")
+
+    elif args.command == 'seen':
+        seen = archive.first_last_seen(args.trackers, **scan_filters(args))
+        for base in args.trackers:
+            if base not in seen:
+                print(f"  {base} not found", file=sys.stderr)
+                continue
+            first, last = seen[base]
+            print(f"  {first}  {last}  {base}")
+
+    elif args.command == 'cooccur':
+        for base, num_sites in archive.co_occurrence(
+                args.tracker, limit=args.limit, **scan_filters(args)):
+            print(f"  {num_sites:>6}  {base}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""Compares lib.basedomain to tldextract on synthetic hostnames.
+
+Both use the PSL snapshot bundled with tldextract.
+
+Usage: python -m benchmarks.basedomain [--num-hostnames N]
+"""
+
+import argparse
+import pkgutil
+import random
+import time
+
+import tldextract
+
+from tldextract.suffix_list import extract_tlds_from_suffix_list
+
+from lib import basedomain
+
+
+def generate_hostnames(num_hostnames, seed=1):
+    """Returns hostnames with a crawl-like mix of suffixes and repeats."""
+    rng = random.Random(seed)
+    snapshot = pkgutil.get_data("tldextract", ".tld_set_snapshot").decode('utf-8')
+    public_suffixes, private_suffixes = extract_tlds_from_suffix_list(snapshot)
+    suffixes = [suffix.lstrip("!*.") for suffix in public_suffixes + private_suffixes]
+    common = ["com", "net", "org", "co.uk", "de", "io", "com.br", "co.jp"]
+
+    sites = [f"site{i}.{rng.choice(common) if rng.random() < 0.8 else rng.choice(suffixes)}"
+             for i in range(num_hostnames // 10)]
+    subdomains = ["", "www.", "cdn.", "static.", "api.", "a.b.", "pixel.tracker."]
+
+    # half popular sites, half long tail
+    return [rng.choice(subdomains) + (
+        sites[int(rng.paretovariate(1)) % len(sites)] if rng.random() < 0.5
+        else rng.choice(sites)) for _ in range(num_hostnames)]
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--num-hostnames', type=int, default=1_000_000,
+                    help="number of hostnames to look up")
+    args = ap.parse_args()
+
+    hostnames = generate_hostnames(args.num_hostnames)
+    print(f"{len(hostnames)} hostnames ({len(set(hostnames))} distinct)")
+
+    reference = tldextract.TLDExtract(
+        cache_dir=False, suffix_list_urls=None, include_psl_private_domains=True)
+    reference("example.com")
+    start = time.perf_counter()
+    expected = [reference(hostname).registered_domain for hostname in hostnames]
+    print(f"  tldextract: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    # pylint: disable-next=protected-access
+    basedomain._psl = basedomain.compile_psl(
+        pkgutil.get_data("tldextract", ".tld_set_snapshot").decode('utf-8'))
+    print(f"  trie compilation: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    bases = [basedomain.extract(hostname).registered_domain for hostname in hostnames]
+    print(f"  extract(): {time.perf_counter() - start:.2f}s")
+    assert bases == expected
+
+    basedomain.extract.cache_clear()
+    start = time.perf_counter()
+    bases = basedomain.registered_domains(hostnames)
+    print(f"  registered_domains(): {time.perf_counter() - start:.2f}s")
+    assert bases == expected
+
+
+if __name__ == "__main__":
+    main()
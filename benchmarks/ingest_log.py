@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""Measures initdb.ingest_log throughput.
+
+Usage: python -m benchmarks.ingest_log [LOG_TXT] [--repeat N]
+"""
+
+import argparse
+import sqlite3
+import time
+
+from datetime import datetime
+
+import initdb
+
+from lib.basedomain import extract
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('log_path', nargs='?', default="log.txt",
+                    help="scan log to ingest")
+    ap.add_argument('--repeat', type=int, default=10,
+                    help="number of times to ingest the log")
+    args = ap.parse_args()
+
+    with open(args.log_path, encoding="utf-8") as f:
+        lines = f.readlines()
+    num_bytes = sum(len(line) for line in lines)
+
+    # load the PSL ahead of time
+    extract("example.com")
+
+    sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+
+    with sqlite3.connect(":memory:") as db:
+        cur = db.cursor()
+        initdb.create_tables(cur)
+
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            initdb.ingest_log(cur, i + 1, lines)
+        elapsed = time.perf_counter() - start
+
+        cur.execute("SELECT COUNT(*) FROM scan_sites")
+        num_rows = cur.fetchone()[0]
+
+    print(f"Ingested {len(lines) * args.repeat} lines "
+          f"({num_rows} site visits) in {elapsed:.2f}s")
+    print(f"  {len(lines) * args.repeat / elapsed:,.0f} lines/s")
+    print(f"  {num_bytes * args.repeat / elapsed / 1024 / 1024:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+
+"""Crawls a local synthetic web, for measuring crawler throughput
+offline and reproducibly.
+
+Serves a seeded population of first-party sites that embed third-party
+trackers, where every tracker either sets cookies, fingerprints canvas,
+or gets first-party cookies shared with it through pixel URLs. There are
+also harmless third-party hosts, which should never get learned. All
+sites and trackers are served by one local HTTP server. The browser gets
+pointed at it with crawler.py --resolve-to: host resolver rules for
+Chrome, and the server doubling as an HTTP proxy for Firefox.
+
+Runs crawler.py with --webdriver-stats against a generated --site-list,
+then reports sites/hour, per-phase WebDriver timings, and how much of
+the known tracking ended up in snitch_map. Compare runs with different
+crawler arguments (for example, -- --link-navigation direct) to see
+whether a change costs tracker yield.
+
+Usage: python -m benchmarks.offline_crawl BROWSER [--num-sites N] [...]
+    [-- CRAWLER_ARGS]
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+BEHAVIORS = ("cookie", "canvas", "pixel")
+
+# per-site crawler log lines, after the timestamp
+_LOG_PREFIX = r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d+ "
+LOG_VISITED_RE = re.compile(_LOG_PREFIX + r"Visited (\S+)(?: on |$)")
+LOG_ERROR_RE = re.compile(_LOG_PREFIX + r"(?:Timed out loading|Error loading|"
+                          r"\w+(?:Exception|Error) (?:on|loading)) (?!extension page)")
+LOG_LINK_RE = re.compile(_LOG_PREFIX + r"(?:Clicking on|Navigating to) ")
+
+PIXEL_GIF = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00"
+             b"\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;")
+
+CANVAS_JS = """(function () {
+  let canvas = document.createElement("canvas");
+  canvas.width = 220;
+  canvas.height = 30;
+  let ctx = canvas.getContext("2d");
+  ctx.textBaseline = "top";
+  ctx.font = "14px 'Arial'";
+  ctx.fillStyle = "#f60";
+  ctx.fillRect(125, 1, 62, 20);
+  ctx.fillStyle = "#069";
+  ctx.fillText("Badger Sett benchmark, 1.0", 2, 15);
+  window.bsbenchFingerprint = canvas.toDataURL();
+}());
+"""
+
+BENIGN_JS = "document.documentElement.dataset.benign = 'yes';\n"
+
+
+class SyntheticWeb:
+    """Sites and the trackers they embed, with the snitch_map
+    Privacy Badger should learn from visiting them."""
+
+    def __init__(self, num_sites, num_trackers, trackers_per_site=3,
+                 num_benign=5, seed=1):
+        rng = random.Random(seed)
+        self.sites = [f"bsbench-site{i}.com" for i in range(num_sites)]
+        self.trackers = {f"bsbench-tracker{i}.net": BEHAVIORS[i % len(BEHAVIORS)]
+                         for i in range(num_trackers)}
+        self.benign = [f"bsbench-cdn{i}.org" for i in range(num_benign)]
+
+        # popular trackers are on more sites
+        trackers = list(self.trackers)
+        weights = [1 / (rank + 1) for rank in range(len(trackers))]
+        self.embeds = {}
+        for site in self.sites:
+            embeds = set()
+            while len(embeds) < min(trackers_per_site, len(trackers)):
+                embeds.add(rng.choices(trackers, weights)[0])
+            self.embeds[site] = sorted(embeds)
+        self.benign_embeds = {site: rng.choice(self.benign) for site in self.sites}
+
+    def expected_snitch_map(self, visited_sites):
+        snitch_map = {}
+        for site in visited_sites:
+            for tracker in self.embeds.get(site, []):
+                snitch_map.setdefault(tracker, set()).add(site)
+        return snitch_map
+
+    def page(self, site, path):
+        """Returns the HTML and first-party cookies of a page on the site."""
+        cookie_id = f"{random.getrandbits(128):032x}"
+        embeds = []
+        for tracker in self.embeds[site]:
+            behavior = self.trackers[tracker]
+            if behavior == "canvas":
+                embeds.append(f'<script src="http://{tracker}/fp.js"></script>')
+            elif behavior == "pixel":
+                embeds.append(f'<img src="http://{tracker}/p.gif?uid={cookie_id}" alt="">')
+            else:
+                embeds.append(f'<img src="http://{tracker}/t.gif" alt="">')
+        embeds.append(f'<script src="http://{self.benign_embeds[site]}/lib.js"></script>')
+
+        # enough long internal links for the crawler to pick one to click
+        links = "\n".join(
+            f'<li><a href="/news/{i}/a-reasonably-long-article-title-number-{i}">Story {i}</a></li>'
+            for i in range(12))
+        filler = "<p>Lorem ipsum dolor sit amet.</p>\n" * 200
+
+        html = f"""<!DOCTYPE html>
+<html><head><title>{site}{path}</title></head>
+<body>
+<h1>{site}</h1>
+{"".join(embeds)}
+<ul>{links}</ul>
+{filler}
+</body></html>
+"""
+        return html.encode('utf-8'), [f"uid={cookie_id}; Max-Age=31536000; Path=/"]
+
+    def respond(self, host, path):
+        """Returns (status, content type, headers, body) for a request."""
+        if host in self.embeds:
+            body, cookies = self.page(host, path)
+            return 200, "text/html; charset=utf-8", [("Set-Cookie", c) for c in cookies], body
+
+        if host in self.trackers:
+            path = path.partition("?")[0]
+            if path == "/fp.js":
+                return 200, "application/javascript", [], CANVAS_JS.encode('utf-8')
+            headers = []
+            if self.trackers[host] == "cookie" and path == "/t.gif":
+                headers.append(("Set-Cookie", f"id={random.getrandbits(128):032x}; "
+                                "Max-Age=31536000; Path=/"))
+            return 200, "image/gif", headers, PIXEL_GIF
+
+        if host in self.benign:
+            return 200, "application/javascript", [], BENIGN_JS.encode('utf-8')
+
+        return 404, "text/plain", [], b"not found\n"
+
+
+class SyntheticWebHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self): # pylint: disable=invalid-name
+        # absolute URLs when acting as a proxy
+        if self.path.startswith("http://"):
+            url = urlsplit(self.path)
+            host, path = url.hostname, url.path + (f"?{url.query}" if url.query else "")
+        else:
+            host, path = self.headers.get("Host", "").partition(":")[0], self.path
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        status, content_type, headers, body = self.server.web.respond(host.lower(), path)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
+def serve(web, latency=0.0):
+    """Starts serving the synthetic web on a free local port,
+    returning the server (see server.server_address)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SyntheticWebHandler)
+    server.daemon_threads = True
+    server.web = web
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_log(log_path):
+    """Returns the sites visited successfully, the number of errors,
+    and the number of internal links followed."""
+    visited, num_errors, num_links = [], 0, 0
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            if match := LOG_VISITED_RE.match(line):
+                visited.append(match.group(1))
+            elif LOG_ERROR_RE.match(line):
+                num_errors += 1
+            elif LOG_LINK_RE.match(line):
+                num_links += 1
+    return visited, num_errors, num_links
+
+
+def score_snitch_map(web, snitch_map, visited):
+    """Compares the learned snitch_map to the known tracking."""
+    expected = web.expected_snitch_map(visited)
+    expected_pairs = {(tracker, site) for tracker, sites in expected.items() for site in sites}
+    found_pairs = {(tracker, site) for tracker, sites in snitch_map.items() for site in sites}
+
+    by_behavior = {}
+    for behavior in BEHAVIORS:
+        pairs = {pair for pair in expected_pairs if web.trackers[pair[0]] == behavior}
+        by_behavior[behavior] = {
+            "expected": len(pairs),
+            "found": len(pairs & found_pairs),
+        }
+
+    return {
+        "trackers_expected": len(expected),
+        "trackers_found": len(expected.keys() & snitch_map.keys()),
+        "pairs_expected": len(expected_pairs),
+        "pairs_found": len(expected_pairs & found_pairs),
+        "recall": len(expected_pairs & found_pairs) / len(expected_pairs) if expected_pairs else None,
+        # learned benign hosts, or tracking attributed to the wrong sites
+        "unexpected": sorted(f"{tracker} on {site}" for tracker, site in found_pairs - expected_pairs),
+        "by_behavior": by_behavior,
+    }
+
+
+def run_crawl(args, crawler_args, web, out_dir):
+    server = serve(web, args.latency_ms / 1000)
+    site_list = os.path.join(out_dir, "site-list.txt")
+    with open(site_list, 'w', encoding="utf-8") as f:
+        f.write("\n".join(web.sites) + "\n")
+
+    host, port = server.server_address
+    cmd = [sys.executable, str(pathlib.Path(__file__).parent.parent / "crawler.py"), args.browser, str(len(web.sites)),
+           "--site-list", site_list,
+           "--resolve-to", f"{host}:{port}",
+           "--out-dir", out_dir,
+           "--exclude-failures-since", "off",
+           "--webdriver-stats"] + crawler_args
+    print(" ".join(cmd))
+
+    start = time.perf_counter()
+    try:
+        subprocess.run(cmd, check=True)
+    finally:
+        server.shutdown()
+    return time.perf_counter() - start
+
+
+def report(web, out_dir, elapsed, crawler_args):
+    visited, num_errors, num_links = parse_log(os.path.join(out_dir, "log.txt"))
+    with open(os.path.join(out_dir, "results.json"), encoding="utf-8") as f:
+        snitch_map = json.load(f)["snitch_map"]
+    with open(os.path.join(out_dir, "webdriver_stats.json"), encoding="utf-8") as f:
+        phases = json.load(f)["phases"]
+
+    return {
+        "crawler_args": crawler_args,
+        "sites": len(web.sites),
+        "visited": len(visited),
+        "errors": num_errors,
+        "links_followed": num_links,
+        "seconds": round(elapsed, 1),
+        "sites_per_hour": round(len(visited) / elapsed * 3600, 1),
+        "phases": phases,
+        "snitch_map": score_snitch_map(web, snitch_map, visited),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        epilog="other arguments get passed on to crawler.py")
+    ap.add_argument('browser', help="browser to crawl with")
+    ap.add_argument('--num-sites', type=int, default=50,
+                    help="number of first-party sites")
+    ap.add_argument('--num-trackers', type=int, default=15,
+                    help="number of third-party trackers")
+    ap.add_argument('--trackers-per-site', type=int, default=3,
+                    help="number of trackers embedded on every site")
+    ap.add_argument('--latency-ms', type=float, default=0,
+                    help="delay every response by this many milliseconds")
+    ap.add_argument('--seed', type=int, default=1,
+                    help="random seed for the synthetic web")
+    ap.add_argument('--report', default=None,
+                    help="also save the report (JSON) to this file")
+    args, crawler_args = ap.parse_known_args()
+
+    web = SyntheticWeb(args.num_sites, args.num_trackers,
+                       args.trackers_per_site, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        elapsed = run_crawl(args, crawler_args, web, out_dir)
+        results = report(web, out_dir, elapsed, crawler_args)
+
+    print(f"\n{results['visited']}/{results['sites']} sites visited, "
+          f"{results['errors']} errors, {results['links_followed']} links followed, "
+          f"in {results['seconds']}s ({results['sites_per_hour']} sites/hour)")
+
+    print("\nWebDriver time by phase:")
+    for phase, total in results["phases"].items():
+        print(f"  {phase:<16} {total['seconds']:>8.1f}s {total['count']:>7} commands")
+
+    score = results["snitch_map"]
+    print(f"\nsnitch_map: {score['trackers_found']}/{score['trackers_expected']} trackers, "
+          f"{score['pairs_found']}/{score['pairs_expected']} tracker-site pairs")
+    for behavior, counts in score["by_behavior"].items():
+        print(f"  {behavior:<8} {counts['found']}/{counts['expected']}")
+    if score["unexpected"]:
+        print(f"  unexpected: {', '.join(score['unexpected'])}")
+
+    if args.report:
+        with open(args.report, 'w', encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+
+"""Benchmarks the offline (non-browser) tools on synthetic scan data
+at multiples of the size of today's daily scan.
+
+Generates results (action_map, snitch_map, tracking_map, fp_scripts),
+scan logs, a site list and a two-week git history of scan logs for every
+scale, then runs every target in a fresh process, recording its runtime
+and peak memory use. Reports are JSON, so that runs on different
+revisions can be compared (--compare) to catch regressions.
+
+Targets: initdb ingestion (by stage), validate.py, validate.py --stream,
+the shared domain index and each linter, get_recently_failed_domains()
+and Crawler.get_sitelist().
+
+Usage: python -m benchmarks.pipeline [--scales 1 10 100] [--targets ...]
+    [--data-dir DIR] [--profile DIR] [--save REPORT] [--compare OLD_REPORT]
+"""
+
+import argparse
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pathlib
+import platform
+import random
+import resource
+import runpy
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+from datetime import datetime, timedelta
+
+import crawler
+import initdb
+
+from lib import prevalence, sketch
+from lib.basedomain import extract
+from lib.linters.domains import DomainIndex
+from lib.linters.runner import LINTERS
+
+REPO_DIR = pathlib.Path(__file__).parent.parent.resolve()
+
+# bump to regenerate data kept in --data-dir
+GENERATOR_VERSION = 1
+
+# today's daily scan, roughly
+BASE_SIZES = {
+    "sites": 7100,
+    "trackers": 2400,
+    "action_map": 6600,
+    "tracking_map": 800,
+    "fp_scripts": 250,
+    "excluded": 2850,
+}
+# subdomain entries make up the rest of action_map
+SUBDOMAINS_PER_TRACKER = (BASE_SIZES["action_map"] - BASE_SIZES["trackers"]) / BASE_SIZES["trackers"]
+
+TLDS = ("com", "com", "com", "com", "net", "org", "co.uk", "de", "ru",
+        "com.br", "jp", "in", "fr", "it", "pl", "gov", "edu")
+
+EXCLUDE_SUFFIXES = ".mil,.mil.??,.gov,.gov.??,.edu,.edu.??"
+
+TRACKING_TYPES = ("beacon", "pixelcookieshare", "canvas")
+TRACKING_WEIGHTS = (65, 25, 10)
+
+TARGETS = ("initdb", "validate", "validate-stream", "domain_index",
+           "mdfp", "unblocked", "site_outliers",
+           "get_recently_failed_domains", "get_sitelist")
+
+CHILD = """
+import sys
+from benchmarks import pipeline
+getattr(pipeline, sys.argv[1])(*sys.argv[2:])
+"""
+
+
+def sites_per_tracker(rank, num_sites):
+    """Zipf-like, fitted to a recent scan: the most popular tracker is on
+    a third of sites, the hundredth on about 1%, most on one or two."""
+    share = rank ** -0.8 / 3
+    if rank > 100:
+        share *= (100 / rank) ** 0.6
+    return max(1, min(num_sites, round(num_sites * share)))
+
+
+def make_sites(num_sites):
+    return [f"site{i}.{TLDS[i % len(TLDS)]}" for i in range(num_sites)]
+
+
+def make_trackers(num_trackers, seed):
+    """Returns tracker base domains, most popular first. Every 50th one
+    is a CDN of a site (an MDFP candidate)."""
+    rng = random.Random(seed)
+    trackers = []
+    for rank in range(1, num_trackers + 1):
+        if rank % 50 == 0:
+            trackers.append(f"site{rng.randrange(num_trackers)}-static.net")
+        else:
+            trackers.append(f"tracker{rank}.{rng.choice(TLDS[:9])}")
+    return trackers
+
+
+def _write_map(f, items):
+    f.write("{")
+    for i, (key, value) in enumerate(items):
+        f.write(f"{', ' if i else ''}{json.dumps(key)}: {json.dumps(value)}")
+    f.write("}")
+
+
+def write_results(path, scale, seed=1, day=0):
+    """Writes synthetic results a member at a time.
+
+    Results for different days share trackers and sites,
+    but about 5% of trackers come and go between days.
+    """
+    num_sites = BASE_SIZES["sites"] * scale
+    num_trackers = BASE_SIZES["trackers"] * scale
+    sites = make_sites(num_sites)
+    day_rng = random.Random(f"{seed}-{day}")
+    trackers = [(rank, tracker) for rank, tracker in enumerate(
+        make_trackers(num_trackers, seed), 1) if day_rng.random() > 0.05]
+
+    def tracker_sites(rank, tracker):
+        rng = random.Random(f"{seed}-{day}-{tracker}")
+        tracker_sites = rng.sample(sites, sites_per_tracker(rank, num_sites))
+        if tracker.endswith("-static.net"):
+            root = tracker.partition("-")[0]
+            tracker_sites += [f"{root}.com", f"{root}.de", f"{root}.fr"]
+        return tracker_sites
+
+    def action_map():
+        rng = random.Random(f"{seed}-{day}-action_map")
+        for rank, tracker in trackers:
+            action = "allow"
+            if sites_per_tracker(rank, num_sites) >= 3:
+                action = "cookieblock" if rng.random() < 0.25 else "block"
+            yield tracker, {"heuristicAction": action}
+            for i in range(rng.randint(0, round(SUBDOMAINS_PER_TRACKER * 2))):
+                yield f"sub{i}-{rng.getrandbits(24):06x}.{tracker}", {"heuristicAction": action}
+
+    def tracking_map():
+        rng = random.Random(f"{seed}-tracking_map")
+        for rank, tracker in trackers:
+            if rng.random() > BASE_SIZES["tracking_map"] / BASE_SIZES["trackers"]:
+                continue
+            entry_sites = tracker_sites(rank, tracker)
+            yield tracker, {site: rng.choices(TRACKING_TYPES, TRACKING_WEIGHTS) for site in
+                            entry_sites[:rng.randint(1, 14)]}
+
+    def fp_scripts():
+        rng = random.Random(f"{seed}-fp_scripts")
+        for _, tracker in trackers:
+            if rng.random() > BASE_SIZES["fp_scripts"] / BASE_SIZES["trackers"]:
+                continue
+            yield f"cdn.{tracker}", {f"/{rng.getrandbits(48):012x}/fp.js": 1
+                                     for _ in range(rng.randint(1, 3))}
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"action_map": ')
+        _write_map(f, action_map())
+        f.write(', "fp_scripts": ')
+        _write_map(f, fp_scripts())
+        f.write(', "snitch_map": ')
+        _write_map(f, ((tracker, tracker_sites(rank, tracker)) for rank, tracker in trackers))
+        f.write(', "tracking_map": ')
+        _write_map(f, tracking_map())
+        f.write(', "version": 9}')
+
+
+def write_log(path, scale, seed=1, day=0):
+    """Writes a synthetic scan log.
+
+    The same sites tend to fail from day to day, as they do in real scans.
+    """
+    num_sites = BASE_SIZES["sites"] * scale
+    rng = random.Random(f"{seed}-{day}-log")
+    ts = datetime(2026, 8, 1, 12) + timedelta(days=day)
+
+    def line(msg):
+        nonlocal ts
+        ts += timedelta(milliseconds=rng.randrange(100, 15000))
+        return f"{ts:%Y-%m-%d %H:%M:%S},{ts.microsecond // 1000:03d} {msg}\n"
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(line("Starting new crawl:\n\n"
+                     "  browser: Firefox (ETP off)\n"
+                     "  Badger branch: master\n"
+                     "  blocking: off\n"
+                     f"  domains to crawl: {num_sites}\n"
+                     f"  suffixes to exclude: {EXCLUDE_SUFFIXES}\n\n"
+                     "{'browserName': 'firefox'}\n"))
+
+        num_errors = 0
+        for i, site in enumerate(make_sites(num_sites), 1):
+            f.write(line(f"Visiting {i}: {site}"))
+
+            # one in twenty sites is flaky
+            fail_rate = 0.8 if zlib.crc32(f"{seed}-{site}".encode()) % 20 == 0 else 0.05
+            outcome = rng.random()
+            if outcome < fail_rate / 2:
+                num_errors += 1
+                f.write(line(f"Timed out loading {site}" + (
+                    f" on https://www.{site}/" if rng.random() < 0.5 else "")))
+            elif outcome < fail_rate:
+                num_errors += 1
+                f.write(line(f"WebDriverException on {site}: Reached error page: "
+                             f"about:neterror?e=dnsNotFound&u=http%3A//{site}/"))
+                if rng.random() < 0.002:
+                    f.write(line("Restarting browser ..."))
+                    f.write(line("Successfully restarted"))
+            else:
+                if rng.random() < 0.1:
+                    f.write(line(f"Clicking on https://www.{site}/news/{rng.getrandbits(32)}"))
+                f.write(line(f"Visited {site} on https://www.{site}/"))
+                if rng.random() < 0.2:
+                    f.write(line(f"New domains in snitch_map: tracker{rng.randrange(num_sites)}.com"))
+
+        f.write(line(f"Finished scan. Visited {num_sites - num_errors} sites "
+                     f"and errored on {num_errors} ({num_errors / num_sites * 100:.1f}%)"))
+        f.write(line("Saved data to results.json"))
+
+
+def write_sitelist(path, exclude_path, scale, seed=1):
+    """Writes a site list with as many sites again to filter out,
+    and the list of recently failed domains to exclude."""
+    num_sites = BASE_SIZES["sites"] * scale
+    sites = make_sites(num_sites * 2)
+    rng = random.Random(f"{seed}-sitelist")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# synthetic site list\n")
+        for site in sites:
+            f.write(f"{site}\n")
+            if rng.random() < 0.01:
+                f.write(f"google.{site.rpartition('.')[2]}\n")
+    with open(exclude_path, 'w', encoding='utf-8') as f:
+        for site in rng.sample(sites, BASE_SIZES["excluded"] * scale):
+            f.write(f"{site}\n")
+
+
+def write_history(repo_dir, scale, num_days, seed=1):
+    """Commits a scan log a day to a new git repository."""
+    os.makedirs(repo_dir)
+    git = functools.partial(subprocess.run, cwd=repo_dir, check=True, capture_output=True)
+    git(["git", "init", "-q"])
+    for day in range(num_days):
+        write_log(os.path.join(repo_dir, "log.txt"), scale, seed, day)
+        git(["git", "add", "log.txt"])
+        git(["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost",
+             "commit", "-q", "-m", f"Day {day}"])
+
+
+def generate(data_dir, scale, history_days, seed="1"):
+    """Writes all data for a scale, unless it's already there."""
+    scale, history_days, seed = int(scale), int(history_days), int(seed)
+    manifest_path = os.path.join(data_dir, "manifest.json")
+    manifest = {"version": GENERATOR_VERSION, "scale": scale,
+                "history_days": history_days, "seed": seed}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f)["params"] == manifest:
+                return
+        shutil.rmtree(data_dir)
+
+    os.makedirs(data_dir)
+    path = functools.partial(os.path.join, data_dir)
+    write_results(path("results.old.json"), scale, seed, day=0)
+    write_results(path("results.json"), scale, seed, day=1)
+    write_log(path("log.txt"), scale, seed, day=1)
+    write_sitelist(path("site-list.txt"), path("exclude.txt"), scale, seed)
+    write_history(path("history"), scale, history_days, seed)
+
+    sizes = {name: round(os.path.getsize(path(name)) / 1024 / 1024, 1)
+             for name in ("results.json", "log.txt", "site-list.txt")}
+    with open(manifest_path, 'w', encoding="utf-8") as f:
+        json.dump({"params": manifest, "sizes_mb": sizes}, f, indent=2)
+
+
+def _load_psl():
+    extract("example.com")
+
+
+def _load_results(data_dir):
+    _load_psl()
+    with open(os.path.join(data_dir, "results.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@contextlib.contextmanager
+def _stage(stages, name):
+    start = time.perf_counter()
+    yield
+    stages[name] = round(time.perf_counter() - start, 3)
+
+
+def setup_initdb(data_dir):
+    _load_psl()
+    sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+    db_path = os.path.join(data_dir, "badger.sqlite3")
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(db_path)
+
+    def run():
+        stages = {}
+        with sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES) as db:
+            cur = db.cursor()
+            with _stage(stages, "create_tables"):
+                initdb.create_tables(cur)
+            with _stage(stages, "ingest_log"):
+                start_time = datetime(2026, 8, 2, 12)
+                scan_id = initdb.get_scan_id(cur, start_time, start_time, "sfo1",
+                                             BASE_SIZES["sites"] * _scale(data_dir),
+                                             "firefox", True, True)
+                with open(os.path.join(data_dir, "log.txt"), encoding="utf-8") as f:
+                    end_time = initdb.ingest_log(cur, scan_id, f)
+                cur.execute("UPDATE scan SET end_time = ? WHERE id = ?", (end_time, scan_id))
+            with _stage(stages, "ingest_scan"):
+                results = json.loads(pathlib.Path(data_dir, "results.json").read_bytes())
+                initdb.ingest_scan(cur, scan_id, results['snitch_map'],
+                                   results.get('tracking_map', {}))
+                del results
+            with _stage(stages, "create_indexes"):
+                initdb.create_indexes(cur)
+            with _stage(stages, "update_sketches"):
+                sketch.update_sketches(cur)
+            with _stage(stages, "write_snapshot"):
+                prevalence.write_snapshot(cur, os.path.join(data_dir, prevalence.SNAPSHOT_FILENAME))
+        return stages
+
+    return run
+
+
+def _setup_validate(data_dir, extra_args):
+    def run():
+        sys.argv = ["validate.py", os.path.join(data_dir, "results.old.json"),
+                    os.path.join(data_dir, "results.json"),
+                    "--prevalence", os.devnull] + extra_args
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(str(REPO_DIR / "validate.py"), run_name="__main__")
+
+    return run
+
+
+def setup_validate(data_dir):
+    return _setup_validate(data_dir, [])
+
+
+def setup_validate_stream(data_dir):
+    return _setup_validate(data_dir, ["--stream"])
+
+
+def setup_domain_index(data_dir):
+    results = _load_results(data_dir)
+    return lambda: DomainIndex.from_results(results)
+
+
+def _setup_linter(name, data_dir):
+    lint = dict(LINTERS)[name]
+    results = _load_results(data_dir)
+    domains = DomainIndex.from_results(results)
+    return lambda: lint(results, domains)
+
+
+def setup_get_recently_failed_domains(data_dir):
+    crawler.run = functools.partial(crawler.run, cwd=os.path.join(data_dir, "history"))
+    return lambda: crawler.get_recently_failed_domains("2 week")
+
+
+def setup_get_sitelist(data_dir):
+    opts = crawler.create_argument_parser().parse_args([
+        "firefox", str(BASE_SIZES["sites"] * _scale(data_dir)),
+        "--site-list", os.path.join(data_dir, "site-list.txt"),
+        "--exclude", EXCLUDE_SUFFIXES,
+        "--exclude-failures-since", "off",
+        "--out-dir", data_dir])
+    cr = crawler.Crawler(opts)
+    with open(os.path.join(data_dir, "exclude.txt"), encoding="utf-8") as f:
+        cr.exclude_domains = {line.strip() for line in f}
+    return cr.get_sitelist
+
+
+def _scale(data_dir):
+    with open(os.path.join(data_dir, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)["params"]["scale"]
+
+
+def _setup(target, data_dir):
+    if target in ("mdfp", "unblocked", "site_outliers"):
+        return _setup_linter(target, data_dir)
+    return globals()["setup_" + target.replace("-", "_")](data_dir)
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_target(target, data_dir, profile_path=""):
+    """Times one target (in a fresh process),
+    printing the measurements as JSON."""
+    run = _setup(target, data_dir)
+    setup_rss_mb = _max_rss_mb()
+
+    profiler = cProfile.Profile() if profile_path else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    stages = run()
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+
+    if profiler:
+        profiler.dump_stats(profile_path)
+
+    measurements = {
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(_max_rss_mb(), 1),
+        "setup_rss_mb": round(setup_rss_mb, 1),
+    }
+    if isinstance(stages, dict):
+        measurements["stages"] = stages
+    print(json.dumps(measurements))
+
+
+def measure(target, data_dir, profile_path=None, timeout=None):
+    """Runs a target in a child process. Failures get recorded, not raised,
+    as some targets need the network or a Privacy Badger checkout."""
+    try:
+        proc = subprocess.run([sys.executable, "-c", CHILD, "run_target", target, data_dir,
+                               profile_path or ""], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=False, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout}s"}
+    if proc.returncode:
+        lines = proc.stderr.strip().splitlines() or [f"exit status {proc.returncode}"]
+        return {"error": lines[-1][:200]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(old_report, new_report, threshold):
+    """Prints old and new measurements side by side,
+    and returns the number of regressions."""
+    old = {(entry["scale"], entry["target"]): entry for entry in old_report["results"]}
+    num_regressions = 0
+
+    print(f"{'target':<28} {'scale':>5} {'old s':>9} {'new s':>9} {'old MB':>8} {'new MB':>8}")
+    for entry in new_report["results"]:
+        prev = old.get((entry["scale"], entry["target"]))
+        if not prev or "error" in prev or "error" in entry:
+            continue
+        flags = []
+        # ignore noise in very short runs and small processes
+        if entry["seconds"] > max(prev["seconds"] * (1 + threshold), prev["seconds"] + 0.1):
+            flags.append("slower")
+        if entry["peak_rss_mb"] > max(prev["peak_rss_mb"] * (1 + threshold), prev["peak_rss_mb"] + 10):
+            flags.append("more memory")
+        num_regressions += bool(flags)
+        print(f"{entry['target']:<28} {entry['scale']:>4}× {prev['seconds']:>9.2f} "
+              f"{entry['seconds']:>9.2f} {prev['peak_rss_mb']:>8.0f} {entry['peak_rss_mb']:>8.0f}"
+              f"{'  REGRESSION: ' + ', '.join(flags) if flags else ''}")
+
+    return num_regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def run_benchmarks(args, data_root):
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "data": {},
+        "results": [],
+    }
+
+    for scale in args.scales:
+        data_dir = os.path.join(data_root, f"{scale}x")
+        print(f"Generating {scale}× data in {data_dir} ...")
+        subprocess.run([sys.executable, "-c", CHILD, "generate", data_dir, str(scale),
+                        str(args.history_days), str(args.seed)], cwd=REPO_DIR, check=True)
+        with open(os.path.join(data_dir, "manifest.json"), encoding="utf-8") as f:
+            report["data"][scale] = json.load(f)["sizes_mb"]
+        print("  " + ", ".join(f"{name} {mb} MB" for name, mb in report["data"][scale].items()))
+
+        for target in args.targets:
+            profile_path = None
+            if args.profile:
+                profile_path = os.path.join(args.profile, f"{scale}x-{target}.prof")
+            entry = {"scale": scale, "target": target,
+                     **measure(target, data_dir, profile_path, args.timeout)}
+            report["results"].append(entry)
+
+            if "error" in entry:
+                print(f"  {target:<28} failed: {entry['error']}")
+            else:
+                print(f"  {target:<28} {entry['seconds']:>9.2f}s {entry['peak_rss_mb']:>8.0f} MB peak"
+                      f" ({entry['setup_rss_mb']:.0f} MB after setup)")
+                for stage, seconds in entry.get("stages", {}).items():
+                    print(f"    {stage:<26} {seconds:>9.2f}s")
+
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                    help="data sizes, as multiples of a daily scan")
+    ap.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS),
+                    metavar='TARGET', help=f"what to benchmark, out of {', '.join(TARGETS)}")
+    ap.add_argument('--history-days', type=int, default=14,
+                    help="number of daily scan logs in the git history "
+                    "for get_recently_failed_domains")
+    ap.add_argument('--timeout', type=float, default=3600,
+                    help="give up on a target after this many seconds")
+    ap.add_argument('--seed', type=int, default=1,
+                    help="random seed for the synthetic data")
+    ap.add_argument('--data-dir', default=None,
+                    help="keep generated data here, to reuse it across runs "
+                    "(by default it goes in a temporary directory)")
+    ap.add_argument('--profile', metavar='DIR', default=None,
+                    help="also save cProfile stats for every run here "
+                    "(view with python -m pstats)")
+    ap.add_argument('--save', metavar='REPORT', default=None,
+                    help="save the report (JSON) to this file")
+    ap.add_argument('--compare', metavar='OLD_REPORT', default=None,
+                    help="compare to a previously saved report, "
+                    "exiting with status 1 on regressions")
+    ap.add_argument('--threshold', type=float, default=0.2,
+                    help="slowdown or memory growth (fraction) that counts as a regression")
+    args = ap.parse_args()
+
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    if args.data_dir:
+        report = run_benchmarks(args, os.path.abspath(args.data_dir))
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report = run_benchmarks(args, tmp_dir)
+
+    if args.save:
+        with open(args.save, 'w', encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old_report = json.load(f)
+        print(f"\nCompared to {old_report['commit']} ({old_report['date']}):")
+        if compare(old_report, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
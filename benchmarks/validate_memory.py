@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""Compares peak memory use of loading results JSON in full
+(json.load() plus json.dumps() for the size check, like validate.py does
+by default) to streaming it (validate.py --stream).
+
+Usage: python -m benchmarks.validate_memory [--num-domains N]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+FULL = """
+import json, sys
+with open(sys.argv[1], encoding='utf-8') as f:
+    js = json.load(f)
+size = len(json.dumps(js))
+"""
+
+STREAM = """
+import sys
+from lib.results import load_slim
+js, size, _ = load_slim(sys.argv[1])
+"""
+
+REPORT = """
+import resource
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, size)
+"""
+
+
+def write_results(path, num_domains, seed=1):
+    """Writes synthetic results a member at a time, as children inherit
+    the peak memory use of this process."""
+    rng = random.Random(seed)
+    sites = [f"site{i}.com" for i in range(num_domains // 10 + 1)]
+
+    def write_map(f, items):
+        f.write("{")
+        for i, (key, value) in enumerate(items):
+            f.write(f"{', ' if i else ''}{json.dumps(key)}: {json.dumps(value)}")
+        f.write("}")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"action_map": ')
+        write_map(f, ((f"tracker{i}.example{i % 1000}.com", {
+            "dnt": False,
+            "heuristicAction": rng.choice(["block", "cookieblock", "allow", ""]),
+            "nextUpdateTime": 0,
+            "userAction": "",
+        }) for i in range(num_domains)))
+        f.write(', "snitch_map": ')
+        write_map(f, ((f"example{i}.com", rng.sample(sites, min(len(sites), 3)))
+                      for i in range(1000)))
+        f.write(', "tracking_map": ')
+        write_map(f, ((f"example{i}.com", {site: ["canvas"] for site in rng.sample(
+            sites, min(len(sites), 3))}) for i in range(1000)))
+        f.write("}")
+
+
+def measure(code, path):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code + REPORT, path],
+                         capture_output=True, check=True, text=True).stdout
+    max_rss_kb, size = out.split()
+    return int(max_rss_kb) / 1024, int(size), time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--num-domains', type=int, default=1_000_000,
+                    help="number of action_map domains")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "results.json")
+        write_results(path, args.num_domains)
+        print(f"{args.num_domains} domains, {os.path.getsize(path) / 1024 / 1024:.0f} MB")
+
+        for name, code in (("json.load", FULL), ("streaming", STREAM)):
+            peak_mb, size, elapsed = measure(code, path)
+            print(f"  {name}: peak RSS {peak_mb:.0f} MB, {elapsed:.2f}s (size {size})")
+
+
+if __name__ == "__main__":
+    main()
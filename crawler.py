@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import configparser
 import contextlib
 import copy
 import datetime
@@ -10,6 +11,7 @@ import os
 import pathlib
 import random
 import re
+import secrets
 import subprocess
 import sys
 import tempfile
@@ -29,6 +31,7 @@ from selenium.common.exceptions import (
     ElementNotInteractableException,
     ElementNotVisibleException,
     InvalidSessionIdException,
+    JavascriptException,
     NoAlertPresentException,
     NoSuchElementException,
     NoSuchWindowException,
@@ -50,6 +53,9 @@ from tranco import Tranco
 from xvfbwrapper import Xvfb
 
 from lib.basedomain import extract
+from lib.coordinator import AUTHKEY_ENV, BatchQueue, Coordinator, WorkerClient, parse_address
+from lib.screenshots import EXTENSIONS, ScreenshotWriter
+from lib.webdriver_stats import CommandStats
 
 
 CHROME_EXT_ID = 'mcgekeccgjgcmhnhbabplanchdogjcnh'
@@ -65,6 +71,22 @@ EDGE = 'edge'
 
 RESTART_RETRIES = 5
 MAX_ALERTS = 10
+# seconds to wait for the internal link we picked to load
+LINK_TIMEOUT = 15
+
+# Follows a link like clicking on it would (same referrer policy),
+# but without triggering the page's click handlers or opening new windows
+NAVIGATE_TO_LINK_JS = """
+let [href, link] = arguments, a = document.createElement('a');
+a.href = href;
+for (let attr of ['referrerpolicy', 'rel']) {
+  let value = link.getAttribute(attr);
+  if (value) {
+    a.setAttribute(attr, value);
+  }
+}
+a.click();
+"""
 
 # Privacy Badger storage keys not for export/import
 STORAGE_KEYS_TO_IGNORE = ['cookieblock_list', 'dnt_hashes', 'settings_map', 'private_storage']
@@ -93,12 +115,25 @@ def create_argument_parser():
                         help="disables blocking and snitch_map limits in Privacy Badger")
     feat.add_argument('--no-link-clicking', action='store_true', default=False,
                         help="disables finding and clicking internal links on sites")
+    feat.add_argument('--link-navigation', choices=("click", "direct"), default="click",
+                        help="how to follow the internal link picked on every site: "
+                        "click on it, or navigate to it directly, with the same "
+                        f"referrer and waiting at most {LINK_TIMEOUT}s for it to load")
     feat.add_argument('--take-screenshots', action='store_true', default=False,
                         help=f"saves screenshots to {os.path.join('OUT_DIR', 'screenshots')}")
+    feat.add_argument('--screenshot-format', choices=tuple(EXTENSIONS), default="png",
+                        help="re-encodes screenshots to this format (other than PNG requires Pillow)")
+    feat.add_argument('--screenshot-scale', type=float, default=1.0,
+                        help="downscales screenshots by this factor (other than 1 requires Pillow)")
+    feat.add_argument('--screenshot-quality', type=int, default=75,
+                        help="JPEG/WebP screenshot quality")
     feat.add_argument('--load-extension', default=None,
                         help="extension (.crx or .xpi) to install in addition to Privacy Badger")
     feat.add_argument('--get-sitelist-only', action='store_true', default=False,
                        help="output the site list and exit")
+    feat.add_argument('--webdriver-stats', action='store_true', default=False,
+                      help="count and time WebDriver commands by crawl phase, saving "
+                      f"the totals and histograms to {os.path.join('OUT_DIR', 'webdriver_stats.json')}")
 
     sites = ap.add_argument_group("site list arguments")
 
@@ -122,6 +157,24 @@ def create_argument_parser():
                          help="comma-separated list of site eTLD+1 domains to ignore "
                          "when merging data sets")
 
+    dist = ap.add_argument_group("distributed scan arguments")
+
+    dist.add_argument('--coordinate', metavar='[HOST:]PORT', default=None,
+                      help="coordinate a distributed scan instead of crawling: hand out "
+                      "batches of sites to workers (see --coordinator) and merge their "
+                      "results into a new directory in OUT_DIR, laid out like a "
+                      "Badger Swarm scan (use port 0 to pick any free port)")
+    dist.add_argument('--workers', type=int, default=0,
+                      help="number of workers to start on this machine, with --coordinate")
+    dist.add_argument('--batch-size', type=int, default=10,
+                      help="number of sites to hand out at a time, with --coordinate")
+    dist.add_argument('--stall-timeout', type=float, default=600,
+                      help="time in seconds a worker can go without finishing a site "
+                      "before its batch gets handed to another worker, with --coordinate")
+    dist.add_argument('--coordinator', metavar='HOST:PORT', default=None,
+                      help="work on batches of sites from the scan coordinator "
+                      f"at this address, authenticating with the key in ${AUTHKEY_ENV}")
+
     # Arguments below should never have to be used within the docker container.
     ap.add_argument('--out-dir', '--out-path', dest='out_dir', default='./',
                     help="path at which to save output")
@@ -132,6 +185,9 @@ def create_argument_parser():
                     "for example /usr/bin/google-chrome-beta")
     ap.add_argument('--chromedriver-path', default=None,
                     help="path to the ChromeDriver binary")
+    ap.add_argument('--resolve-to', metavar='HOST:PORT', default=None,
+                    help="send all browser traffic to this address instead, "
+                    "for crawling local test sites (see benchmarks/offline_crawl.py)")
 
     ap.add_argument('--firefox-tracking-protection',
         choices=("off", "standard", "strict"), default="off",
@@ -321,6 +377,7 @@ class Crawler:
         self.browser_binary = opts.browser_binary
         self.browser = opts.browser
         self.chromedriver_path = opts.chromedriver_path
+        self.command_stats = CommandStats(opts.browser) if opts.webdriver_stats else None
         self.site_list = opts.site_list
         self.exclude_domains = get_recently_failed_domains(opts.exclude_failures_since)
         self.exclude_suffixes = opts.exclude
@@ -333,6 +390,8 @@ class Crawler:
         self.num_sites = opts.num_sites
         self.out_dir = opts.out_dir
         self.pb_dir = opts.pb_dir
+        self.resolve_to = opts.resolve_to
+        self.link_navigation = opts.link_navigation
         self.no_link_clicking = opts.no_link_clicking
         self.take_screenshots = opts.take_screenshots
         self.timeout = opts.timeout
@@ -342,6 +401,12 @@ class Crawler:
 
         pathlib.Path(self.out_dir).mkdir(exist_ok=True)
 
+        # screenshots get decoded, deduplicated and saved in the background
+        self.screenshots = ScreenshotWriter(
+            os.path.join(self.out_dir, "screenshots"), opts.screenshot_format,
+            opts.screenshot_scale, opts.screenshot_quality,
+            logger=self.logger) if self.take_screenshots else None
+
     def __del__(self):
         if getattr(self, "tmp_dir", None):
             self.tmp_dir.cleanup()
@@ -349,13 +414,26 @@ class Crawler:
         if getattr(self, "extra_ext_dir", None):
             self.extra_ext_dir.cleanup()
 
-    def init_logging(self, log_stdout):
+    def phase(self, name):
+        """Attributes WebDriver commands sent within the block
+        to the named crawl phase (with --webdriver-stats)."""
+        if self.command_stats:
+            return self.command_stats.in_phase(name)
+        return contextlib.nullcontext()
+
+    def save_command_stats(self):
+        if not self.command_stats:
+            return
+        self.command_stats.save(os.path.join(self.out_dir, "webdriver_stats.json"))
+        self.logger.info("WebDriver command times:\n\n%s\n", self.command_stats.summary())
+
+    def init_logging(self, log_stdout, filename='log.txt'):
         self.logger.setLevel(logging.INFO)
 
         log_fmt = logging.Formatter('%(asctime)s %(message)s')
 
         # by default, just log to file
-        fh = logging.FileHandler(os.path.join(self.out_dir, 'log.txt'))
+        fh = logging.FileHandler(os.path.join(self.out_dir, filename))
         fh.setFormatter(log_fmt)
         self.logger.addHandler(fh)
 
@@ -380,6 +458,7 @@ class Crawler:
                 "  domains to crawl: %d\n"
                 "  suffixes to exclude: %s\n"
                 "  domains to exclude: %s\n"
+                "  link navigation: %s\n"
                 "  parallel extension: %s\n"
                 "  driver capabilities:\n\n%s\n"
             ),
@@ -393,6 +472,7 @@ class Crawler:
             self.num_sites,
             self.exclude_suffixes,
             self.get_exclude_domains_summary(),
+            "off" if self.no_link_clicking else self.link_navigation,
             self.load_extension,
             pformat(self.driver.capabilities)
         )
@@ -468,6 +548,15 @@ class Crawler:
         opts.set_preference("toolkit.telemetry.unified", False)
         opts.set_preference("toolkit.telemetry.archive.enabled", False)
 
+        if self.resolve_to:
+            # Firefox can't remap hostnames to another port,
+            # so go through the address as an HTTP proxy instead
+            proxy_host, _, proxy_port = self.resolve_to.rpartition(":")
+            opts.set_preference("network.proxy.type", 1)
+            opts.set_preference("network.proxy.http", proxy_host)
+            opts.set_preference("network.proxy.http_port", int(proxy_port))
+            opts.set_preference("network.proxy.no_proxies_on", "")
+
         if self.firefox_tracking_protection == "off":
             # disable all content blocking/Tracking Protection features
             # https://wiki.mozilla.org/Security/Tracking_protection
@@ -557,6 +646,10 @@ class Crawler:
             opts.add_argument("--disable-blink-features=AutomationControlled")
             opts.add_argument("--disable-crash-reporter")
 
+            if self.resolve_to:
+                opts.add_argument(
+                    f"--host-resolver-rules=MAP * {self.resolve_to}, EXCLUDE localhost")
+
             opts.set_capability("acceptInsecureCerts", False);
             opts.set_capability("unhandledPromptBehavior", "ignore");
 
@@ -596,6 +689,9 @@ class Crawler:
                 os.path.join(self.pb_dir, 'src'))
             self.driver.webextension.install(unpacked_addon_path)
 
+        if self.command_stats:
+            self.command_stats.instrument(self.driver)
+
         # load another extension to run alongside PB
         if self.load_extension:
             self.extra_ext_dir = tempfile.TemporaryDirectory() # pylint:disable=consider-using-with
@@ -815,14 +911,22 @@ class Crawler:
         raise WebDriverException(msg)
 
     def take_screenshot(self, domain):
-        pathlib.Path(self.out_dir + '/screenshots').mkdir(exist_ok=True)
-        filename = os.path.join(self.out_dir, "screenshots", "".join((
+        pathlib.Path(self.screenshots.out_dir).mkdir(exist_ok=True)
+        name = "".join((
             str(int(time.time())),
             "-",
-            re.sub(r'[^a-z0-9]', '-', domain.lower()[:100]),
-            ".png")))
-        if not self.driver.save_screenshot(filename):
-            self.logger.warning("Failed to save screenshot for %s", domain)
+            re.sub(r'[^a-z0-9]', '-', domain.lower()[:100])))
+        # only the capture happens here; the rest is up to self.screenshots
+        png_base64 = self.driver.get_screenshot_as_base64()
+        if not png_base64:
+            self.logger.warning("Failed to take screenshot for %s", domain)
+            return
+        self.screenshots.submit(name, png_base64)
+
+    def save_screenshots(self):
+        """Waits for screenshots still being saved in the background."""
+        if self.screenshots:
+            self.screenshots.close()
 
     def scroll_page(self):
         # split self.wait_time into INTERVAL_SEC intervals
@@ -883,17 +987,26 @@ class Crawler:
 
         return links
 
-    def click_internal_link(self):
+    def pick_internal_link(self):
+        """Returns a random (href, element) out of the likeliest
+        article links on the page, or None if there aren't enough."""
         links = self.gather_internal_links()
         if not links or len(links) < 10:
-            return
+            return None
 
         # sort by link length (try to prioritize article links)
         links.sort(key=lambda item: (-len(item[0]), item[0]))
         # take top ten
         links = links[:10]
 
-        link_href, link_el = random.choice(links)
+        return random.choice(links)
+
+    def click_internal_link(self):
+        link = self.pick_internal_link()
+        if not link:
+            return
+
+        link_href, link_el = link
         self.logger.info("Clicking on %s", link_href)
         try:
             curl = self.driver.current_url
@@ -917,36 +1030,74 @@ class Crawler:
             # TODO wait for the page to actually load first
             self.scroll_page()
 
+    def navigate_to_internal_link(self):
+        link = self.pick_internal_link()
+        if not link:
+            return
+
+        link_href, link_el = link
+        self.logger.info("Navigating to %s", link_href)
+        try:
+            curl = self.driver.current_url
+            self.driver.execute_script(NAVIGATE_TO_LINK_JS, link_href, link_el)
+
+            def link_loaded(driver):
+                url, ready_state = driver.execute_script(
+                    "return [location.href, document.readyState];")
+                return url != curl and ready_state == "complete"
+
+            try:
+                # polling while the old page unloads can fail
+                # with "Document was unloaded" (Firefox)
+                WebDriverWait(self.driver, LINK_TIMEOUT,
+                              ignored_exceptions=(JavascriptException,)).until(link_loaded)
+            except TimeoutException:
+                self.driver.execute_script("window.stop();")
+        except WebDriverException as e:
+            self.logger.error(
+                "Failed to visit link (%s): %s", type(e).__name__, e.msg)
+        else:
+            self.scroll_page()
+
     def visit_domain(self, domain):
         """
         Visit a domain, then spend `self.wait_time` seconds on the site
         waiting for dynamic loading to complete.
         """
-        self.handle_alerts_and(lambda: self.driver.get(f"http://{domain}/"))
+        with self.phase("load"):
+            self.handle_alerts_and(lambda: self.driver.get(f"http://{domain}/"))
 
-        self.raise_on_chrome_error_pages()
+            self.raise_on_chrome_error_pages()
 
-        self.raise_on_security_pages()
+            self.raise_on_security_pages()
 
-        self.scroll_page()
+        with self.phase("scroll"):
+            self.scroll_page()
 
-        self.raise_on_security_pages()
+        with self.phase("security_check"):
+            self.raise_on_security_pages()
 
         if not self.no_link_clicking:
-            self.click_internal_link()
+            with self.phase("click_link"):
+                if self.link_navigation == "direct":
+                    self.navigate_to_internal_link()
+                else:
+                    self.click_internal_link()
 
         # if any new tabs/windows got opened, close them now
-        handles = self.driver.window_handles
-        if len(list(handles)) > 1:
-            for handle in handles[1:]:
-                self.driver.switch_to.window(handle)
-                if self.take_screenshots:
-                    self.take_screenshot(domain + "-" + self.driver.current_url)
-                self.driver.close()
-            self.driver.switch_to.window(handles[0])
+        with self.phase("close_windows"):
+            handles = self.driver.window_handles
+            if len(list(handles)) > 1:
+                for handle in handles[1:]:
+                    self.driver.switch_to.window(handle)
+                    if self.take_screenshots:
+                        self.take_screenshot(domain + "-" + self.driver.current_url)
+                    self.driver.close()
+                self.driver.switch_to.window(handles[0])
 
         if self.take_screenshots:
-            self.take_screenshot(domain + "-" + self.driver.current_url)
+            with self.phase("screenshot"):
+                self.take_screenshot(domain + "-" + self.driver.current_url)
 
     def get_tranco_domains(self):
         max_tries = 10
@@ -1047,6 +1198,10 @@ class Crawler:
             self.logger.warning("Learning checkbox not found, learning NOT enabled!")
 
     def restart_browser(self):
+        with self.phase("restart"):
+            self._restart_browser()
+
+    def _restart_browser(self):
         self.logger.info("Restarting browser ...")
 
         # It's ugly, but this section needs to be ABSOLUTELY crash-proof.
@@ -1097,12 +1252,46 @@ class Crawler:
         Visit each website in `domains` in a browser with Privacy Badger.
         When finished, export PB's user data.
         """
-        num_visited = 0
-        old_snitches = self.dump_data()['snitch_map']
-
         random.shuffle(domains)
 
-        for i, domain in enumerate(domains):
+        num_visited = self.visit_sites(domains, [])
+
+        self.log_scan_finished(len(domains), num_visited)
+
+        try:
+            data = self.dump_final_data()
+        except WebDriverException as e:
+            # If we can't load the options page here, just quit :(
+            self.logger.error(
+                "Could not get Badger storage!\n"
+                "%s: %s", type(e).__name__, e.msg)
+            sys.exit(1)
+
+        self.driver.quit()
+
+        self.save(data)
+
+        self.save_screenshots()
+
+        self.save_command_stats()
+
+    def visit_sites(self, domains, history, on_visit=None):
+        """
+        Visit each website in `domains`, in order.
+
+        :param history: sites visited so far in this browser, most recent
+            last, for detecting misattributed tracking (gets appended to)
+        :param on_visit: optional function to call with every site
+            once done with it
+        :return: the number of sites visited successfully
+        """
+        num_visited = 0
+        old_snitches = self.last_data['snitch_map'] if self.last_data \
+            else self.dump_data()['snitch_map']
+
+        for domain in domains:
+            i = len(history)
+            history.append(domain)
             try:
                 if self.last_data:
                     old_snitches = self.last_data['snitch_map']
@@ -1110,18 +1299,21 @@ class Crawler:
                 # This script could fail during the data dump (trying to get
                 # the options page), the data cleaning, or while trying to load
                 # the next domain.
-                self.last_data = self.dump_data()
+                with self.phase("dump_data"):
+                    self.last_data = self.dump_data()
 
                 self.log_snitch_map_changes(old_snitches, self.last_data['snitch_map'])
 
                 # try to fix misattribution errors
                 if i > 1:
-                    self.cleanup(domains[i - 2], domains[i - 1])
+                    with self.phase("cleanup"):
+                        self.cleanup(history[i - 2], history[i - 1])
 
                 self.logger.info("Visiting %d: %s", i + 1, domain)
                 self.visit_domain(domain)
 
-                curl = self.get_current_url()
+                with self.phase("current_url"):
+                    curl = self.get_current_url()
                 if curl and curl.startswith(CHROME_URL_PREFIX):
                     self.logger.error("Error loading %s: "
                         "driver.current_url is still a %s page",
@@ -1138,7 +1330,8 @@ class Crawler:
                 self.restart_browser()
 
             except TimeoutException:
-                curl = self.get_current_url()
+                with self.phase("current_url"):
+                    curl = self.get_current_url()
                 if curl and curl.startswith((FF_URL_PREFIX, CHROME_URL_PREFIX)):
                     curl = None
                 self.logger.warning("Timed out loading %s%s",
@@ -1150,28 +1343,76 @@ class Crawler:
                 if should_restart(ex):
                     self.restart_browser()
 
-        num_total = len(domains)
+            finally:
+                if on_visit:
+                    on_visit(domain)
+
+        return num_visited
+
+    def log_scan_finished(self, num_total, num_visited):
         if num_total:
             num_errors = num_total - num_visited
             self.logger.info(
                 "Finished scan. Visited %d sites and errored on %d (%.1f%%)",
                 num_visited, num_errors, (num_errors / num_total * 100))
 
-        try:
-            if self.last_data:
-                old_snitches = self.last_data['snitch_map']
+    def dump_final_data(self):
+        """Exports PB's user data once done visiting sites,
+        logging any snitch_map changes since the last visit."""
+        with self.phase("dump_data"):
             data = self.dump_data()
-            self.log_snitch_map_changes(old_snitches, data['snitch_map'])
-        except WebDriverException as e:
-            # If we can't load the options page here, just quit :(
-            self.logger.error(
-                "Could not get Badger storage!\n"
-                "%s: %s", type(e).__name__, e.msg)
-            sys.exit(1)
+        if self.last_data:
+            self.log_snitch_map_changes(self.last_data['snitch_map'], data['snitch_map'])
+        return data
+
+    def crawl_batches(self, client):
+        """
+        Visit batches of websites handed out by a scan coordinator,
+        sending PB's user data and the new log lines after every batch.
+        """
+        log_path = os.path.join(self.out_dir, 'log.txt')
+        log_offset = 0
+
+        def read_new_log_lines():
+            nonlocal log_offset
+            with open(log_path, encoding="utf-8") as f:
+                f.seek(log_offset)
+                text = f.read()
+                log_offset = f.tell()
+            return text
+
+        history = []
+        num_visited = 0
+
+        while batch := client.take():
+            batch_id, domains = batch
+            num_visited += self.visit_sites(
+                domains, history, on_visit=lambda _, batch_id=batch_id: client.progress(batch_id))
+
+            try:
+                data = self.dump_final_data()
+            except WebDriverException as e:
+                self.logger.error("Could not get Badger storage after batch %d "
+                                  "(%s: %s)", batch_id, type(e).__name__, e.msg)
+                self.restart_browser()
+                data = copy.deepcopy(self.last_data)
+            self.last_data = data
+
+            client.complete(batch_id, self.export_data(copy.deepcopy(data)) if data else None,
+                            read_new_log_lines())
+
+        self.log_scan_finished(len(history), num_visited)
 
         self.driver.quit()
 
-        self.save(data)
+        if self.last_data:
+            self.save(self.last_data)
+
+        self.save_screenshots()
+
+        self.save_command_stats()
+
+        client.finish(read_new_log_lines())
 
     def cleanup(self, d1, d2):
         """
@@ -1236,7 +1477,8 @@ class Crawler:
             self.load_user_data(new_data)
             self.last_data = new_data
 
-    def save(self, data, name='results.json'):
+    def export_data(self, data):
+        """Prepares dumped user data for saving, in place."""
         data['version'] = self.version
 
         # remove unnecessary properties to save space
@@ -1254,12 +1496,121 @@ class Crawler:
             # user actions are never set
             del domain_data['userAction']
 
+        return data
+
+    def save(self, data, name='results.json'):
+        self.export_data(data)
+
         self.logger.info("Saving seed data version %s ...", self.version)
         with open(os.path.join(self.out_dir, name), 'w', encoding="utf-8") as f:
             json.dump(data, f, indent=2, sort_keys=True, separators=(',', ': '))
         self.logger.info("Saved data to %s", name)
 
 
+def worker_command(args, address, out_dir):
+    """Returns the command for starting a local worker for the scan."""
+    cmd = [sys.executable, os.path.abspath(__file__), args.browser, str(args.num_sites),
+           "--coordinator", address,
+           "--out-dir", out_dir,
+           "--exclude-failures-since", "off"]
+
+    for flag in ('no_blocking', 'no_link_clicking', 'take_screenshots',
+                 'webdriver_stats', 'no_xvfb'):
+        if getattr(args, flag):
+            cmd.append("--" + flag.replace("_", "-"))
+
+    for option in ('timeout', 'wait_time', 'link_navigation', 'screenshot_format',
+                   'screenshot_scale', 'screenshot_quality', 'pb_dir', 'browser_binary', 'chromedriver_path',
+                   'resolve_to', 'firefox_tracking_protection', 'load_extension',
+                   'load_data_ignore_sites'):
+        if getattr(args, option) is not None:
+            cmd += ["--" + option.replace("_", "-"), str(getattr(args, option))]
+
+    for data_json in args.load_data:
+        cmd += ["--load-data", os.path.abspath(data_json)]
+
+    return cmd
+
+
+def write_run_settings(crawler, scan_dir):
+    """Saves the scan settings initdb.py looks for in distributed scans."""
+    config = configparser.ConfigParser()
+    config['settings'] = {
+        'browser': crawler.browser,
+        'num_sites': str(crawler.num_sites),
+        'pb_branch': get_git_info(crawler.pb_dir)['branch'] or "",
+        'do_region': "local",
+    }
+    with open(os.path.join(scan_dir, 'run_settings.ini'), 'w', encoding="utf-8") as f:
+        config.write(f)
+
+
+# pylint: disable-next=too-many-locals
+def coordinate(crawler, args):
+    """Hands out the site list to workers in batches until every site got
+    visited, then merges the results from all workers."""
+    start_time = int(time.time())
+    scan_dir = os.path.join(crawler.out_dir, f"{crawler.browser}-{start_time}")
+    os.makedirs(scan_dir)
+    crawler.out_dir = scan_dir
+    crawler.init_logging(args.log_stdout, 'coordinator.log')
+
+    domains = crawler.get_sitelist()
+    random.shuffle(domains)
+
+    write_run_settings(crawler, scan_dir)
+
+    authkey = os.environ.get(AUTHKEY_ENV) or secrets.token_hex(16)
+    coordinator = Coordinator(BatchQueue(domains, args.batch_size, args.stall_timeout),
+                              scan_dir, parse_address(args.coordinate),
+                              authkey.encode('utf-8'), crawler.logger)
+    coordinator.start()
+
+    host, port = coordinator.address
+    crawler.logger.info("Coordinating a scan of %d sites in batches of %d at %s:%d",
+                        len(domains), args.batch_size, host, port)
+
+    if host == "0.0.0.0":
+        host = "127.0.0.1"
+    env = dict(os.environ, **{AUTHKEY_ENV: authkey})
+    # pylint: disable-next=consider-using-with
+    workers = [subprocess.Popen(worker_command(
+        args, f"{host}:{port}", os.path.join(scan_dir, f"worker-{i}")), env=env)
+               for i in range(args.workers)]
+
+    while not coordinator.wait(5):
+        if workers and not coordinator.num_connected and all(
+                worker.poll() is not None for worker in workers):
+            crawler.logger.error("All workers exited before the scan was done")
+            break
+
+    crawler.logger.info("Done handing out sites (%d batches, %d reassigned)",
+                        len(coordinator.queue.batches), coordinator.queue.num_reassigned)
+
+    # let workers finish saving, and stop any that are still stuck
+    for worker in workers:
+        try:
+            worker.wait(timeout=args.stall_timeout)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+    coordinator.close()
+
+    results_paths = sorted(pathlib.Path(scan_dir).glob("results.*.json"))
+    if not results_paths:
+        crawler.logger.error("No results to merge")
+        sys.exit(1)
+
+    crawler.logger.info("Merging results from %d workers ...", len(results_paths))
+    crawler.start_browser()
+    for path in results_paths:
+        with path.open(encoding="utf-8") as f:
+            crawler.load_user_data(json.load(f))
+    data = crawler.dump_data()
+    crawler.driver.quit()
+
+    crawler.save(data, "results-noblocking.json" if crawler.no_blocking else "results.json")
+
+
 if __name__ == '__main__':
     args = create_argument_parser().parse_args()
 
@@ -1272,15 +1623,26 @@ if __name__ == '__main__':
     with Xvfb(width=1920, height=1200) if not args.no_xvfb else contextlib.suppress():
         crawler = Crawler(args)
 
+        if args.coordinate:
+            coordinate(crawler, args)
+            sys.exit(0)
+
         if crawler.num_sites > 0:
             crawler.init_logging(args.log_stdout)
 
-        if crawler.num_sites == 0:
+        client = None
+        if args.coordinator:
+            client = WorkerClient(parse_address(args.coordinator),
+                                  os.environ.get(AUTHKEY_ENV, "").encode('utf-8'))
+            crawler.site_list = f"batches from {args.coordinator}"
+            domains = None
+        elif crawler.num_sites == 0:
             domains = []
         else:
             domains = crawler.get_sitelist()
 
-        crawler.start_browser()
+        with crawler.phase("start"):
+            crawler.start_browser()
 
         if crawler.num_sites > 0:
             crawler.log_scan_summary()
@@ -1290,4 +1652,7 @@ if __name__ == '__main__':
                 data = json.load(f)
                 crawler.load_user_data(data)
 
-        crawler.crawl(domains)
+        if client:
+            crawler.crawl_batches(client)
+        else:
+            crawler.crawl(domains)
@@ -7,12 +7,14 @@ import re
 import sqlite3
 
 from datetime import datetime
+from itertools import chain
 from pathlib import Path
 from urllib.parse import urlparse
 
+from lib import prevalence, sketch
 from lib.basedomain import extract
 from lib.mdfp import is_mdfp_first_party
-from lib.utils import run
+from lib.utils import run, stream
 
 
 db_filename = "badger.sqlite3"
@@ -27,6 +29,11 @@ site_statuses = {
     "error": 3,
     "antibot": 4,
 }
+# tables with trigram indexes for domain substring search
+search_indexes = {
+    "site": "fqdn",
+    "tracker": "base",
+}
 tracking_types = {}
 
 re_patterns = {
@@ -38,6 +45,50 @@ re_patterns = {
     "log_restart": re.compile("[Rr]estarting browser( )?\\.\\.\\.")
 }
 
+LEGACY_ERRORS = (
+    "Failed to get current URL (NoSuchWindowException)",
+    "Failed to switch windows (NoSuchWindowException)",
+    "Failed to switch windows (InvalidArgumentException)",
+    "Failed to switch windows (WebDriverException)",
+    "Failed to switch windows (Browsing context has been discarded)",
+    "Failed to switch windows (chrome not reachable", # sic
+    "Timed out waiting for new window",
+    "Failed to open new window (NoSuchWindowException)",
+    "Failed to open new window with window.open()",
+    "Failed to open new window",
+    "Error closing timed out window (WebDriverException)",
+    "Error closing timed out window (NoSuchWindowException)",
+    "Error closing timed out window",
+    "Closed all windows somehow",
+    "Failed to get window handles (WebDriverException)",
+    "Invalid session")
+
+# Combined patterns let us classify a line with a single regex call.
+#
+# Every alternative is prefixed with a lazy `.*?`, so the engine tries
+# each alternative against the entire line before moving on to the next.
+# This preserves the original order of precedence of the checks
+# (the first pattern to match anywhere in the line wins),
+# as opposed to the usual "leftmost match wins" alternation semantics.
+#
+# Use `matches.lastgroup` to see which alternative matched;
+# the alternative's own capture groups follow `matches.lastindex`.
+re_patterns["log_line"] = re.compile(
+    re_patterns["log_ts"].pattern + "(?:" + "|".join(
+        f".*?(?P<{name}>{re_patterns[name].pattern})" for name in (
+            "log_visiting", "log_restart",
+            "log_visited", "log_timeout", "log_error")) + ")?")
+
+re_patterns["error"] = re.compile("|".join(
+    [f".*?(?P<{name}>{pattern})" for name, pattern in (
+        ("log_error", re_patterns["log_error"].pattern),
+        ("ext_timeout", re.escape("Timed out loading extension page")),
+        ("ext_invalid_session", re.escape("InvalidSessionIdException loading extension page")),
+        ("ext_webdriver", re.escape("WebDriverException loading extension page:")),
+        ("ext_timeout_legacy", re.escape("Timed out loading skin/options.html")),
+        ("log_timeout", re_patterns["log_timeout"].pattern))] +
+    [f".*?(?P<legacy{i}>{re.escape(err)})" for i, err in enumerate(LEGACY_ERRORS)]))
+
 
 def get_browser(log_txt):
     if " 'browserName': 'chrome',\n" in log_txt:
@@ -67,6 +118,9 @@ def get_scan_id(cur, start_time, end_time, region, num_sites, browser, no_blocki
     return cur.lastrowid
 
 def create_tables(cur):
+    for table in search_indexes:
+        cur.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
     cur.execute("DROP TABLE IF EXISTS browser")
     cur.execute("""
         CREATE TABLE browser (
@@ -169,6 +223,37 @@ def create_tables(cur):
             FOREIGN KEY(tracking_type_id) REFERENCES tracking_type(id)
         )""")
 
+    sketch.create_tables(cur)
+
+def create_indexes(cur):
+    """Creates any missing indexes.
+
+    Substring searches on site and tracker domains (LIKE '%...%')
+    can't use regular indexes, so these tables get trigram full-text
+    indexes, kept up to date by insert triggers.
+    """
+    for table, field in search_indexes.items():
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (f"{table}_fts",))
+        if cur.fetchone():
+            continue
+        cur.execute(f"""
+            CREATE VIRTUAL TABLE {table}_fts USING fts5(
+                {field},
+                content='{table}',
+                content_rowid='id',
+                tokenize='trigram'
+            )""")
+        cur.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+        # sites and trackers are never updated or deleted
+        cur.execute(f"""
+            CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts (rowid, {field}) VALUES (new.id, new.{field});
+            END""")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS tracking_site_id ON tracking (site_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS tracking_tracker_id ON tracking (tracker_id)")
+
 def get_id(cur, table, field, value):
     cur.execute(f"SELECT id FROM {table} WHERE {field} = ?", (value,))
     row = cur.fetchone()
@@ -177,28 +262,21 @@ def get_id(cur, table, field, value):
     cur.execute(f"INSERT INTO {table} ({field}) VALUES (?)", (value,))
     return cur.lastrowid
 
+def parse_ts(line):
+    """Parses the timestamp at the start of a log line.
+
+    Same as datetime.strptime(line[:19], "%Y-%m-%d %H:%M:%S"), only faster.
+    """
+    return datetime(int(line[:4]), int(line[5:7]), int(line[8:10]),
+                    int(line[11:13]), int(line[14:16]), int(line[17:19]))
+
 def get_error_string(line):
     error = None
 
-    LEGACY_ERRORS = (
-        "Failed to get current URL (NoSuchWindowException)",
-        "Failed to switch windows (NoSuchWindowException)",
-        "Failed to switch windows (InvalidArgumentException)",
-        "Failed to switch windows (WebDriverException)",
-        "Failed to switch windows (Browsing context has been discarded)",
-        "Failed to switch windows (chrome not reachable", # sic
-        "Timed out waiting for new window",
-        "Failed to open new window (NoSuchWindowException)",
-        "Failed to open new window with window.open()",
-        "Failed to open new window",
-        "Error closing timed out window (WebDriverException)",
-        "Error closing timed out window (NoSuchWindowException)",
-        "Error closing timed out window",
-        "Closed all windows somehow",
-        "Failed to get window handles (WebDriverException)",
-        "Invalid session")
-
-    if re_patterns["log_error"].search(line):
+    matches = re_patterns["error"].match(line)
+    error_type = matches.lastgroup if matches else None
+
+    if error_type == "log_error":
         error = line[24:].split(" ")[0]
 
         # add more context for some errors
@@ -212,26 +290,20 @@ def get_error_string(line):
             error_parts = error.partition("about:neterror?")
             error = error_parts[0] + error_parts[1] + error_parts[2].partition("&u=")[0]
 
-    elif "Timed out loading extension page" in line:
+    elif error_type in ("ext_timeout", "ext_timeout_legacy"):
         error = "Extension timeout"
 
-    elif "InvalidSessionIdException loading extension page" in line:
+    elif error_type == "ext_invalid_session":
         error = "Extension InvalidSessionIdException"
 
-    elif "WebDriverException loading extension page:" in line:
+    elif error_type == "ext_webdriver":
         error = "Extension WebDriverException:" + line[24:].partition(":")[2]
 
-    elif "Timed out loading skin/options.html" in line:
-        error = "Extension timeout"
-
-    elif re_patterns["log_timeout"].search(line):
+    elif error_type == "log_timeout":
         error = "Timeout"
 
-    else:
-        for err in LEGACY_ERRORS:
-            if err in line:
-                error = err
-                break
+    elif error_type:
+        error = matches.group(error_type)
 
     return error
 
@@ -253,68 +325,80 @@ def get_status_string(match_type, line, full_matching_string):
 
     return status
 
-def ingest_log(cur, scan_id, log_txt):
+def ingest_log(cur, scan_id, log_lines):
+    """Ingests site visits and browser crashes from a scan log
+    in a single streaming pass.
+
+    :param log_lines: log.txt contents, either as a string or as
+        any iterable of lines (an open file, a `git show` stream, ...)
+    :return: the time of the last timestamped log line
+    """
     domain = None
     start_time = None
     prev_line = None
+    last_line = None
 
-    for line in log_txt.split('\n'):
-        if not re_patterns["log_ts"].match(line):
+    if isinstance(log_lines, str):
+        log_lines = log_lines.split('\n')
+
+    for line in log_lines:
+        line = line.rstrip('\n')
+
+        matches = re_patterns["log_line"].match(line)
+        if not matches:
             continue
 
-        if matches := re_patterns["log_visiting"].search(line):
-            domain = matches.group(1)
-            start_time = datetime.strptime(line[:19], "%Y-%m-%d %H:%M:%S")
+        last_line = line
+        match_type = matches.lastgroup
+
+        if match_type == 'log_visiting':
+            domain = matches.group(matches.lastindex + 1)
+            start_time = parse_ts(line)
             prev_line = line
             continue
 
-        if matches := re_patterns["log_restart"].search(line):
+        if match_type == 'log_restart':
             error = get_error_string(prev_line)
             error_id = get_id(cur, "error", "name", error)
             cur.execute("""INSERT INTO scan_crashes
                 (scan_id, error_id, time) VALUES (?,?,?)""", (
-                    scan_id, error_id,
-                    datetime.strptime(line[:19], "%Y-%m-%d %H:%M:%S")))
+                    scan_id, error_id, parse_ts(line)))
             prev_line = line
             continue
 
-        for match_type in ('log_visited', 'log_timeout', 'log_error'):
-            if matches := re_patterns[match_type].search(line):
-                if domain != matches.group(1):
-                    break
-
-                end_domain = domain
-                if len(matches.groups()) > 1 and matches.group(2):
-                    end_domain = urlparse(matches.group(2)).netloc
-                    end_domain = extract(end_domain).registered_domain or end_domain
-
-                end_time = datetime.strptime(line[:19], "%Y-%m-%d %H:%M:%S")
-
-                status = get_status_string(match_type, line, matches.group(0))
-
-                error_id = None
-                if match_type == 'log_error':
-                    error = get_error_string(line)
-                    error_id = get_id(cur, "error", "name", error)
-
-                cur.execute("""INSERT INTO scan_sites
-                    (scan_id,
-                    initial_site_id,
-                    final_site_id,
-                    status_id, error_id,
-                    start_time, end_time)
-                    VALUES (?,?,?,?,?,?,?)""", (
-                        scan_id,
-                        get_id(cur, "site", "fqdn", domain),
-                        get_id(cur, "site", "fqdn", end_domain),
-                        site_statuses[status], error_id,
-                        start_time, end_time))
-
-                break
+        if match_type and domain == matches.group(matches.lastindex + 1):
+            end_domain = domain
+            if match_type != 'log_error' and matches.group(matches.lastindex + 2):
+                end_domain = urlparse(matches.group(matches.lastindex + 2)).netloc
+                end_domain = extract(end_domain).registered_domain or end_domain
+
+            end_time = parse_ts(line)
+
+            status = get_status_string(match_type, line, matches.group(match_type))
+
+            error_id = None
+            if match_type == 'log_error':
+                error = get_error_string(line)
+                error_id = get_id(cur, "error", "name", error)
+
+            cur.execute("""INSERT INTO scan_sites
+                (scan_id,
+                initial_site_id,
+                final_site_id,
+                status_id, error_id,
+                start_time, end_time)
+                VALUES (?,?,?,?,?,?,?)""", (
+                    scan_id,
+                    get_id(cur, "site", "fqdn", domain),
+                    get_id(cur, "site", "fqdn", end_domain),
+                    site_statuses[status], error_id,
+                    start_time, end_time))
 
         if not line.endswith("Connection to remote host was lost. - goodbye"):
             prev_line = line
 
+    return parse_ts(last_line) if last_line else None
+
 def ingest_scan(cur, scan_id, snitch_map, tracking_map):
     for tracker_base, sites in snitch_map.items():
         tracker_id = get_id(cur, "tracker", "base", tracker_base)
@@ -394,60 +478,68 @@ def ingest_distributed_scans(badger_swarm_dir, cur):
                               True, False)
 
         for log_file in scan_path.glob(log_glob):
-            ingest_log(cur, scan_id, log_file.read_text())
+            with log_file.open(encoding="utf-8") as f:
+                ingest_log(cur, scan_id, f)
 
         for results_file in scan_path.glob(results_glob):
             results = json.loads(results_file.read_bytes())
             ingest_scan(cur, scan_id, results['snitch_map'],
                         results.get('tracking_map', {}))
 
+# pylint: disable-next=too-many-locals
 def ingest_daily_scans(cur):
     revisions = run("git rev-list HEAD -- log.txt".split(" "))
     if not revisions:
         return
 
     for rev in revisions.split('\n'):
-        log_txt = log_txt_full = run(f"git show {rev}:log.txt".split(" "))
-
-        end_time = datetime.strptime(
-                log_txt[log_txt.rindex("\n")+1:][:19], "%Y-%m-%d %H:%M:%S")
+        with stream(f"git show {rev}:log.txt".split(" ")) as log_lines:
+            # read just the scan summary at the top of the log
+            header_lines = []
+            for line in log_lines:
+                header_lines.append(line)
+                if "isiting 1:" in line:
+                    break
+            log_txt = "".join(header_lines).lstrip()
+            log_txt = log_txt[:log_txt.index("isiting 1:")]
 
-        # discard most of the log
-        log_txt = log_txt[:log_txt.index("isiting 1:")]
+            num_sites_idx = log_txt.index("domains to crawl: ")
+            num_sites = log_txt[num_sites_idx+18:log_txt.index("\n", num_sites_idx)]
 
-        num_sites_idx = log_txt.index("domains to crawl: ")
-        num_sites = log_txt[num_sites_idx+18:log_txt.index("\n", num_sites_idx)]
+            browser = get_browser(log_txt)
+            if browser not in browsers:
+                print(f"Skipping scan {rev}: unrecognized browser {browser}")
+                continue
 
-        browser = get_browser(log_txt)
-        if browser not in browsers:
-            print(f"Skipping scan {rev}: unrecognized browser {browser}")
-            continue
+            # skip non-default branch runs
+            branch_info_idx = log_txt.find("  Badger branch: ")
+            if branch_info_idx > -1:
+                branch = log_txt[branch_info_idx+17 : log_txt.index("\n", branch_info_idx+17)]
+                if branch not in ("master", "mv3-chrome"):
+                    continue
 
-        # skip non-default branch runs
-        branch_info_idx = log_txt.find("  Badger branch: ")
-        if branch_info_idx > -1:
-            branch = log_txt[branch_info_idx+17 : log_txt.index("\n", branch_info_idx+17)]
-            if branch not in ("master", "mv3-chrome"):
-                continue
+            start_time = parse_ts(log_txt)
 
-        start_time = datetime.strptime(log_txt[:19], "%Y-%m-%d %H:%M:%S")
+            no_blocking = False
+            if "  blocking: off\n" in log_txt:
+                no_blocking = True
 
-        no_blocking = False
-        if "  blocking: off\n" in log_txt:
-            no_blocking = True
+            # as scans are ordered from most recent to least,
+            # short-circuit upon encountering an already ingested scan
+            cur.execute("SELECT id FROM scan WHERE start_time = ? AND browser_id = ? "
+                        "AND no_blocking = ? AND daily_scan = 1",
+                        (start_time, browsers[browser], no_blocking))
+            if cur.fetchone():
+                return
 
-        # as scans are ordered from most recent to least,
-        # short-circuit upon encountering an already ingested scan
-        cur.execute("SELECT id FROM scan WHERE start_time = ? AND browser_id = ? "
-                    "AND no_blocking = ? AND daily_scan = 1",
-                    (start_time, browsers[browser], no_blocking))
-        if cur.fetchone():
-            return
+            # the end time comes from the last line of the log,
+            # so it gets filled in once we're done streaming the log
+            scan_id = get_scan_id(cur, start_time, start_time, "sfo1", num_sites,
+                                  browser, no_blocking, True)
 
-        scan_id = get_scan_id(cur, start_time, end_time, "sfo1", num_sites,
-                              browser, no_blocking, True)
+            end_time = ingest_log(cur, scan_id, chain(header_lines, log_lines))
 
-        ingest_log(cur, scan_id, log_txt_full)
+            cur.execute("UPDATE scan SET end_time = ? WHERE id = ?", (end_time, scan_id))
 
         results = json.loads(run(f"git show {rev}:results.json".split(" ")))
 
@@ -480,10 +572,18 @@ if __name__ == '__main__':
         print("Ingesting daily scans...")
         ingest_daily_scans(cur)
 
+        print("Indexing...")
+        create_indexes(cur)
+
+        print("Sketching...")
+        sketch.update_sketches(cur)
+
         cur.execute("SELECT COUNT(*) FROM scan")
         print(f"{'Rebuilt' if rebuild else 'Updated'} {db_filename} with data "
               f"from {int(cur.fetchone()[0]) - num_scans} scans")
 
-        # TODO generate prevalence data for validate.py
+        print("Snapshotting prevalence...")
+        num_trackers = prevalence.write_snapshot(cur)
+        print(f"Wrote {prevalence.SNAPSHOT_FILENAME} with {num_trackers} trackers")
 
         print("All done")
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+"""Columnar archive of tracking observations.
+
+The tracking table gets exported into memory-mappable NumPy arrays,
+one dictionary-encoded integer column per tracking table column,
+with rows grouped by scan. Sites, trackers, etc. are encoded by their
+badger.sqlite3 row IDs; the ID to name dictionaries are stored
+alongside the arrays.
+
+Queries run as vectorized operations over the mapped arrays,
+without loading SQLite rows one by one.
+"""
+
+import json
+import os
+
+from datetime import datetime
+
+import numpy as np
+
+
+ARCHIVE_VERSION = 1
+
+COLUMNS = {
+    "scan": np.int32,
+    "site": np.int32,
+    "tracker": np.int32,
+    # 0 stands for NULL (no tracking type recorded)
+    "tracking_type": np.int16,
+}
+
+SCAN_DTYPE = np.dtype([
+    ("id", np.int32),
+    # seconds since the epoch
+    ("start_time", np.int64),
+    ("end_time", np.int64),
+    ("browser", np.int8),
+    ("region", np.int16),
+    ("no_blocking", np.bool_),
+    ("daily_scan", np.bool_),
+    # where this scan's rows are found in the tracking columns
+    ("offset", np.int64),
+    ("count", np.int64),
+])
+
+
+def to_epoch(ts):
+    if isinstance(ts, datetime):
+        return int(ts.timestamp())
+    return int(datetime.fromisoformat(str(ts)).timestamp())
+
+
+def _save(path, arr):
+    # write atomically so that readers never see a partial array
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, arr)
+    os.replace(tmp_path, path)
+
+
+def _load_dictionary(cur, table, field):
+    """Returns a list of names indexed by row ID."""
+    cur.execute(f"SELECT MAX(id) FROM {table}")
+    names = [None] * ((cur.fetchone()[0] or 0) + 1)
+    for rowid, name in cur.execute(f"SELECT id, {field} FROM {table}"):
+        names[rowid] = name
+    return names
+
+
+# pylint: disable-next=too-many-locals
+def export(cur, out_dir):
+    """Exports scans not yet in the archive at `out_dir`.
+
+    Scans are only ever appended to badger.sqlite3, so only new scans
+    get exported. The archive is rebuilt from scratch when the database
+    was rebuilt since the last export.
+
+    :return: the number of newly exported scans
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    scans = np.zeros(0, dtype=SCAN_DTYPE)
+    columns = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    meta_path = os.path.join(out_dir, "meta.json")
+    if os.path.isfile(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") == ARCHIVE_VERSION:
+            scans = np.load(os.path.join(out_dir, "scans.npy"))
+            columns = {name: np.load(os.path.join(out_dir, f"tracking.{name}.npy"))
+                       for name in COLUMNS}
+
+    # discard the archive if the database has been rebuilt since
+    if len(scans):
+        cur.execute("SELECT start_time FROM scan WHERE id = ?", (int(scans[-1]['id']),))
+        row = cur.fetchone()
+        if not row or to_epoch(row[0]) != scans[-1]['start_time']:
+            scans = scans[:0]
+            columns = {name: col[:0] for name, col in columns.items()}
+
+    regions = [None]
+    if len(scans):
+        regions = meta['dictionaries']['region']
+
+    last_scan_id = int(scans[-1]['id']) if len(scans) else 0
+
+    new_scans = []
+    new_columns = {name: [] for name in COLUMNS}
+    offset = len(columns['scan'])
+
+    cur.execute("SELECT id, start_time, end_time, browser_id, region, "
+                "no_blocking, daily_scan FROM scan WHERE id > ? ORDER BY id",
+                (last_scan_id,))
+    for scan_id, start_time, end_time, browser_id, region, no_blocking, daily_scan in cur.fetchall():
+        if region not in regions:
+            regions.append(region)
+
+        rows = np.array(cur.execute(
+            "SELECT site_id, tracker_id, COALESCE(tracking_type_id, 0) "
+            "FROM tracking WHERE scan_id = ?", (scan_id,)).fetchall(),
+            dtype=np.int64).reshape(-1, 3)
+
+        new_columns['scan'].append(np.full(len(rows), scan_id, dtype=COLUMNS['scan']))
+        new_columns['site'].append(rows[:, 0].astype(COLUMNS['site']))
+        new_columns['tracker'].append(rows[:, 1].astype(COLUMNS['tracker']))
+        new_columns['tracking_type'].append(rows[:, 2].astype(COLUMNS['tracking_type']))
+
+        new_scans.append((scan_id, to_epoch(start_time), to_epoch(end_time),
+                          browser_id, regions.index(region),
+                          no_blocking, daily_scan, offset, len(rows)))
+        offset += len(rows)
+
+    if new_scans:
+        scans = np.concatenate((scans, np.array(new_scans, dtype=SCAN_DTYPE)))
+        for name in COLUMNS:
+            columns[name] = np.concatenate([columns[name]] + new_columns[name])
+
+    for name in COLUMNS:
+        _save(os.path.join(out_dir, f"tracking.{name}.npy"), columns[name])
+    _save(os.path.join(out_dir, "scans.npy"), scans)
+
+    meta = {
+        "version": ARCHIVE_VERSION,
+        "dictionaries": {
+            "site": _load_dictionary(cur, "site", "fqdn"),
+            "tracker": _load_dictionary(cur, "tracker", "base"),
+            "tracking_type": _load_dictionary(cur, "tracking_type", "name"),
+            "browser": _load_dictionary(cur, "browser", "name"),
+            "region": regions,
+        }
+    }
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    return len(new_scans)
+
+
+class Archive:
+    """Read-only, memory-mapped view of an exported archive."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.dictionaries = meta['dictionaries']
+        self.scans = np.load(os.path.join(path, "scans.npy"))
+        self.columns = {name: np.load(os.path.join(path, f"tracking.{name}.npy"), mmap_mode='r')
+                        for name in COLUMNS}
+
+        # scan ID -> position in self.scans
+        self._scan_idx = np.full(
+            (int(self.scans['id'].max()) + 1) if len(self.scans) else 1, -1, dtype=np.int64)
+        self._scan_idx[self.scans['id']] = np.arange(len(self.scans))
+
+        self._codes = {}
+
+    def encode(self, dictionary, name):
+        """Returns the integer code for `name`, or -1 if not found."""
+        if dictionary not in self._codes:
+            self._codes[dictionary] = {
+                val: i for i, val in enumerate(self.dictionaries[dictionary])}
+        return self._codes[dictionary].get(name, -1)
+
+    # pylint: disable-next=too-many-arguments
+    def select_scans(self, since=None, until=None, browsers=None,
+                     no_blocking=None, daily_scan=None):
+        """Returns a boolean mask over self.scans."""
+        mask = np.ones(len(self.scans), dtype=bool)
+        if since is not None:
+            mask &= self.scans['start_time'] > to_epoch(since)
+        if until is not None:
+            mask &= self.scans['start_time'] <= to_epoch(until)
+        if browsers:
+            mask &= np.isin(self.scans['browser'],
+                            [self.encode("browser", b) for b in browsers])
+        if no_blocking is not None:
+            mask &= self.scans['no_blocking'] == no_blocking
+        if daily_scan is not None:
+            mask &= self.scans['daily_scan'] == daily_scan
+        return mask
+
+    def select_rows(self, scan_mask=None, tracking_type=None):
+        """Returns the indices of tracking rows belonging to selected scans."""
+        if scan_mask is None:
+            scan_mask = np.ones(len(self.scans), dtype=bool)
+
+        # rows are grouped by scan, in scan order
+        idx = np.flatnonzero(np.repeat(scan_mask, self.scans['count']))
+
+        if tracking_type is not None:
+            type_id = self.encode("tracking_type", tracking_type)
+            idx = idx[self.columns['tracking_type'][idx] == type_id]
+
+        return idx
+
+    def _num_distinct_sites(self, trackers, sites):
+        """Counts distinct sites per tracker ID."""
+        num_sites = len(self.dictionaries['site'])
+        pairs = np.unique(trackers.astype(np.int64) * num_sites + sites)
+        return np.bincount(pairs // num_sites,
+                           minlength=len(self.dictionaries['tracker']))
+
+    def prevalence(self, limit=None, tracking_type=None, **scan_filters):
+        """Returns (tracker base, number of distinct sites) tuples,
+        most prevalent first."""
+        rows = self.select_rows(self.select_scans(**scan_filters), tracking_type)
+        counts = self._num_distinct_sites(
+            self.columns['tracker'][rows], self.columns['site'][rows])
+
+        ranked = np.argsort(-counts, kind='stable')
+        ranked = ranked[counts[ranked] > 0][:limit]
+
+        return [(self.dictionaries['tracker'][i], int(counts[i])) for i in ranked]
+
+    def total_sites(self, **scan_filters):
+        """Returns the number of distinct sites with tracking in selected scans."""
+        rows = self.select_rows(self.select_scans(**scan_filters))
+        return len(np.unique(self.columns['site'][rows]))
+
+    def first_last_seen(self, trackers=None, **scan_filters):
+        """Returns {tracker base: (first seen, last seen)} datetimes."""
+        rows = self.select_rows(self.select_scans(**scan_filters))
+        tracker_ids = self.columns['tracker'][rows]
+        times = self.scans['start_time'][self._scan_idx[self.columns['scan'][rows]]]
+
+        if trackers is not None:
+            wanted = np.isin(tracker_ids, [self.encode("tracker", t) for t in trackers])
+            tracker_ids, times = tracker_ids[wanted], times[wanted]
+
+        first = np.full(len(self.dictionaries['tracker']), np.iinfo(np.int64).max)
+        last = np.full(len(self.dictionaries['tracker']), np.iinfo(np.int64).min)
+        np.minimum.at(first, tracker_ids, times)
+        np.maximum.at(last, tracker_ids, times)
+
+        return {
+            self.dictionaries['tracker'][i]: (
+                datetime.fromtimestamp(first[i]), datetime.fromtimestamp(last[i]))
+            for i in np.flatnonzero(last > np.iinfo(np.int64).min)
+        }
+
+    def co_occurrence(self, tracker, limit=None, **scan_filters):
+        """Returns (tracker base, number of distinct sites) tuples
+        for trackers seen on the same site in the same scan
+        as the given tracker, most frequent first."""
+        rows = self.select_rows(self.select_scans(**scan_filters))
+        scan_ids = self.columns['scan'][rows].astype(np.int64)
+        sites = self.columns['site'][rows]
+        tracker_ids = self.columns['tracker'][rows]
+
+        # (scan, site) visit keys
+        visits = scan_ids * len(self.dictionaries['site']) + sites
+        tracker_id = self.encode("tracker", tracker)
+        shared = np.isin(visits, np.unique(visits[tracker_ids == tracker_id]))
+
+        counts = self._num_distinct_sites(tracker_ids[shared], sites[shared])
+        counts[tracker_id] = 0
+
+        ranked = np.argsort(-counts, kind='stable')
+        ranked = ranked[counts[ranked] > 0][:limit]
+
+        return [(self.dictionaries['tracker'][i], int(counts[i])) for i in ranked]
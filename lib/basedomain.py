@@ -1,32 +1,221 @@
 #!/usr/bin/env python3
 
+"""Registered domain (eTLD+1) lookups.
+
+Gives the same results as tldextract with include_psl_private_domains,
+but matches labels against a trie of Public Suffix List rules, memoizes
+lookups, and keeps the compiled trie around between runs. The PSL gets
+refreshed weekly; when that fails, the last compiled trie (or else the
+PSL snapshot bundled with tldextract) keeps getting used.
+"""
+
+import functools
+import hashlib
 import os
-import shutil
-import tempfile
-import tldextract
+import pickle
+import pkgutil
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import idna
+
+from tldextract.remote import SCHEME_RE, looks_like_ip
+from tldextract.suffix_list import extract_tlds_from_suffix_list
+from tldextract.tldextract import ExtractResult
+
+PSL_URL = "https://publicsuffix.org/list/public_suffix_list.dat"
+
+# bump when changing the trie format
+TRIE_VERSION = 1
+
+# refresh the PSL after one week
+PSL_EXPIRE_SECS = 7 * 24 * 60 * 60
+
+MEMO_SIZE = 2 ** 18
+
+_url_chars_re = re.compile(r'[/?#@:]')
+
+# trie node flags
+EXACT = 1
+EXCEPTION = 2
+WILDCARD = 4
+
+# alongside the processed blocklists, rather than in a shared temp dir
+# where anyone could leave a pickle for us to load
+_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lists", ".cache")
+
+# (PSL version, trie root)
+_psl = None
+_init_lock = threading.Lock()
+
+
+def compile_trie(suffixes):
+    """Compiles PSL rules into a trie of reversed labels.
+
+    Nodes are [children, flags] lists, where children is a dict
+    of labels to nodes, and flags say whether the labels that lead to
+    the node are a rule (EXACT), an exception rule (EXCEPTION),
+    and whether any label under it is a rule (WILDCARD).
+    """
+    root = [{}, 0]
+
+    def insert(labels, flag):
+        node = root
+        for label in reversed(labels):
+            node = node[0].setdefault(label, [{}, 0])
+        node[1] |= flag
+
+    for suffix in suffixes:
+        insert(suffix.split("."), EXACT)
+        if suffix.startswith("!"):
+            insert(suffix[1:].split("."), EXCEPTION)
+        elif suffix.startswith("*."):
+            insert(suffix[2:].split("."), WILDCARD)
+
+    return root
+
+
+def _fetch_psl():
+    req = urllib.request.Request(PSL_URL, headers={'User-Agent':'Mozilla/5.0'})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as conn:
+            return conn.read().decode('utf-8')
+    except (urllib.error.URLError, OSError) as e:
+        print(f"WARNING Failed to fetch the Public Suffix List: {e}", file=sys.stderr)
+    return None
 
-from datetime import datetime, timedelta
 
-_extract = None
+def compile_psl(text):
+    """Returns the (version, trie) of Public Suffix List text."""
+    public_suffixes, private_suffixes = extract_tlds_from_suffix_list(text)
+    return (hashlib.sha256(text.encode('utf-8')).hexdigest(),
+            compile_trie(public_suffixes + private_suffixes))
 
-def extract(domain):
-    global _extract
 
-    # lazy init
-    if not _extract:
-        cache_dir = os.path.join(tempfile.gettempdir(), "python-tldextract")
+def _load_psl():
+    filename = os.path.join(_cache_dir, f"psl-trie-v{TRIE_VERSION}.pickle")
 
-        # expire PSL cache after one week
+    psl = None
+    try:
+        with open(filename, 'rb') as file:
+            psl = pickle.load(file)
+        if time.time() - os.path.getmtime(filename) < PSL_EXPIRE_SECS:
+            return psl
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        pass
+
+    text = _fetch_psl()
+    if text is None:
+        # keep using the outdated list, if any
+        if psl:
+            return psl
+        return compile_psl(pkgutil.get_data("tldextract", ".tld_set_snapshot").decode('utf-8'))
+
+    psl = compile_psl(text)
+    os.makedirs(_cache_dir, exist_ok=True)
+    with open(filename + ".tmp", 'wb') as file:
+        pickle.dump(psl, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(filename + ".tmp", filename)
+
+    return psl
+
+
+def _get_psl():
+    global _psl
+
+    # lazy init (lists may get parsed in parallel threads)
+    if not _psl:
+        with _init_lock:
+            if not _psl:
+                _psl = _load_psl()
+
+    return _psl
+
+
+def psl_version():
+    """Returns the hash of the Public Suffix List in use."""
+    return _get_psl()[0]
+
+
+def _decode_punycode(label):
+    lowered = label.lower()
+    if lowered.startswith("xn--"):
         try:
-            mtime = os.stat(cache_dir).st_mtime
-        except FileNotFoundError:
+            return idna.decode(label.encode("ascii")).lower()
+        except (UnicodeError, IndexError):
             pass
-        else:
-            elapsed_time = datetime.now() - datetime.fromtimestamp(mtime)
-            if elapsed_time >= timedelta(weeks=1):
-                shutil.rmtree(cache_dir)
+    return lowered
+
+
+def suffix_index(labels):
+    """Returns the index of the first public suffix label
+    in a list of lowercase labels, or len(labels) if there is none."""
+    node = _get_psl()[1]
+    index = len(labels)
+    # the longest match wins, so keep going for as long as the trie does
+    for i in range(len(labels) - 1, -1, -1):
+        wildcard = node[1] & WILDCARD
+        node = node[0].get(labels[i])
+        if node is None:
+            if wildcard:
+                index = i
+            break
+        if node[1] & EXCEPTION:
+            index = i + 1
+        elif node[1] & EXACT or wildcard:
+            index = i
+    return index
+
+
+def _netloc(url):
+    # fast path for plain hostnames
+    if not _url_chars_re.search(url):
+        return url.strip().rstrip(".")
+    return (
+        SCHEME_RE.sub("", url)
+        .partition("/")[0]
+        .partition("?")[0]
+        .partition("#")[0]
+        .split("@")[-1]
+        .partition(":")[0]
+        .strip()
+        .rstrip(".")
+    )
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def extract(url):
+    """Splits a hostname (or URL) into subdomain, domain and suffix,
+    like tldextract.extract()."""
+    netloc = _netloc(url)
+    labels = netloc.split(".")
+
+    lowered = netloc.lower()
+    if "xn--" in lowered or not lowered.isascii():
+        index = suffix_index([_decode_punycode(label) for label in labels])
+    else:
+        index = suffix_index(lowered.split("."))
+
+    suffix = ".".join(labels[index:])
+    if not suffix and netloc and looks_like_ip(netloc):
+        return ExtractResult("", netloc, "")
+
+    subdomain = ".".join(labels[:index - 1]) if index else ""
+    domain = labels[index - 1] if index else ""
+    return ExtractResult(subdomain, domain, suffix)
 
-        _extract = tldextract.TLDExtract(cache_dir=cache_dir,
-                                         include_psl_private_domains=True)
 
-    return _extract(domain)
+def registered_domains(domains):
+    """Returns the registered domain (or "") of every domain, in order."""
+    cache = {}
+    result = []
+    for domain in domains:
+        base = cache.get(domain)
+        if base is None:
+            base = cache[domain] = extract(domain).registered_domain
+        result.append(base)
+    return result
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""Hands out small batches of sites to crawler workers, reassigning
+the batches of workers that stall, and collects their results.
+
+Workers connect over a local socket (or TCP, for other machines), with
+connections authenticated by a shared key (see AUTHKEY_ENV). Every worker
+sends its cumulative results and new log lines after every batch, which
+get saved the way initdb.py expects distributed scans to look:
+one results.NNN.json and log.NNN.txt per worker, plus run_settings.ini.
+"""
+
+import json
+import os
+import threading
+import time
+
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+AUTHKEY_ENV = "BADGER_SETT_AUTHKEY"
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    """Parses HOST:PORT (or just PORT) into a (host, port) tuple."""
+    host, _, port = str(address).rpartition(":")
+    return (host or default_host, int(port))
+
+
+class BatchQueue:
+    """Batches of sites, and which worker is working on which batch.
+
+    A batch is leased to a worker until the worker completes it.
+    A worker that makes no progress (finishes no site) on a batch for
+    `stall_timeout` seconds loses the lease, and the batch goes to the
+    next worker that asks for work.
+    """
+
+    def __init__(self, domains, batch_size=10, stall_timeout=600, clock=time.monotonic):
+        self.batches = [domains[i:i + batch_size] for i in range(0, len(domains), batch_size)]
+        self.pending = deque(range(len(self.batches)))
+        # batch id -> [worker, number of sites done, deadline]
+        self.leases = {}
+        self.completed = set()
+        self.num_reassigned = 0
+        self.stall_timeout = stall_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    @property
+    def done(self):
+        return len(self.completed) == len(self.batches)
+
+    def _reclaim_stalled(self):
+        now = self.clock()
+        for batch_id, (_, _, deadline) in list(self.leases.items()):
+            if deadline <= now:
+                del self.leases[batch_id]
+                # redo the whole batch: results for the sites the worker
+                # finished only get sent once the batch is complete
+                self.pending.appendleft(batch_id)
+                self.num_reassigned += 1
+
+    def take(self, worker):
+        """Returns (batch id, sites) for the worker to visit,
+        or None if there is nothing to do right now."""
+        with self.lock:
+            self._reclaim_stalled()
+            while self.pending:
+                batch_id = self.pending.popleft()
+                if batch_id in self.completed:
+                    continue
+                self.leases[batch_id] = [worker, 0, self.clock() + self.stall_timeout]
+                return batch_id, self.batches[batch_id]
+            return None
+
+    def progress(self, worker, batch_id):
+        """Records that the worker finished another site of the batch."""
+        with self.lock:
+            lease = self.leases.get(batch_id)
+            if lease and lease[0] == worker:
+                lease[1] += 1
+                lease[2] = self.clock() + self.stall_timeout
+
+    def complete(self, worker, batch_id):
+        """Marks the batch done. Returns False if another worker
+        already completed it, or if the batch was taken away from
+        this worker and has not been picked up again yet."""
+        with self.lock:
+            if batch_id in self.completed:
+                return False
+            lease = self.leases.get(batch_id)
+            if lease and lease[0] != worker:
+                # the new worker will finish the batch
+                return False
+            self.leases.pop(batch_id, None)
+            if batch_id in self.pending:
+                self.pending.remove(batch_id)
+            self.completed.add(batch_id)
+            return True
+
+
+class Coordinator:
+    """Serves a BatchQueue to workers, saving what they send to `out_dir`."""
+
+    def __init__(self, queue, out_dir, address=("127.0.0.1", 0), authkey=None, logger=None):
+        self.queue = queue
+        self.out_dir = out_dir
+        self.listener = Listener(address, authkey=authkey)
+        self.logger = logger
+        self.num_workers = 0
+        self.num_connected = 0
+        self.finished = threading.Event()
+        self.lock = threading.Lock()
+        if queue.done:
+            self.finished.set()
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def wait(self, timeout=None):
+        """Waits for all batches to get completed; returns whether they were."""
+        return self.finished.wait(timeout)
+
+    def close(self):
+        self.listener.close()
+
+    def _log(self, msg, *args):
+        if self.logger:
+            self.logger.info(msg, *args)
+
+    def _accept(self):
+        while not self.finished.is_set():
+            try:
+                conn = self.listener.accept()
+            except (AuthenticationError, OSError):
+                continue
+            with self.lock:
+                worker = self.num_workers
+                self.num_workers += 1
+                self.num_connected += 1
+            threading.Thread(target=self._serve, args=(conn, worker), daemon=True).start()
+
+    def _serve(self, conn, worker):
+        self._log("Worker %03d connected", worker)
+        try:
+            while True:
+                msg = conn.recv()
+                conn.send(self._handle(worker, *msg))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            with self.lock:
+                self.num_connected -= 1
+            self._log("Worker %03d disconnected", worker)
+
+    def _handle(self, worker, command, *args):
+        if command == "hello":
+            return {"worker": worker}
+
+        if command == "take":
+            if self.queue.done:
+                return {"done": True}
+            num_reassigned = self.queue.num_reassigned
+            batch = self.queue.take(worker)
+            if self.queue.num_reassigned > num_reassigned:
+                self._log("Reassigning %d stalled batches",
+                          self.queue.num_reassigned - num_reassigned)
+            if not batch:
+                # everything's been handed out; check back in case a worker stalls
+                return {"wait": min(5, self.queue.stall_timeout)}
+            return {"batch_id": batch[0], "domains": batch[1]}
+
+        if command == "progress":
+            self.queue.progress(worker, args[0])
+            return {}
+
+        if command == "complete":
+            batch_id, results, log_text = args
+            # results are cumulative, so keep them even for batches
+            # some other worker completed in the meantime
+            if results is not None:
+                self.save_results(worker, results)
+            self.save_log(worker, log_text)
+            if self.queue.complete(worker, batch_id):
+                self._log("Worker %03d completed batch %d (%d/%d)", worker, batch_id,
+                          len(self.queue.completed), len(self.queue.batches))
+            if self.queue.done:
+                self.finished.set()
+            return {}
+
+        if command == "finish":
+            self.save_log(worker, args[0])
+            return {}
+
+        raise ValueError(f"Unknown command {command}")
+
+    def results_path(self, worker):
+        return os.path.join(self.out_dir, f"results.{worker:03d}.json")
+
+    def save_results(self, worker, results):
+        path = self.results_path(worker)
+        with open(path + ".tmp", 'w', encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True, separators=(',', ': '))
+        os.replace(path + ".tmp", path)
+
+    def save_log(self, worker, log_text):
+        if not log_text:
+            return
+        with open(os.path.join(self.out_dir, f"log.{worker:03d}.txt"), 'a', encoding="utf-8") as f:
+            f.write(log_text)
+
+
+class WorkerClient:
+    """A worker's connection to a Coordinator."""
+
+    def __init__(self, address, authkey=None):
+        self.conn = Client(address, authkey=authkey)
+        self.worker = self._request("hello")["worker"]
+
+    def _request(self, *msg):
+        self.conn.send(msg)
+        return self.conn.recv()
+
+    def take(self):
+        """Returns (batch id, sites) to visit next,
+        waiting for work if need be, or None once the scan is done."""
+        while True:
+            response = self._request("take")
+            if response.get("done"):
+                return None
+            if "wait" in response:
+                time.sleep(response["wait"])
+                continue
+            return response["batch_id"], response["domains"]
+
+    def progress(self, batch_id):
+        self._request("progress", batch_id)
+
+    def complete(self, batch_id, results, log_text):
+        self._request("complete", batch_id, results, log_text)
+
+    def finish(self, log_text):
+        self._request("finish", log_text)
+        self.conn.close()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+"""Incremental parsing of large JSON objects.
+
+Reads a JSON object a chunk at a time, decoding the members of nested
+objects one by one, so that only one member needs to be in memory.
+"""
+
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_whitespace_re = re.compile(r'[ \t\n\r]*')
+# an object member's key (without escapes), up to its value
+_key_re = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*')
+# what follows an object member
+_next_re = re.compile(r'[ \t\n\r]*([,}])')
+
+_number_chars = frozenset("-+.eE0123456789")
+
+
+def _incomplete(buf, start, end):
+    """Whether the value decoded from buf[start:end] may continue past
+    the end of the buffer. Numbers cut off at the buffer's end may
+    decode fine, just without their fraction or exponent."""
+    if end >= len(buf) - 1:
+        return True
+    return buf[start] in _number_chars and buf[end] in _number_chars
+
+
+class _Reader:
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self):
+        """Reads more data, at least doubling the buffer
+        so that long values don't get reparsed too many times."""
+        chunk = self.file.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _whitespace_re.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at {self.pos}, found {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            if _incomplete(self.buf, self.pos, end) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+class ObjectStream:
+    """Iterates over (key, value) members of a JSON object being read."""
+
+    def __init__(self, reader):
+        self._reader = reader
+        self._done = False
+        reader.expect("{")
+        if reader.peek() == "}":
+            reader.pos += 1
+            self._done = True
+
+    def __iter__(self):
+        reader = self._reader
+        while not self._done:
+            # fast path, for when the whole member is in the buffer
+            match = _key_re.match(reader.buf, reader.pos)
+            if match:
+                key = match.group(1)
+                reader.pos = match.end()
+            else:
+                key = reader.value()
+                reader.expect(":")
+
+            try:
+                value, end = _decoder.raw_decode(reader.buf, reader.pos)
+            except json.JSONDecodeError:
+                end = None
+            if end is None or _incomplete(reader.buf, reader.pos, end):
+                value = reader.value()
+            else:
+                reader.pos = end
+
+            match = _next_re.match(reader.buf, reader.pos)
+            if match:
+                reader.pos = match.end()
+                self._done = match.group(1) == "}"
+            elif reader.peek() == ",":
+                reader.pos += 1
+            else:
+                reader.expect("}")
+                self._done = True
+
+            yield key, value
+
+    def skip(self):
+        for _ in self:
+            pass
+
+
+def iter_object(file, chunk_size=1 << 20):
+    """Iterates over the (key, value) members of the JSON object in `file`.
+
+    Values that are objects themselves come as ObjectStream iterators,
+    and must be consumed before moving on to the next member
+    (or they get skipped).
+    """
+    reader = _Reader(file, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if reader.peek() == "{":
+            stream = ObjectStream(reader)
+            yield key, stream
+            stream.skip()
+        else:
+            yield key, reader.value()
+
+        if reader.peek() == ",":
+            reader.pos += 1
+        else:
+            reader.expect("}")
+            return
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+"""The registered domains and roots of the domains in a set of results,
+shared by the linters so that each domain only gets looked up once."""
+
+from lib.basedomain import extract
+
+
+class DomainIndex:
+    """Hostname -> (registered domain, root) lookups, where the root is
+    the registered domain's label below the public suffix
+    (for example, "example" for www.example.co.uk).
+
+    Hostnames without a registered domain (IP addresses, no-dots strings)
+    stand in for their own registered domain, and hostnames without
+    a root use their first label.
+    """
+
+    def __init__(self, hostnames=()):
+        self._bases = {}
+        self._roots = {}
+        for hostname in hostnames:
+            self.get(hostname)
+
+    @classmethod
+    def from_results(cls, results):
+        """Indexes the tracker bases, sites and fingerprinter domains."""
+        snitch_map = results.get('snitch_map', {})
+        return cls(set(snitch_map).union(
+            results.get('fp_scripts', {}),
+            (site for sites in snitch_map.values() for site in sites)))
+
+    def __len__(self):
+        return len(self._roots)
+
+    def get(self, hostname):
+        """Returns the (registered domain, root) of the hostname."""
+        if hostname not in self._roots:
+            ext = extract(hostname)
+            self._bases[hostname] = ext.registered_domain or hostname
+            self._roots[hostname] = ext.domain or hostname.partition('.')[0]
+        return self._bases[hostname], self._roots[hostname]
+
+    def base(self, hostname):
+        try:
+            return self._bases[hostname]
+        except KeyError:
+            return self.get(hostname)[0]
+
+    def root(self, hostname):
+        try:
+            return self._roots[hostname]
+        except KeyError:
+            return self.get(hostname)[1]
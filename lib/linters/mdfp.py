@@ -1,20 +1,33 @@
 #!/usr/bin/env python3
 
+import math
 import re
+import time
+
+from collections import Counter, defaultdict
+from itertools import chain
 
 import colorama
 
 from lib.basedomain import extract
+from lib.linters.domains import DomainIndex
 
 
 C_YELLOW = colorama.Style.BRIGHT + colorama.Fore.YELLOW
 C_RESET = colorama.Style.RESET_ALL
 
+MIN_SHARED_ROOTS = 3
+# trackers on more sites than this need proportionally more shared roots
+SMALL_TRACKER_ROOTS = 12
+# seconds to spend on looking for shared roots of larger trackers
+TIME_BUDGET = 60
+
+
+def get_root(domain):
+    return extract(domain).domain or domain.partition('.')[0]
 
-def get_shared_base_root(base):
-    tracker_root = extract(base).domain
-    if not tracker_root:
-        tracker_root = base.partition('.')[0]
+def get_shared_base_root(base, root=get_root):
+    tracker_root = root(base)
     sbr = tracker_root
     for s in ("static", "cdn", "media", "assets", "images", "img", "storage", "files", "edge", "cache", "st"):
         sbr = sbr.replace("-" + s, "").replace(s + "-", "").replace(s, "")
@@ -23,28 +36,52 @@ def get_shared_base_root(base):
             sbr = tracker_root
     return sbr
 
-def get_site_roots(sites):
-    site_roots = []
-
-    for site in sites:
-        site_root = extract(site).domain
-        if not site_root:
-            site_root = site.partition('.')[0]
-        site_roots.append(site_root)
-
-    return site_roots
-
-def get_shared_roots(site_roots, sbr):
-    MIN_SHARED_ROOTS = 3
-
-    shared_roots = [
-        root for root in set(site_roots)
-        if site_roots.count(root) >= MIN_SHARED_ROOTS
-    ] if len(site_roots) <= 12 else []
+def get_site_roots(sites, root=get_root):
+    return [root(site) for site in sites]
+
+class RootIndex:
+    """Inverted index of roots by the trigrams they contain, for counting
+    the site roots a tracker root is found inside of without going over
+    every site root of every tracker."""
+
+    def __init__(self, roots):
+        self._trigrams = defaultdict(list)
+        for root in set(roots):
+            for trigram in {root[i:i + 3] for i in range(len(root) - 2)}:
+                self._trigrams[trigram].append(root)
+
+    def candidates(self, string):
+        """Returns roots that might contain `string` (at least three
+        characters long), as a superset of the roots that do."""
+        return min((self._trigrams.get(string[i:i + 3], ()) for i in range(len(string) - 2)),
+                   key=len)
+
+def get_shared_roots(root_counts, sbr, root_index=None, scale=True):
+    """Returns the roots shared by at least MIN_SHARED_ROOTS site roots,
+    or by the same proportion of site roots for trackers on more than
+    SMALL_TRACKER_ROOTS sites, plus the tracker's own (shared base)
+    root if it is found inside at least MIN_SHARED_ROOTS site roots.
+
+    :param root_counts: Counter of site roots, including sbr
+    :param root_index: RootIndex of (at least) these roots
+    :param scale: whether to look for shared roots among more than
+        SMALL_TRACKER_ROOTS site roots
+    """
+    num_roots = root_counts.total()
+    shared_roots = []
+    if scale or num_roots <= SMALL_TRACKER_ROOTS:
+        min_count = max(MIN_SHARED_ROOTS, math.ceil(
+            num_roots * MIN_SHARED_ROOTS / SMALL_TRACKER_ROOTS))
+        shared_roots = [root for root, count in root_counts.items() if count >= min_count]
 
     # also see if sbr is found inside MIN_SHARED_ROOTS site_roots
-    if sbr not in shared_roots:
-        num_substr_matches = len([True for site_root in site_roots if sbr in site_root])
+    # (one and two character roots get removed below anyway)
+    if sbr not in shared_roots and len(sbr) > 2:
+        candidates = root_counts
+        if root_index:
+            # whichever has fewer roots to check
+            candidates = min(root_index.candidates(sbr), root_counts, key=len)
+        num_substr_matches = sum(root_counts.get(root, 0) for root in candidates if sbr in root)
         if num_substr_matches >= MIN_SHARED_ROOTS:
             shared_roots.append(sbr)
 
@@ -80,32 +117,65 @@ def highlight_common_roots(base, sites, shared_roots):
 
     return formatted_base, formatted_sites, num_other_sites
 
-def print_warnings(snitch_map):
+def format_candidate(base, sites, shared_roots):
+    fbase, fsites, count_other = highlight_common_roots(base, sites, shared_roots)
+
+    sites = ", ".join(fsites)
+    s = "s" if count_other > 1 else ""
+    other_sites = f", and {count_other} other site{s}" if count_other else ""
+    return f"  {fbase} on {sites}{other_sites}"
+
+def lint(results, domains, time_budget=TIME_BUDGET):
     """Looks for and warns about common "roots" (base minus PSL TLD).
 
-    :param snitch_map: Privacy Badger snitch map
+    Trackers on more than SMALL_TRACKER_ROOTS sites get checked for
+    shared roots until `time_budget` seconds are up, and then just for
+    their own root.
+
+    :param results: Privacy Badger results
+    :param domains: DomainIndex of the results
+    :return: lines of output
     """
-    print_mdfp_header = True
+    snitch_map = results['snitch_map']
+    deadline = time.monotonic() + time_budget
+    num_skipped = 0
+    lines = []
+
+    # include the tracker base, sans common resource domain strings
+    sbrs = {base: get_shared_base_root(base, domains.root) for base in snitch_map}
+    all_root_counts = {base: Counter(map(domains.root, sites))
+                       for base, sites in snitch_map.items()}
+    root_index = RootIndex(chain(sbrs.values(), *all_root_counts.values()))
 
     for base in sorted(snitch_map.keys()):
-        site_roots = get_site_roots(snitch_map[base])
+        sbr = sbrs[base]
+        root_counts = all_root_counts[base]
+        root_counts[sbr] += 1
 
-        # include the tracker base, sans common resource domain strings
-        sbr = get_shared_base_root(base)
-        site_roots.append(sbr)
+        scale = root_counts.total() <= SMALL_TRACKER_ROOTS or time.monotonic() < deadline
+        if not scale:
+            num_skipped += 1
 
-        shared_roots = get_shared_roots(site_roots, sbr)
+        shared_roots = get_shared_roots(root_counts, sbr, root_index, scale)
         if not shared_roots:
             continue
 
-        if print_mdfp_header:
-            print(f"\n{C_YELLOW}??{C_RESET} MDFP candidates:\n")
-            print_mdfp_header = False
+        if not lines:
+            lines.append(f"\n{C_YELLOW}??{C_RESET} MDFP candidates:\n")
+
+        lines.append(format_candidate(base, snitch_map[base], shared_roots))
+
+    if num_skipped:
+        lines.append(f"\n  Ran out of time looking for shared roots of larger trackers, "
+                     f"skipped {num_skipped}")
 
-        fbase, fsites, count_other = highlight_common_roots(
-            base, snitch_map[base], shared_roots)
+    return lines
 
-        sites = ", ".join(fsites)
-        s = "s" if count_other > 1 else ""
-        other_sites = f", and {count_other} other site{s}" if count_other else ""
-        print(f"  {fbase} on {sites}{other_sites}")
+def print_warnings(snitch_map):
+    """Looks for and warns about common "roots" (base minus PSL TLD).
+
+    :param snitch_map: Privacy Badger snitch map
+    """
+    results = {'snitch_map': snitch_map}
+    for line in lint(results, DomainIndex.from_results(results)):
+        print(line)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+"""Runs the results linters over one shared domain index.
+
+Linters are functions that take the results and a DomainIndex and return
+lines of output. They run concurrently, and their output gets printed in
+order once each one finishes.
+"""
+
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.linters import mdfp, site_outliers, unblocked
+from lib.linters.domains import DomainIndex
+
+
+LINTERS = (
+    ("mdfp", mdfp.lint),
+    ("unblocked", unblocked.lint),
+    ("site_outliers", site_outliers.lint),
+)
+
+
+def _timed(lint, results, domains):
+    start = time.perf_counter()
+    lines = lint(results, domains)
+    return lines, time.perf_counter() - start
+
+
+def run_linters(results, linters=LINTERS):
+    """Prints the output of every linter,
+    and then (to stderr) how long each one took.
+
+    :return: dict of linter name to runtime in seconds
+    """
+    start = time.perf_counter()
+    domains = DomainIndex.from_results(results)
+    timings = {"domain index": time.perf_counter() - start}
+
+    with ThreadPoolExecutor(max(len(linters), 1)) as pool:
+        futures = [(name, pool.submit(_timed, lint, results, domains))
+                   for name, lint in linters]
+        for name, future in futures:
+            lines, timings[name] = future.result()
+            for line in lines:
+                print(line)
+
+    print("Linter runtimes: " + ", ".join(
+        f"{name} {seconds:.2f}s" for name, seconds in timings.items()), file=sys.stderr)
+
+    return timings
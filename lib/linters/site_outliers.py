@@ -16,20 +16,33 @@ def outliers(data):
     # three standard deviations
     return [data[i] for i in range(0, len(data)) if abs(data[i] - mean) > 2.58 * std]
 
-def print_warnings(snitch_map):
-    counters = Counter(site for sites in snitch_map.values() for site in sites)
+def lint(results, _domains=None):
+    """Looks for sites with suspiciously many trackers.
+
+    :param results: Privacy Badger results
+    :return: lines of output
+    """
+    lines = []
+
+    counters = Counter(site for sites in results['snitch_map'].values() for site in sites)
     sample_size = int(sum(1 for _ in counters) / 200) # 0.5%
 
     suspicious_sites = counters.most_common(len(
         outliers(list(count for site, count in counters.most_common(sample_size)))))
 
     if suspicious_sites:
-        print(f"\n{C_YELLOW}??{C_RESET} Suspiciously tracker-rich sites:\n")
+        lines.append(f"\n{C_YELLOW}??{C_RESET} Suspiciously tracker-rich sites:\n")
         # first print the suspicious sites
         for site, count in suspicious_sites:
-            print(f"  {C_YELLOW}{count}{C_RESET} domains on {site}")
+            lines.append(f"  {C_YELLOW}{count}{C_RESET} domains on {site}")
         # and then print a few following sites for context
         for site, count in list(counters.most_common(len(suspicious_sites) + 5))[len(suspicious_sites):]:
-            print(f"  {count} domains on {site}")
-        print("\nYou might want to redo the merge with "
-              "--load-data-ignore-sites=" + ",".join(site for site, count in suspicious_sites))
+            lines.append(f"  {count} domains on {site}")
+        lines.append("\nYou might want to redo the merge with "
+                     "--load-data-ignore-sites=" + ",".join(site for site, count in suspicious_sites))
+
+    return lines
+
+def print_warnings(snitch_map):
+    for line in lint({'snitch_map': snitch_map}):
+        print(line)
@@ -1,52 +1,34 @@
 #!/usr/bin/env python3
 
-import subprocess
-import sys
-
 import colorama
 
-from lib.basedomain import extract
-from lib.utils import run
+from lib.linters.domains import DomainIndex
+from lib.pbconstants import get_fp_cdn_domains
 
 
 C_YELLOW = colorama.Style.BRIGHT + colorama.Fore.YELLOW
 C_RESET = colorama.Style.RESET_ALL
 
-# TODO refactor, don't hardcode
-_pb_dir= "../privacybadger"
-
-
-def load_fp_cdn_domains():
-    export_js = f"""
-// shim just enough for constants.js to load
-globalThis.chrome = {{ runtime: {{ getURL: ()=>{{}} }} }};
-const {{ default: constants }} = await import('{_pb_dir}/src/js/constants.js');
-process.stdout.write(JSON.stringify(Array.from(constants.FP_CDN_DOMAINS)));"""
-
-    try:
-        cmd = ["node", "--experimental-default-type=module", f'--eval={export_js}']
-        fp_cdn_domains = run(cmd)
-    except subprocess.CalledProcessError as ex:
-        print(ex.stderr, file=sys.stderr)
-        raise ex
-
-    return fp_cdn_domains
+# https://github.com/EFForg/privacybadger/issues/1527
+def lint(new_js, domains):
+    """Looks for canvas fingerprinters that don't get blocked.
 
+    :param new_js: Privacy Badger results
+    :param domains: DomainIndex of the results
+    :return: lines of output
+    """
+    lines = []
 
-# https://github.com/EFForg/privacybadger/issues/1527
-def print_warnings(new_js):
     if 'tracking_map' not in new_js or 'fp_scripts' not in new_js:
-        return
-
-    print_canvas_header = True
+        return lines
 
-    already_known_hosts = load_fp_cdn_domains()
+    already_known_hosts = get_fp_cdn_domains()
 
-    for domain in sorted(new_js['fp_scripts'], key=lambda d: extract(d).registered_domain or d):
+    for domain in sorted(new_js['fp_scripts'], key=domains.base):
         if domain.endswith(".awswaf.com") or domain in already_known_hosts:
             continue
 
-        base = extract(domain).registered_domain or domain
+        base = domains.base(domain)
 
         if len(new_js['snitch_map'].get(base, [])) < 3: # TRACKING_THRESHOLD
             continue
@@ -57,12 +39,17 @@ def print_warnings(new_js):
             if new_js['action_map'][domain]['heuristicAction'] != "cookieblock":
                 continue
 
-        if print_canvas_header:
-            print(f"\n{C_YELLOW}??{C_RESET} Unblocked canvas fingerprinters:\n")
-            print_canvas_header = False
+        if not lines:
+            lines.append(f"\n{C_YELLOW}??{C_RESET} Unblocked canvas fingerprinters:\n")
 
         domain_fmt = f"{C_YELLOW}{domain}{C_RESET}"
-        print(f"  {domain_fmt} on", ", ".join(new_js['tracking_map'][base].keys()))
+        lines.append(f"  {domain_fmt} on " + ", ".join(new_js['tracking_map'][base].keys()))
 
         for script_path in new_js['fp_scripts'][domain]:
-            print(f"   • {domain}{script_path}")
+            lines.append(f"   • {domain}{script_path}")
+
+    return lines
+
+def print_warnings(new_js):
+    for line in lint(new_js, DomainIndex.from_results(new_js)):
+        print(line)
@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 
+import multiprocessing
 import os
 import re
+import threading
+import time
 
-from lib.basedomain import extract
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+
+from lib.basedomain import extract, registered_domains
 from lib.lists.blocklist import Blocklist
 
 
@@ -109,63 +115,162 @@ class Adblocker(Blocklist):
     bases = set()
     domains = set()
 
-    def process_line(self, line):
-        if not line.startswith("||"):
-            return False
+    # rule lines per parsing task
+    chunk_size = 20000
+
+    list_stats = []
 
+    @classmethod
+    def parse_rule(cls, line):
+        """Returns the domain of a domain-blocking rule line,
+        or None if the line is not one."""
         # TODO review filter suffixes
-        if line.endswith(self.domain_filter_suffixes) or self.valid_domain_re.match(line[2:]):
+        if line.endswith(cls.domain_filter_suffixes) or cls.valid_domain_re.match(line[2:]):
             domain = line[2:line.rfind("^")]
 
-            if domain.startswith(self.first_party_subdomains):
-                return False
+            if domain.startswith(cls.first_party_subdomains):
+                return None
 
             # TODO review this charset
-            if not self.valid_domain_re.match(domain):
-                return False
+            if not cls.valid_domain_re.match(domain):
+                return None
 
-            base = extract(domain).registered_domain
-            if not base:
-                return False
+            return domain
 
-            self.bases.add(base)
-            self.domains.add(domain)
+        return None
 
-            return True
+    def process_line(self, line):
+        if not line.startswith("||"):
+            return False
 
-        return False
+        domain = self.parse_rule(line)
+        if not domain:
+            return False
 
-    def ingest_list(self, url, filename):
-        if not filename:
-            filename = url.rpartition('/')[-1]
+        base = extract(domain).registered_domain
+        if not base:
+            return False
 
-        filename = os.path.join(self.cache_dir, filename)
+        self.bases.add(base)
+        self.domains.add(domain)
 
-        self.fetch(url, filename)
+        return True
 
-        try:
-            with open(filename, encoding='utf-8') as file:
-                # TODO check for !#include statements
-                count = 0
-                for line in file:
-                    if self.process_line(line.rstrip()):
-                        count += 1
-                if count == 0:
-                    print(f"WARNING No domains found in {filename}")
-        except FileNotFoundError:
-            # if the (re)download failed for whatever reason
-            print(f"WARNING Failed to open {filename}")
-            return False
+    def ingest_lists(self, filenames):
+        """Parses list files in parallel, in chunks, in a process pool.
+
+        Lines get prefiltered on the "||" prefix as they are read, and
+        base domains are looked up only once per distinct domain.
+        Per-list counts and timings end up in `list_stats`.
+
+        :return: whether all lists could be read
+        """
+        list_rules = []
+        for filename in filenames:
+            try:
+                with open(filename, encoding='utf-8') as file:
+                    # TODO check for !#include statements
+                    list_rules.append([line.rstrip() for line in file if line.startswith("||")])
+            except FileNotFoundError:
+                # if the (re)download failed for whatever reason
+                print(f"WARNING Failed to open {filename}")
+                return False
+
+        list_domains, list_seconds, bases = self._parse_rules(list_rules)
+
+        self.list_stats = []
+        for filename, rules, domains, seconds in zip(
+                filenames, list_rules, list_domains, list_seconds):
+            count = 0
+            for domain in domains:
+                base = bases[domain]
+                if base:
+                    self.bases.add(base)
+                    self.domains.add(domain)
+                    count += 1
+
+            if count == 0:
+                print(f"WARNING No domains found in {filename}")
+
+            self.list_stats.append({
+                'filename': filename,
+                'rules': len(rules),
+                'domains': count,
+                'seconds': seconds,
+            })
 
         return True
 
-    def __init__(self):
+    def _chunks(self, items):
+        return [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+
+    def _parse_rules(self, list_rules):
+        """Returns the domains in rule lines (and the time that took), per list,
+        and a dict of all those domains to their base domains."""
+        # load the PSL before forking, so that workers inherit it
+        extract("example.com")
+
+        with _pool() as pool:
+            list_chunks = [[pool.submit(_parse_chunk, chunk) for chunk in self._chunks(rules)]
+                           for rules in list_rules]
+
+            list_domains, list_seconds = [], []
+            for futures in list_chunks:
+                results = [future.result() for future in futures]
+                list_domains.append([domain for domains, _ in results for domain in domains])
+                list_seconds.append(sum(seconds for _, seconds in results))
+
+            unique_domains = sorted(set().union(*list_domains))
+            bases = dict(zip(unique_domains, chain.from_iterable(
+                pool.map(registered_domains, self._chunks(unique_domains)))))
+
+        return list_domains, list_seconds, bases
+
+    def print_stats(self):
+        for stats in self.list_stats:
+            print(f"{os.path.basename(stats['filename'])}: {stats['domains']} domains "
+                  f"from {stats['rules']} rules in {stats['seconds']:.2f}s")
+
+    def __init__(self, use_processed_cache=True):
+        lists = []
         for url in self.list_urls:
             filename = None
             if len(url) == 2:
                 filename = url[1]
                 url = url[0]
-            if not self.ingest_list(url, filename):
-                return
+            if not filename:
+                filename = url.rpartition('/')[-1]
+            lists.append((url, os.path.join(self.cache_dir, filename)))
 
+        self.fetch_all(lists)
+
+        filenames = [filename for _, filename in lists]
+        if use_processed_cache and self.load_processed(filenames):
+            return
+
+        if not self.ingest_lists(filenames):
+            return
+
+        self.save_processed(filenames)
         self.ready = True
+
+
+def _pool():
+    # workers get forked, as spawned workers would re-run validate.py;
+    # without fork (macOS, Windows), or a second core, parse in this process.
+    # Forking while other threads run could leave a worker stuck on a lock
+    # one of those threads held, so that falls back to this process too
+    if "fork" in multiprocessing.get_all_start_methods() and (os.cpu_count() or 1) > 1 \
+            and threading.active_count() == 1:
+        return ProcessPoolExecutor(mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def _parse_chunk(lines):
+    start = time.perf_counter()
+    domains = [domain for domain in map(Adblocker.parse_rule, lines) if domain]
+    return domains, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    Adblocker(use_processed_cache=False).print_stats()
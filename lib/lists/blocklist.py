@@ -1,28 +1,92 @@
 #!/usr/bin/env python3
 
+import hashlib
+import inspect
+import json
 import os
+import pickle
 import time
-import urllib
+import urllib.error
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+
+from lib import basedomain
+
+
+def _write_atomically(filename, text):
+    with open(filename + ".tmp", 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(filename + ".tmp", filename)
 
 
 class Blocklist:
 
     cache_dir = os.path.join("lib", "lists", ".cache")
 
+    # how many lists to download at the same time
+    max_concurrent_fetches = 8
+
+    # the attributes that hold processed list data
+    # (what gets saved to and loaded from the processed cache)
+    processed_attrs = ("bases", "domains")
+
+    # identifies the processed list data once loaded or saved
+    processed_key = None
+
     ready = False
 
+    def _load_validators(self, url, filename):
+        """Returns cache validators (ETag, Last-Modified)
+        from the last time `url` was downloaded to `filename`."""
+        if not os.path.isfile(filename):
+            return {}
+        try:
+            with open(filename + ".headers.json", encoding='utf-8') as file:
+                validators = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if validators.get('url') != url:
+            return {}
+        return validators
+
     def _download(self, url, filename):
-        req = urllib.request.Request(url, headers={'User-Agent':'Mozilla/5.0'})
+        """Downloads `url` to `filename`, unless the server says
+        the already downloaded copy is still current.
+
+        :return: whether `filename` is now up to date
+        """
+        headers = {'User-Agent':'Mozilla/5.0'}
+        validators = self._load_validators(url, filename)
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        req = urllib.request.Request(url, headers=headers)
         try:
             with urllib.request.urlopen(req) as conn:
                 data = conn.read()
+                etag = conn.headers.get('ETag')
+                last_modified = conn.headers.get('Last-Modified')
         except urllib.error.HTTPError as e:
+            if e.code == 304:
+                # not modified; restart the expiration clock
+                os.utime(filename)
+                return True
             print(f"HTTP error fetching {url}: {e.code} {e.reason}")
         except urllib.error.URLError as e:
             print(f"URL error fetching {url}: {e.reason}")
         else:
-            with open(filename, 'w', encoding='utf-8') as file:
-                file.write(data.decode('utf-8'))
+            _write_atomically(filename, data.decode('utf-8'))
+            _write_atomically(filename + ".headers.json", json.dumps({
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+            }))
+            return True
+
+        return False
 
     def exists_and_unexpired(self, filename, expire_cache_hrs):
         if not os.path.isfile(filename):
@@ -38,9 +102,57 @@ class Blocklist:
         os.makedirs(self.cache_dir, exist_ok=True)
 
         if not self.exists_and_unexpired(filename, expire_cache_hrs):
-            if os.path.isfile(filename):
-                # first remove (back up) the file so that if downloading fails,
-                # we know something went wrong
+            if not self._download(url, filename) and os.path.isfile(filename):
+                # remove (back up) the outdated file
+                # so that we know something went wrong
                 os.replace(filename, filename + ".bak")
 
-            self._download(url, filename)
+    def fetch_all(self, urls_and_filenames, expire_cache_hrs=24):
+        """Fetches several (url, filename) lists concurrently."""
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_fetches) as pool:
+            for future in [pool.submit(self.fetch, url, filename, expire_cache_hrs)
+                           for url, filename in urls_and_filenames]:
+                future.result()
+
+    def _processed_key(self, filenames):
+        """Hashes everything that processed list data depends on:
+        the list files, the code that processes them,
+        and the Public Suffix List."""
+        digest = hashlib.sha256()
+        for filename in (__file__, inspect.getfile(type(self)), *filenames):
+            with open(filename, 'rb') as file:
+                digest.update(file.read())
+        digest.update(basedomain.psl_version().encode())
+        return digest.hexdigest()
+
+    def _processed_filename(self):
+        return os.path.join(self.cache_dir, f"{type(self).__name__}.processed.pickle")
+
+    def load_processed(self, filenames):
+        """Loads processed list data saved by save_processed(),
+        provided that nothing it depends on has changed since.
+
+        :return: whether the data got loaded
+        """
+        try:
+            with open(self._processed_filename(), 'rb') as file:
+                key, data = pickle.load(file)
+            if key != self._processed_key(filenames):
+                return False
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError, ValueError):
+            return False
+
+        for attr in self.processed_attrs:
+            setattr(self, attr, data[attr])
+        self.processed_key = key
+        self.ready = True
+
+        return True
+
+    def save_processed(self, filenames):
+        filename = self._processed_filename()
+        data = {attr: getattr(self, attr) for attr in self.processed_attrs}
+        self.processed_key = self._processed_key(filenames)
+        with open(filename + ".tmp", 'wb') as file:
+            pickle.dump((self.processed_key, data), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + ".tmp", filename)
@@ -14,6 +14,8 @@ class DDG(Blocklist):
     domains = set()
     prevalences = {}
 
+    processed_attrs = ("bases", "bases_unblocked", "domains", "prevalences")
+
     test_entities = ("Ad Company", "Ad Company Example", "EFF Test Trackers",
                      "Test Site for Tracker Blocking")
 
@@ -45,6 +47,9 @@ class DDG(Blocklist):
 
         self.fetch(url, filename, expire_cache_hrs=168) # weekly expiration
 
+        if self.load_processed([filename]):
+            return
+
         try:
             with open(filename, encoding='utf-8') as file:
                 data = json.load(file)
@@ -55,4 +60,5 @@ class DDG(Blocklist):
         for domain, conf in data["trackers"].items():
             self.ingest(domain, conf)
 
+        self.save_processed([filename])
         self.ready = True
@@ -16,6 +16,8 @@ class Disconnect(Blocklist):
 
     categories = defaultdict(set)
 
+    processed_attrs = ("bases", "bases_unblocked", "categories")
+
     def process_entity(self, category, entity):
         for name in entity:
             for url, domains in entity[name].items():
@@ -33,6 +35,9 @@ class Disconnect(Blocklist):
 
         self.fetch(url, filename, expire_cache_hrs=168) # weekly expiration
 
+        if self.load_processed([filename]):
+            return
+
         try:
             with open(filename, encoding='utf-8') as file:
                 data = json.load(file)
@@ -47,4 +52,5 @@ class Disconnect(Blocklist):
         self.bases = {base for domains in self.categories.values() for base in domains}
         self.bases_unblocked = self.categories["Content"]
 
+        self.save_processed([filename])
         self.ready = True
@@ -16,6 +16,8 @@ class Ghostery(Blocklist):
 
     blocked_categories = ("advertising", "site_analytics", "pornvertising")
 
+    processed_attrs = ("bases", "bases_unblocked", "domains")
+
     def __init__(self):
         filename = os.path.join(self.cache_dir, "ghostery-trackerdb.json")
         expire_hrs = 168 # weekly expiration
@@ -30,6 +32,9 @@ class Ghostery(Blocklist):
                 f"/download/{version}/trackerdb.json")
             self.fetch(url, filename, expire_cache_hrs=expire_hrs)
 
+        if self.load_processed([filename]):
+            return
+
         try:
             with open(filename, encoding='utf-8') as file:
                 data = json.load(file)
@@ -47,4 +52,5 @@ class Ghostery(Blocklist):
 
                 self.domains.add(domain)
 
+        self.save_processed([filename])
         self.ready = True
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""List membership of base domains, across all comparison lists.
+
+Every base domain maps to a bitmask with two bits per list (whether the
+list has the domain, and whether the list says to not block it), plus
+a BLOCKED bit for domains that any list blocks.
+"""
+
+import hashlib
+import os
+import pickle
+
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.lists.adblocker import Adblocker
+from lib.lists.blocklist import Blocklist
+from lib.lists.ddg import DDG
+from lib.lists.disconnect import Disconnect
+from lib.lists.ghostery import Ghostery
+
+
+def listed(i):
+    """The bit for domains on list number `i`."""
+    return 1 << (2 * i)
+
+
+def unblocked(i):
+    """The bit for domains list number `i` does not block."""
+    return 1 << (2 * i + 1)
+
+
+class ListIndex:
+
+    lists = (Adblocker, DDG, Disconnect, Ghostery)
+
+    # on any list, and blocked by at least one
+    BLOCKED = 1 << 8
+
+    def __init__(self):
+        # Adblocker parses its lists in forked processes, which is only
+        # safe while no other threads are running, so it goes first;
+        # the rest get downloaded and parsed in parallel
+        self.blocklists = [self.lists[0]()]
+        with ThreadPoolExecutor() as pool:
+            self.blocklists += [future.result() for future in [
+                pool.submit(cls) for cls in self.lists[1:]]]
+
+        self.ready = all(blocklist.ready for blocklist in self.blocklists)
+
+        key = self._key()
+        if key and self._load(key):
+            return
+
+        self.masks = self.build(self.blocklists)
+
+        if key:
+            self._save(key)
+
+    @classmethod
+    def build(cls, blocklists):
+        masks = {}
+        for i, blocklist in enumerate(blocklists):
+            bases_unblocked = getattr(blocklist, "bases_unblocked", set())
+            for base in blocklist.bases:
+                mask = masks.get(base, 0) | listed(i)
+                if base in bases_unblocked:
+                    mask |= unblocked(i)
+                else:
+                    mask |= cls.BLOCKED
+                masks[base] = mask
+        return masks
+
+    def get(self, base):
+        return self.masks.get(base, 0)
+
+    def _key(self):
+        """Identifies the index by the processed data of its lists,
+        or returns None if not all lists have processed data."""
+        keys = [blocklist.processed_key for blocklist in self.blocklists]
+        if not all(keys):
+            return None
+        digest = hashlib.sha256()
+        with open(__file__, 'rb') as file:
+            digest.update(file.read())
+        for key in keys:
+            digest.update(key.encode())
+        return digest.hexdigest()
+
+    def _filename(self):
+        return os.path.join(Blocklist.cache_dir, "ListIndex.pickle")
+
+    def _load(self, key):
+        try:
+            with open(self._filename(), 'rb') as file:
+                cached_key, masks = pickle.load(file)
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError, ValueError):
+            return False
+        if cached_key != key:
+            return False
+        self.masks = masks
+        return True
+
+    def _save(self, key):
+        filename = self._filename()
+        with open(filename + ".tmp", 'wb') as file:
+            pickle.dump((key, self.masks), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + ".tmp", filename)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""On-disk index of where in log.txt history tracker domains were first seen.
+
+For every revision of log.txt, records the domains logged as new
+in snitch_map, along with the rank and the domain of the site being
+visited at the time. Old revisions that predate this logging fall back
+to the action_map domains (and other object keys) in that revision's
+results.json, stored as runs of consecutive revisions to keep the
+index small.
+
+The index is built incrementally: updating only reads revisions
+added since the last update, streaming their blobs through a single
+`git cat-file --batch` process.
+"""
+
+import json
+import re
+import sqlite3
+
+from lib.utils import cat_file, run
+
+
+INDEX_VERSION = 1
+
+re_visiting = re.compile("[Vv]isiting ([0-9]+): (.*)")
+re_new_domains = re.compile("[Nn]ew (?:domains|trackers) in snitch_map: (.*)")
+
+
+def create_tables(cur):
+    cur.executescript(f"""
+        DROP TABLE IF EXISTS revision;
+        DROP TABLE IF EXISTS domain;
+        DROP TABLE IF EXISTS detection;
+        DROP TABLE IF EXISTS results_run;
+
+        CREATE TABLE revision (
+            id INTEGER PRIMARY KEY,
+            hash VARCHAR(40) NOT NULL UNIQUE,
+            date VARCHAR(25) NOT NULL,
+            label VARCHAR(100) NOT NULL,
+            -- whether log.txt lists new domains
+            logs_new_domains BOOLEAN NOT NULL CHECK (logs_new_domains IN (0, 1))
+        );
+
+        CREATE TABLE domain (
+            id INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL UNIQUE
+        );
+
+        -- first time a domain was logged as new in a revision's log.txt
+        CREATE TABLE detection (
+            domain_id INTEGER NOT NULL,
+            revision_id INTEGER NOT NULL,
+            line INTEGER NOT NULL,
+            -- NULL when there was no "Visiting" line before it
+            rank INTEGER,
+            site VARCHAR(200),
+            PRIMARY KEY (domain_id, revision_id)
+        ) WITHOUT ROWID;
+
+        -- consecutive revisions with a domain in results.json
+        CREATE TABLE results_run (
+            domain_id INTEGER NOT NULL,
+            first_revision_id INTEGER NOT NULL,
+            last_revision_id INTEGER NOT NULL,
+            PRIMARY KEY (domain_id, first_revision_id)
+        ) WITHOUT ROWID;
+
+        PRAGMA user_version = {INDEX_VERSION};
+    """)
+
+
+def get_label(subject):
+    """Shortens a commit subject like search_log.sh always has,
+    for example to "chrome ca"."""
+    label = re.sub(r"^.*\(", "", subject)
+    label = re.sub(r"\).*$", "", label)
+    label = re.sub("(Add data |Update seed data: |master |from )", "", label)
+    return " ".join(label.split(" ")[-2:])
+
+
+def parse_log(lines):
+    """Returns {domain: (line number, rank, site)} for domains logged as new,
+    and whether the log lists new domains at all."""
+    detections = {}
+    found = False
+    visiting = (None, None)
+
+    for line_num, line in enumerate(lines, start=1):
+        if "isiting" in line and (match := re_visiting.search(line)):
+            visiting = (int(match.group(1)), match.group(2).rstrip())
+        elif "snitch_map" in line and (match := re_new_domains.search(line)):
+            found = True
+            for domain in match.group(1).rstrip().split(", "):
+                if domain and domain not in detections:
+                    detections[domain] = (line_num, *visiting)
+
+    return detections, found
+
+
+def get_object_keys(obj):
+    """Returns the keys of all (nested) JSON objects whose values are objects."""
+    keys = set()
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        for key, val in obj.items():
+            if isinstance(val, dict):
+                keys.add(key)
+                stack.append(val)
+    return keys
+
+
+class LogIndex:
+
+    def __init__(self, db_path, repo_dir):
+        self.repo_dir = repo_dir
+        self.db = sqlite3.connect(db_path)
+        self.cur = self.db.cursor()
+        self.domain_ids = {}
+
+        self.cur.execute("PRAGMA user_version")
+        if self.cur.fetchone()[0] != INDEX_VERSION:
+            create_tables(self.cur)
+
+    def close(self):
+        self.db.close()
+
+    def get_domain_id(self, name):
+        if name not in self.domain_ids:
+            self.cur.execute("SELECT id FROM domain WHERE name = ?", (name,))
+            row = self.cur.fetchone()
+            if row:
+                self.domain_ids[name] = row[0]
+            else:
+                self.cur.execute("INSERT INTO domain (name) VALUES (?)", (name,))
+                self.domain_ids[name] = self.cur.lastrowid
+        return self.domain_ids[name]
+
+    def get_revisions(self):
+        """Returns (hash, date, subject) tuples for revisions of log.txt,
+        oldest first."""
+        out = run(["git", "log", "--reverse", "--format=%H%x00%ci%x00%s", "HEAD",
+                   "--", "log.txt"], cwd=self.repo_dir)
+        return [tuple(line.split("\0", 2)) for line in out.split("\n") if line]
+
+    def update(self):
+        """Indexes revisions added since the last update.
+
+        :return: the number of newly indexed revisions
+        """
+        revisions = self.get_revisions()
+        indexed = [row[0] for row in self.cur.execute("SELECT hash FROM revision ORDER BY id")]
+
+        # history got rewritten; start over
+        if [rev for rev, _, _ in revisions[:len(indexed)]] != indexed:
+            create_tables(self.cur)
+            self.domain_ids = {}
+            indexed = []
+
+        new_revisions = revisions[len(indexed):]
+        if not new_revisions:
+            return 0
+
+        # results.json runs ending at the last indexed revision can be extended
+        open_runs = {}
+        if indexed:
+            self.cur.execute("SELECT domain_id, first_revision_id FROM results_run "
+                             "WHERE last_revision_id = ?", (len(indexed),))
+            open_runs = dict(self.cur.fetchall())
+
+        with cat_file(cwd=self.repo_dir) as blobs:
+            for revision_id, revision in enumerate(new_revisions, start=len(indexed) + 1):
+                open_runs = self.index_revision(blobs, revision_id, revision, open_runs)
+
+        self.db.commit()
+
+        return len(new_revisions)
+
+    # pylint: disable-next=too-many-locals
+    def index_revision(self, blobs, revision_id, revision, open_runs):
+        """Indexes one revision, returning the still open results.json runs."""
+        rev, date, subject = revision
+        detections, found = {}, False
+        size = blobs.request(f"{rev}:log.txt")
+        if size is not None:
+            detections, found = parse_log(blobs.lines(size))
+
+        self.cur.execute("INSERT INTO revision (id, hash, date, label, logs_new_domains) "
+                         "VALUES (?,?,?,?,?)", (revision_id, rev, date, get_label(subject), found))
+
+        self.cur.executemany(
+            "INSERT INTO detection (domain_id, revision_id, line, rank, site) "
+            "VALUES (?,?,?,?,?)",
+            [(self.get_domain_id(domain), revision_id, line_num, rank, site)
+             for domain, (line_num, rank, site) in detections.items()])
+
+        domains = set()
+        if not found:
+            size = blobs.request(f"{rev}:results.json")
+            if size is not None:
+                try:
+                    results = json.loads(blobs.read(size))
+                except json.JSONDecodeError:
+                    results = {}
+                if isinstance(results, dict):
+                    domains = get_object_keys(results)
+
+        runs = {}
+        for domain in domains:
+            domain_id = self.get_domain_id(domain)
+            runs[domain_id] = open_runs.get(domain_id, revision_id)
+        self.cur.executemany(
+            "INSERT INTO results_run (domain_id, first_revision_id, last_revision_id) "
+            "VALUES (?,?,?) ON CONFLICT DO UPDATE SET last_revision_id = excluded.last_revision_id",
+            [(domain_id, first_id, revision_id) for domain_id, first_id in runs.items()])
+
+        return runs
+
+    def search(self, term):
+        """Returns (hash, date, label, found) tuples for all indexed revisions,
+        newest first, where found is one of:
+
+        - (rank, site) of the site where a domain containing `term`
+          was first logged as new
+        - "detected-but-unable-to-find-visiting-line"
+        - "detected-according-to-results-json"
+        - None
+        """
+        self.cur.execute("""
+            SELECT revision_id, MIN(line), rank, site
+            FROM detection
+            JOIN domain ON domain.id = domain_id
+            WHERE INSTR(domain.name, ?) > 0
+            GROUP BY revision_id""", (term,))
+        detections = {revision_id: (rank, site) for revision_id, _, rank, site in self.cur}
+
+        self.cur.execute("""
+            SELECT first_revision_id, last_revision_id
+            FROM results_run
+            JOIN domain ON domain.id = domain_id
+            WHERE INSTR(domain.name, ?) > 0""", (term,))
+        in_results = set()
+        for first_id, last_id in self.cur.fetchall():
+            in_results.update(range(first_id, last_id + 1))
+
+        results = []
+        for revision_id, rev, date, label, logs_new_domains in self.cur.execute(
+                "SELECT id, hash, date, label, logs_new_domains FROM revision ORDER BY id DESC"):
+            found = None
+            if logs_new_domains:
+                if revision_id in detections:
+                    found = detections[revision_id]
+                    if found[0] is None:
+                        found = "detected-but-unable-to-find-visiting-line"
+            elif revision_id in in_results:
+                found = "detected-according-to-results-json"
+            results.append((rev, date, label, found))
+
+        return results
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+from lib.utils import run
+
+# TODO don't hardcode
+_pb_dir = "../privacybadger"
+
+# with the other caches, rather than in a shared temp dir
+# where anyone could leave fake constants for us to load
+_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "lists", ".cache", "pb-constants")
+
+_constants = None
+
+# the Privacy Badger files the constants come from
+_source_files = ("src/js/multiDomainFirstParties.js", "src/js/constants.js")
+
+
+def extract_constants():
+    """Imports Privacy Badger's MDFP and FP CDN lists with node."""
+    export_js = f"""
+// shim just enough for constants.js to load
+globalThis.chrome = {{ runtime: {{ getURL: ()=>{{}} }} }};
+const {{ default: mdfp }} = await import('{_pb_dir}/src/js/multiDomainFirstParties.js');
+const {{ default: constants }} = await import('{_pb_dir}/src/js/constants.js');
+process.stdout.write(JSON.stringify({{
+  mdfp: mdfp.multiDomainFirstPartiesArray,
+  fp_cdn_domains: Array.from(constants.FP_CDN_DOMAINS)
+}}));"""
+
+    try:
+        return json.loads(run(["node", "--experimental-default-type=module",
+                               f'--eval={export_js}']))
+    except subprocess.CalledProcessError as ex:
+        print(ex.stderr, file=sys.stderr)
+        raise ex
+
+
+def get_pb_path():
+    return pathlib.Path(__file__).parent.parent.resolve() / _pb_dir
+
+
+def get_pb_commit_hash():
+    try:
+        return run(["git", "rev-parse", "HEAD"], cwd=get_pb_path())
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def get_cache_key():
+    """Returns the Privacy Badger checkout's commit hash plus a hash of
+    the constants' source files, to account for uncommitted changes,
+    or None if Privacy Badger isn't a git checkout."""
+    commit_hash = get_pb_commit_hash()
+    if not commit_hash:
+        return None
+
+    digest = hashlib.sha256()
+    for source_file in _source_files:
+        try:
+            digest.update((get_pb_path() / source_file).read_bytes())
+        except FileNotFoundError:
+            pass
+        digest.update(b"\0")
+
+    return f"{commit_hash}-{digest.hexdigest()[:16]}"
+
+
+def load_constants():
+    """Returns Privacy Badger constants, from the on-disk cache if possible.
+
+    The cache is keyed by the Privacy Badger checkout's commit hash
+    and the contents of the constants' source files, so that node only
+    runs when Privacy Badger gets updated or edited.
+    """
+    cache_key = get_cache_key()
+    cache_file = os.path.join(_cache_dir, f"{cache_key}.json")
+
+    if cache_key:
+        try:
+            with open(cache_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    constants = extract_constants()
+
+    if cache_key:
+        os.makedirs(_cache_dir, exist_ok=True)
+        with open(cache_file + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(constants, f)
+        os.replace(cache_file + ".tmp", cache_file)
+
+    return constants
+
+
+def get_constants():
+    global _constants
+
+    # lazy init
+    if not _constants:
+        constants = load_constants()
+
+        mdfp = {}
+        for entity_bases in constants['mdfp']:
+            entity_bases = frozenset(entity_bases)
+            for base in entity_bases:
+                mdfp[base] = entity_bases
+
+        _constants = {
+            "mdfp": mdfp,
+            "fp_cdn_domains": frozenset(constants['fp_cdn_domains']),
+        }
+
+    return _constants
+
+
+def get_mdfp():
+    """Returns a dict of MDFP base domains to their entity's base domains."""
+    return get_constants()['mdfp']
+
+
+def get_fp_cdn_domains():
+    """Returns the set of known fingerprinter CDN domains."""
+    return get_constants()['fp_cdn_domains']
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""Tracker prevalence snapshots.
+
+initdb.py writes a snapshot of how widespread every tracker base domain
+is: the number of distinct sites it was seen on over standard windows,
+when it was first and last seen, and in which browsers. validate.py
+memory-maps the snapshot and looks up trackers without going to SQLite.
+
+The snapshot is a single binary file (all integers little-endian):
+
+    header      magic, number of windows, number of hash table slots,
+                number of records, time of generation,
+                then (window days (0 for all time), total sites)
+                per window, then comma-separated browser names
+    slots       open addressing hash table of (key hash, record number + 1)
+    records     fixed size: site counts per window, first and last seen
+                (Unix time), browser bitmask, and the key's offset and
+                length in the key section
+    keys        UTF-8 base domains
+
+Lookups hash the domain, probe the slots, and then read just the one
+record (and key, to rule out hash collisions).
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+from lib.timeseries import TrackerSeries
+
+SNAPSHOT_FILENAME = "prevalence.bin"
+
+# days; None for all time
+WINDOWS = (30, 90, 365, None)
+
+_MAGIC = b"BSPREV\x00\x01"
+_HEADER = struct.Struct("<8sIIIq")
+_WINDOW = struct.Struct("<II")
+_SLOT = struct.Struct("<QI")
+
+Prevalence = namedtuple("Prevalence", ["sites", "first_seen", "last_seen", "browsers"])
+
+
+def _hash(key):
+    # zero marks empty slots
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+
+def _record_struct(num_windows):
+    return struct.Struct(f"<{num_windows}IqqIIH")
+
+
+def _tracker_stats(series, windows):
+    """Returns (base domain, site counts per window, first seen,
+    last seen, browser bitmask) for every tracker observed."""
+    counts = np.stack([series.prevalence(days=days) for days in windows], axis=1)
+    scan_times = series.scan_times.astype(np.int64)
+    browsers = np.zeros(len(series.trackers), dtype=np.int64)
+    np.bitwise_or.at(browsers, series.obs_tracker,
+                     1 << series.scan_browsers[series.obs_scan])
+
+    # observations are sorted by scan
+    ids, first = np.unique(series.obs_tracker, return_index=True)
+    _, last = np.unique(series.obs_tracker[::-1], return_index=True)
+    first = scan_times[series.obs_scan[first]]
+    last = scan_times[series.obs_scan[len(series.obs_scan) - 1 - last]]
+
+    return [(series.trackers[i], counts[i].tolist(), first_seen, last_seen, browsers[i].item())
+            for i, first_seen, last_seen in zip(ids.tolist(), first.tolist(), last.tolist())]
+
+
+def _hash_slots(keys):
+    """Returns the open addressing hash table of (key hash, record number + 1)
+    slots, at most half full."""
+    slots = [(0, 0)] * (1 << max(len(keys) * 2, 1).bit_length())
+    mask = len(slots) - 1
+    for num, key in enumerate(keys):
+        key_hash = _hash(key)
+        slot = key_hash & mask
+        while slots[slot][0]:
+            slot = (slot + 1) & mask
+        slots[slot] = (key_hash, num + 1)
+    return slots
+
+
+def _pack_records(stats, num_windows):
+    """Returns the keys and the packed records of the trackers."""
+    record = _record_struct(num_windows)
+    keys, records = [], []
+    key_pos = 0
+    for base, counts, first_seen, last_seen, browsers in stats:
+        key = base.encode('utf-8')
+        keys.append(key)
+        records.append(record.pack(*counts, first_seen, last_seen, browsers, key_pos, len(key)))
+        key_pos += len(key)
+    return keys, records
+
+
+def write_snapshot(cur, path=SNAPSHOT_FILENAME, windows=WINDOWS, now=None):
+    """Writes a prevalence snapshot of daily no-blocking mode scans
+    in badger.sqlite3 (the same scans sql/prevalent.py reports on).
+
+    :return: the number of trackers in the snapshot
+    """
+    series = TrackerSeries(cur, now=now)
+    browser_names = dict(cur.execute("SELECT id, name FROM browser"))
+    names = ",".join(browser_names.get(i, "") for i in range(
+        max(browser_names, default=0) + 1)).encode('utf-8')
+
+    keys, records = _pack_records(_tracker_stats(series, windows), len(windows))
+    slots = _hash_slots(keys)
+
+    with open(path + ".tmp", 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(windows), len(slots), len(records),
+                             int(series.now.astype(np.int64))))
+        for days in windows:
+            f.write(_WINDOW.pack(days or 0, series.total_sites(days=days)))
+        f.write(struct.pack("<H", len(names)) + names)
+        f.write(b"".join(_SLOT.pack(*slot) for slot in slots))
+        f.write(b"".join(records))
+        f.write(b"".join(keys))
+    # don't leave a half-written snapshot for validate.py
+    os.replace(path + ".tmp", path)
+
+    return len(records)
+
+
+def _to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+class PrevalenceSnapshot:
+    """Memory-mapped prevalence snapshot written by write_snapshot()."""
+
+    def __init__(self, path=SNAPSHOT_FILENAME):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, num_windows, self._num_slots, num_records, generated = \
+            _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a prevalence snapshot")
+        self.generated = _to_datetime(generated)
+
+        pos = _HEADER.size
+        self.windows, self.total_sites = [], []
+        for _ in range(num_windows):
+            days, total = _WINDOW.unpack_from(self._mm, pos)
+            self.windows.append(days or None)
+            self.total_sites.append(total)
+            pos += _WINDOW.size
+
+        names_len, = struct.unpack_from("<H", self._mm, pos)
+        pos += 2
+        self._browsers = self._mm[pos:pos + names_len].decode('utf-8').split(",")
+        pos += names_len
+
+        self._record = _record_struct(num_windows)
+        self._slots_pos = pos
+        self._records_pos = pos + self._num_slots * _SLOT.size
+        self._keys_pos = self._records_pos + num_records * self._record.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+
+    def get(self, base):
+        """Returns the Prevalence of the tracker base domain,
+        or None if it is not in the snapshot."""
+        key = base.encode('utf-8')
+        key_hash = _hash(key)
+        slot = key_hash & (self._num_slots - 1)
+        while True:
+            slot_hash, num = _SLOT.unpack_from(self._mm, self._slots_pos + slot * _SLOT.size)
+            if not slot_hash:
+                return None
+            if slot_hash == key_hash:
+                *sites, first, last, browsers, key_pos, key_len = self._record.unpack_from(
+                    self._mm, self._records_pos + (num - 1) * self._record.size)
+                key_pos += self._keys_pos
+                if self._mm[key_pos:key_pos + key_len] == key:
+                    return Prevalence(
+                        tuple(sites), _to_datetime(first), _to_datetime(last),
+                        tuple(name for i, name in enumerate(self._browsers)
+                              if browsers & (1 << i)))
+            slot = (slot + 1) & (self._num_slots - 1)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""Low-memory loading of Privacy Badger results (results.json).
+
+Streams the JSON (see lib/jsonstream.py), keeping only the parts of the
+data that validation reports on: the heuristicAction of action_map
+entries, the site keys of tracking_map entries, and the full snitch_map
+and fp_scripts. Action map entries share one dict per heuristicAction,
+so that they cost no more than the keys that point to them.
+
+Also reads results.json as of past revisions, for comparing many
+revisions in one go.
+"""
+
+import hashlib
+import json
+import pathlib
+
+from collections import defaultdict
+
+from lib import jsonstream
+from lib.basedomain import extract
+from lib.utils import run
+
+# sorting keys gives the same hash regardless of key order,
+# without changing the length
+_encoder = json.JSONEncoder(sort_keys=True)
+
+
+def _member_hash(key, value, map_key=""):
+    """Returns the hash of a (key, value) member, and the length
+    of its serialization (key: value)."""
+    serialized = _encoder.encode([key, value])
+    digest = hashlib.blake2b(serialized.encode('utf-8'), digest_size=16,
+                             key=map_key.encode('utf-8')[:64])
+    # "[key, value]" -> "key: value"
+    return int.from_bytes(digest.digest(), 'big'), len(serialized) - 2
+
+
+def _slim_action_map(items, actions):
+    for domain, entry in items:
+        action = entry.get('heuristicAction')
+        if action not in actions:
+            actions[action] = {'heuristicAction': action}
+        yield domain, entry, actions[action]
+
+
+def _slim_tracking_map(items):
+    for base, entry in items:
+        yield base, entry, dict.fromkeys(entry)
+
+
+def _full_map(items):
+    for key, entry in items:
+        yield key, entry, entry
+
+
+def _load_map(key, items, keep):
+    """Returns the slimmed down map (if kept),
+    plus the length and the hash of the full map member."""
+    slim = {}
+    digest, size = _member_hash(key, {})
+    for num_items, (subkey, subvalue, slim_value) in enumerate(items):
+        member_hash, member_size = _member_hash(subkey, subvalue, key)
+        digest += member_hash
+        # plus ", " separators between members
+        size += member_size + (2 if num_items else 0)
+        if keep:
+            slim[subkey] = slim_value
+    return slim, size, digest
+
+
+def load_slim(path, maps=('action_map', 'snitch_map', 'tracking_map', 'fp_scripts')):
+    """Loads results JSON, keeping only the given maps (slimmed down),
+    and other top-level values.
+
+    :return: (results, size, digest): the slimmed down results, the
+        length of the JSON serialization (json.dumps()) of the full
+        results, and a hash of the full results that is the same for
+        equal results (regardless of key order)
+    """
+    results = {}
+    actions = {}
+    # braces
+    size = 2
+    digest = 0
+
+    with open(path, encoding='utf-8') as f:
+        for num_members, (key, value) in enumerate(jsonstream.iter_object(f)):
+            if isinstance(value, jsonstream.ObjectStream):
+                if key == 'action_map':
+                    items = _slim_action_map(value, actions)
+                elif key == 'tracking_map':
+                    items = _slim_tracking_map(value)
+                else:
+                    items = _full_map(value)
+                slim, member_size, member_hash = _load_map(key, items, key in maps)
+                if key in maps:
+                    results[key] = slim
+            else:
+                results[key] = value
+                member_hash, member_size = _member_hash(key, value)
+
+            digest += member_hash
+            size += member_size + (2 if num_members else 0)
+
+    return results, size, digest % (1 << 256)
+
+
+def get_blocked(results, warn=False):
+    """Groups action map domains by base domain, for base domains that
+    were seen tracking on at least three sites (and so get blocked).
+
+    :param warn: whether to print domains without a base domain, or
+        whose base domain is missing from snitch_map
+    """
+    blocked = defaultdict(list)
+    snitch_map = results['snitch_map']
+    for domain in results['action_map']:
+        base = extract(domain).registered_domain
+        if not base:
+            # IP address, a no-dots string (Privacy Badger bug), or
+            # https://github.com/john-kurkowski/tldextract/issues/178
+            if warn:
+                print(f"Failed to extract base domain for {domain}")
+            base = domain
+        if base in snitch_map:
+            if len(snitch_map[base]) >= 3:
+                blocked[base].append(domain)
+        elif warn:
+            # TODO happens with s3.amazonaws.com, why?
+            print(f"Failed to find {base} (eTLD+1 of {domain}) in snitch_map")
+    return blocked
+
+
+def get_revisions(rev_range, cwd=pathlib.Path(__file__).parent.parent.resolve()):
+    """Returns (commit hash, date, subject) for every commit in
+    `rev_range` that changed results.json, oldest first."""
+    out = run(["git", "log", "--reverse", "--format=%H%x00%as%x00%s",
+               rev_range, "--", "results.json"], cwd=cwd)
+    return [tuple(line.split("\0", 2)) for line in out.splitlines()]
+
+
+def load_revision(reader, rev, maps=('action_map', 'snitch_map')):
+    """Loads results.json as of `rev` using a BlobReader (see
+    lib/utils.py), keeping only the given maps.
+
+    :return: the results, or None if there is no results.json at `rev`
+    """
+    size = reader.request(f"{rev}:results.json")
+    if size is None:
+        return None
+    results = json.loads(reader.read(size))
+    return {key: results.get(key, {}) for key in maps}
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""Saves screenshots in the background, so that the crawl only waits
+for the browser to capture them.
+
+Screenshots arrive as base64-encoded PNGs, straight from WebDriver.
+A small thread pool decodes them, skips writing identical frames again
+(duplicates become hard links to the first copy), optionally downscales
+and re-encodes them (this needs Pillow), and writes them to disk.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import shutil
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.util import find_spec
+
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+# screenshots waiting to be saved before capturing more blocks
+MAX_PENDING = 16
+
+
+class ScreenshotWriter:
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, out_dir, image_format="png", scale=1.0, quality=75,
+                 num_workers=2, logger=None):
+        if image_format not in EXTENSIONS:
+            raise ValueError(f"Unsupported screenshot format {image_format}")
+        self.reencode = image_format != "png" or scale != 1
+        if self.reencode and not find_spec("PIL"):
+            raise ValueError("Downscaling or re-encoding screenshots requires Pillow")
+
+        self.out_dir = out_dir
+        self.image_format = image_format
+        self.scale = scale
+        self.quality = quality
+        self.logger = logger
+
+        self.pool = ThreadPoolExecutor(num_workers, thread_name_prefix="screenshots")
+        self.pending = threading.BoundedSemaphore(MAX_PENDING)
+        self.lock = threading.Lock()
+        # PNG digest -> Future of where the first copy got saved to
+        self.saved = {}
+        self.stats = {
+            "screenshots": 0,
+            "duplicates": 0,
+            "failed": 0,
+            "captured_bytes": 0,
+            "written_bytes": 0,
+        }
+
+    def submit(self, name, png_base64):
+        """Queues the screenshot to be saved as `name` (plus extension)
+        in `out_dir`; only blocks if too many are waiting already."""
+        self.pending.acquire() # pylint: disable=consider-using-with
+        future = self.pool.submit(self._save, name, png_base64)
+        future.add_done_callback(lambda _: self.pending.release())
+        return future
+
+    def close(self):
+        """Waits for all screenshots to get saved."""
+        self.pool.shutdown(wait=True)
+        if self.logger and self.stats["screenshots"]:
+            self.logger.info(
+                "Saved %d screenshots (%d duplicates, %d failed): "
+                "%.1f MB written for %.1f MB captured",
+                self.stats["screenshots"], self.stats["duplicates"], self.stats["failed"],
+                self.stats["written_bytes"] / 1024 / 1024,
+                self.stats["captured_bytes"] / 1024 / 1024)
+
+    def _save(self, name, png_base64):
+        png = base64.b64decode(png_base64)
+        digest = hashlib.blake2b(png, digest_size=16).digest()
+        path = os.path.join(self.out_dir, f"{name}.{EXTENSIONS[self.image_format]}")
+
+        with self.lock:
+            self.stats["screenshots"] += 1
+            self.stats["captured_bytes"] += len(png)
+            first = self.saved.get(digest)
+            if not first:
+                first = self.saved[digest] = Future()
+                is_first = True
+            else:
+                self.stats["duplicates"] += 1
+                is_first = False
+
+        try:
+            if not is_first:
+                # the first copy was submitted earlier, so it's being saved already
+                return self._save_duplicate(first.result(), path)
+
+            data = self._reencode(png) if self.reencode else png
+            # replace rather than overwrite, in case the name's taken
+            # by a link to some other frame
+            with open(path + ".tmp", 'wb') as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            with self.lock:
+                self.stats["written_bytes"] += len(data)
+            first.set_result(path)
+            return path
+
+        except Exception as ex: # pylint: disable=broad-exception-caught
+            with self.lock:
+                self.stats["failed"] += 1
+            if is_first:
+                first.set_result(None)
+            if self.logger:
+                self.logger.warning("Failed to save screenshot %s (%s: %s)",
+                                    name, type(ex).__name__, ex)
+            return None
+
+    @staticmethod
+    def _save_duplicate(first_path, path):
+        if not first_path:
+            return None
+        # the same frame again under the same name
+        if os.path.exists(path) and os.path.samefile(first_path, path):
+            return path
+        try:
+            os.link(first_path, path + ".tmp")
+        except OSError:
+            with open(first_path, 'rb') as src, open(path + ".tmp", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def _reencode(self, png):
+        # Pillow is only needed for downscaling and re-encoding
+        from PIL import Image # pylint: disable=import-outside-toplevel,import-error
+
+        with Image.open(io.BytesIO(png)) as image:
+            if self.scale != 1:
+                image = image.resize((max(1, round(image.width * self.scale)),
+                                      max(1, round(image.height * self.scale))),
+                                     Image.Resampling.LANCZOS)
+            out = io.BytesIO()
+            if self.image_format == "png":
+                image.save(out, "PNG", optimize=True)
+            else:
+                image.convert("RGB").save(out, self.image_format.upper(), quality=self.quality)
+        return out.getvalue()
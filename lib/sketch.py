@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+"""HyperLogLog sketches of the sites seen per tracker per scan.
+
+Counting distinct sites over a date range (COUNT(DISTINCT site_id))
+means going through every tracking row in that range, again for every
+range. A HyperLogLog sketch instead summarizes a set of sites in at
+most a few KB, and sketches merge losslessly (register-wise max), so
+the distinct site count for any set of scans (any date window, browsers,
+regions) can be estimated by merging the sketches of those scans.
+
+Error bounds: with PRECISION = 14 (16,384 registers), the relative
+standard error of estimates is 1.04 / sqrt(16384) = 0.8%, so about 99.7%
+of estimates fall within 2.5% of the exact count. Counts below about
+40,000 use linear counting instead, which is at least as accurate; counts
+in the tens are typically off by no more than one.
+
+Sketches are stored sparsely, as an array of uint32
+(register index << 8 | register value) records for non-zero registers,
+so that a tracker seen on a handful of sites takes a handful of bytes,
+and no sketch takes more than 64 KB.
+"""
+
+import numpy as np
+
+
+PRECISION = 14
+NUM_REGISTERS = 1 << PRECISION
+
+_ALPHA = 0.7213 / (1 + 1.079 / NUM_REGISTERS)
+
+
+def _hash(values):
+    """splitmix64 finalizer; spreads site IDs over 64 bits."""
+    x = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _registers(site_ids):
+    """Returns the (register index, register value) of every site ID."""
+    hashes = _hash(site_ids)
+    idx = hashes >> np.uint64(64 - PRECISION)
+    rest = hashes & np.uint64((1 << (64 - PRECISION)) - 1)
+    # number of leading zeros in the remaining 50 bits, plus one;
+    # 50 bits fit in a float64 exactly, so frexp gives the exact bit length
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    ranks = (64 - PRECISION + 1) - bit_length
+    return idx.astype(np.uint32), ranks.astype(np.uint32)
+
+
+def sketch(site_ids):
+    """Returns the sparse sketch (uint32 records) of a set of site IDs."""
+    return merge(*_registers(site_ids))
+
+
+def merge(idx, ranks, groups=None):
+    """Merges (register index, value) pairs, keeping the highest value
+    per register (per group, if given).
+
+    :return: sorted uint32 records, or (groups, records) if groups were given
+    """
+    keys = idx.astype(np.int64)
+    if groups is not None:
+        keys = keys + groups.astype(np.int64) * NUM_REGISTERS
+    order = np.lexsort((ranks, keys))
+    keys, ranks = keys[order], ranks[order]
+    # the last (highest) value for every register
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = keys[1:] != keys[:-1]
+    keys, ranks = keys[last], ranks[last]
+
+    records = ((keys % NUM_REGISTERS).astype(np.uint32) << np.uint32(8)) | \
+        ranks.astype(np.uint32)
+    if groups is None:
+        return records
+    return keys // NUM_REGISTERS, records
+
+
+def to_bytes(records):
+    return records.astype("<u4").tobytes()
+
+
+def from_bytes(blob):
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def estimate(records, groups=None, num_groups=None):
+    """Estimates distinct counts from merged records.
+
+    :return: the estimate, or an array of estimates indexed by group
+    """
+    if groups is None:
+        return float(estimate(records, np.zeros(len(records), dtype=np.int64), 1)[0])
+
+    ranks = (records & np.uint32(0xFF)).astype(np.float64)
+    nonzero = np.bincount(groups, minlength=num_groups)
+    zeros = NUM_REGISTERS - nonzero
+    # zero-valued registers contribute 2^0 each
+    harmonic = np.bincount(groups, np.exp2(-ranks), minlength=num_groups) + zeros
+
+    raw = _ALPHA * NUM_REGISTERS ** 2 / harmonic
+    with np.errstate(divide='ignore'):
+        linear = NUM_REGISTERS * np.log(NUM_REGISTERS / zeros)
+
+    return np.where((raw <= 2.5 * NUM_REGISTERS) & (zeros > 0), linear, raw)
+
+
+def merge_blobs(blobs, group_ids):
+    """Merges stored sketches by group.
+
+    :param blobs: stored sketches
+    :param group_ids: the group (for example, tracker ID) of every sketch
+    :return: (groups, records) with one merged sketch per group
+    """
+    records = from_bytes(b"".join(blobs))
+    groups = np.repeat(np.asarray(group_ids, dtype=np.int64),
+                       [len(blob) // 4 for blob in blobs])
+    return merge(records >> np.uint32(8), records & np.uint32(0xFF), groups)
+
+
+def create_tables(cur):
+    cur.execute("DROP TABLE IF EXISTS tracker_sketch")
+    cur.execute("""
+        CREATE TABLE tracker_sketch (
+            scan_id INTEGER NOT NULL,
+            tracker_id INTEGER NOT NULL,
+            sites BLOB NOT NULL,
+            PRIMARY KEY (scan_id, tracker_id),
+            FOREIGN KEY(scan_id) REFERENCES scan(id),
+            FOREIGN KEY(tracker_id) REFERENCES tracker(id)
+        ) WITHOUT ROWID""")
+
+    cur.execute("DROP TABLE IF EXISTS visited_sketch")
+    cur.execute("""
+        CREATE TABLE visited_sketch (
+            scan_id INTEGER PRIMARY KEY,
+            sites BLOB NOT NULL,
+            FOREIGN KEY(scan_id) REFERENCES scan(id)
+        )""")
+
+
+def update_sketches(cur):
+    """Sketches the sites of scans that don't have sketches yet.
+
+    :return: the number of newly sketched scans
+    """
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'visited_sketch'")
+    if not cur.fetchone():
+        create_tables(cur)
+
+    cur.execute("SELECT id FROM scan WHERE id NOT IN (SELECT scan_id FROM visited_sketch)")
+    scan_ids = [row[0] for row in cur.fetchall()]
+
+    for scan_id in scan_ids:
+        cur.execute("SELECT DISTINCT tracker_id, site_id FROM tracking WHERE scan_id = ?",
+                    (scan_id,))
+        rows = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+        if len(rows):
+            tracker_ids, records = merge(*_registers(rows[:, 1]), rows[:, 0])
+            # records are sorted by tracker
+            bounds = np.flatnonzero(np.diff(tracker_ids)) + 1
+            cur.executemany(
+                "INSERT INTO tracker_sketch (scan_id, tracker_id, sites) VALUES (?,?,?)",
+                [(scan_id, int(group[0]), to_bytes(group_records))
+                 for group, group_records in zip(np.split(tracker_ids, bounds),
+                                                 np.split(records, bounds))])
+
+        cur.execute("SELECT DISTINCT initial_site_id FROM scan_sites WHERE scan_id = ?",
+                    (scan_id,))
+        cur.execute("INSERT INTO visited_sketch (scan_id, sites) VALUES (?,?)", (
+            scan_id, to_bytes(sketch([row[0] for row in cur.fetchall()]))))
+
+    return len(scan_ids)
+
+
+# pylint: disable-next=too-many-arguments
+def _scan_filter(*, since=None, until=None, browsers=None, regions=None,
+                 no_blocking=None, daily_scan=None):
+    conditions, params = ["1"], []
+    if since is not None:
+        conditions.append("scan.start_time >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("scan.start_time < ?")
+        params.append(until)
+    if browsers:
+        conditions.append(f"browser.name IN ({','.join('?' * len(browsers))})")
+        params.extend(browsers)
+    if regions:
+        conditions.append(f"scan.region IN ({','.join('?' * len(regions))})")
+        params.extend(regions)
+    if no_blocking is not None:
+        conditions.append("scan.no_blocking = ?")
+        params.append(no_blocking)
+    if daily_scan is not None:
+        conditions.append("scan.daily_scan = ?")
+        params.append(daily_scan)
+    return " AND ".join(conditions), params
+
+
+def estimate_prevalence(cur, **scan_filter):
+    """Estimates the number of distinct sites each tracker was seen on
+    in the selected scans.
+
+    Scans can be selected by start time (`since` and `until`), `browsers`,
+    `regions`, `no_blocking` and `daily_scan`.
+
+    :return: dict of tracker base domains to estimates
+    """
+    where, params = _scan_filter(**scan_filter)
+    cur.execute(f"""
+        SELECT ts.tracker_id, ts.sites
+        FROM tracker_sketch ts
+        JOIN scan ON scan.id = ts.scan_id
+        JOIN browser ON browser.id = scan.browser_id
+        WHERE {where}""", params)
+    rows = cur.fetchall()
+    if not rows:
+        return {}
+
+    tracker_ids, blobs = zip(*rows)
+    groups, records = merge_blobs(blobs, tracker_ids)
+    estimates = estimate(records, groups, int(groups.max()) + 1)
+
+    bases = dict(cur.execute("SELECT id, base FROM tracker"))
+    return {bases[i]: round(float(estimates[i])) for i in np.unique(groups)}
+
+
+def estimate_total_sites(cur, **scan_filter):
+    """Estimates the number of distinct sites visited in the selected scans
+    (see estimate_prevalence())."""
+    where, params = _scan_filter(**scan_filter)
+    cur.execute(f"""
+        SELECT vs.sites
+        FROM visited_sketch vs
+        JOIN scan ON scan.id = vs.scan_id
+        JOIN browser ON browser.id = scan.browser_id
+        WHERE {where}""", params)
+    blobs = [row[0] for row in cur.fetchall()]
+    if not blobs:
+        return 0
+    _, records = merge_blobs(blobs, [0] * len(blobs))
+    return round(estimate(records))
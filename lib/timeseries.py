@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""Tracker prevalence over time.
+
+Loads tracking observations from badger.sqlite3 into NumPy arrays once,
+sorted by scan start time, so that any time window is a contiguous slice.
+Prevalence (number of distinct sites a tracker was seen on), rolling
+windows, period-over-period changes and anomaly scores are then computed
+as vectorized operations over those slices, without going back to SQLite.
+
+Windows are given in days relative to "now" (UTC, like SQLite's
+DATETIME('now')) and include their start but not their end.
+"""
+
+from datetime import datetime, timezone
+from itertools import chain
+
+import numpy as np
+
+
+def _fetch_array(cur, sql, num_columns, params=()):
+    cur.execute(sql, params)
+    return np.fromiter(chain.from_iterable(cur), dtype=np.int64).reshape(-1, num_columns)
+
+
+class TrackerSeries:
+    """Site counts per tracker, per scan."""
+
+    def __init__(self, cur, no_blocking=True, daily_scan=True, now=None):
+        self.now = np.datetime64(
+            now or datetime.now(timezone.utc).replace(tzinfo=None), 's')
+
+        cur.execute("SELECT MAX(id) FROM tracker")
+        self.trackers = [None] * ((cur.fetchone()[0] or 0) + 1)
+        for rowid, base in cur.execute("SELECT id, base FROM tracker"):
+            self.trackers[rowid] = base
+        self.tracker_ids = {base: i for i, base in enumerate(self.trackers) if base}
+
+        cur.execute("SELECT MAX(id) FROM site")
+        self.num_site_ids = (cur.fetchone()[0] or 0) + 1
+
+        self.tracking_types = dict(cur.execute("SELECT name, id FROM tracking_type"))
+
+        scan_filter = "scan.no_blocking = ? AND scan.daily_scan = ?"
+        params = (no_blocking, daily_scan)
+
+        cur.execute(f"SELECT id, start_time, browser_id FROM scan WHERE {scan_filter} "
+                    "ORDER BY start_time, id", params)
+        scans = cur.fetchall()
+        self.scan_times = np.array([str(start_time) for _, start_time, _ in scans],
+                                   dtype='datetime64[s]')
+        self.scan_browsers = np.array([browser_id for _, _, browser_id in scans],
+                                      dtype=np.int64)
+        # scan ID -> position in time order
+        scan_pos = np.full(max((scan_id for scan_id, _, _ in scans), default=0) + 1, -1)
+        scan_pos[[scan_id for scan_id, _, _ in scans]] = np.arange(len(scans))
+
+        # (scan, tracker, site, tracking type) observations,
+        # sorted by scan position so that time windows are slices
+        rows = _fetch_array(cur, f"""
+            SELECT DISTINCT tr.scan_id, tr.tracker_id, tr.site_id,
+                COALESCE(tr.tracking_type_id, 0)
+            FROM tracking tr
+            JOIN scan ON scan.id = tr.scan_id
+            WHERE {scan_filter}""", 4, params)
+        rows[:, 0] = scan_pos[rows[:, 0]]
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        self.obs_scan, self.obs_tracker, self.obs_site, self.obs_type = rows.T
+
+        # the tracker x scan site count matrix, stored sparsely
+        # as (scan, tracker, number of sites) triples, in scan order
+        scan_trackers = self.obs_scan * len(self.trackers) + self.obs_tracker
+        # drop tracking type duplicates
+        scan_trackers = np.unique(scan_trackers * self.num_site_ids + self.obs_site) \
+            // self.num_site_ids
+        keys, self.count_sites = np.unique(scan_trackers, return_counts=True)
+        self.count_scan, self.count_tracker = np.divmod(keys, len(self.trackers))
+
+        # sites visited (with or without tracking), by scan
+        rows = _fetch_array(cur, f"""
+            SELECT DISTINCT scan_sites.scan_id, scan_sites.initial_site_id
+            FROM scan_sites
+            JOIN scan ON scan.id = scan_sites.scan_id
+            WHERE {scan_filter}""", 2, params)
+        rows[:, 0] = scan_pos[rows[:, 0]]
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        self.visit_scan, self.visit_site = rows.T
+
+    def scans(self, days=None, until_days=0):
+        """Returns the (start, stop) range of scan positions
+        for scans started `days` to `until_days` days ago."""
+        start = 0
+        if days is not None:
+            start = np.searchsorted(self.scan_times, self.now - np.timedelta64(days, 'D'), 'left')
+        stop = np.searchsorted(self.scan_times, self.now - np.timedelta64(until_days, 'D'), 'left')
+        return int(start), int(stop)
+
+    @staticmethod
+    def _slice(scan_positions, scan_range):
+        return slice(*np.searchsorted(scan_positions, scan_range, 'left'))
+
+    def num_scans(self, days=None, until_days=0):
+        """Returns the number of scans that visited any sites."""
+        rows = self._slice(self.visit_scan, self.scans(days, until_days))
+        return len(np.unique(self.visit_scan[rows]))
+
+    def total_sites(self, days=None, until_days=0):
+        """Returns the number of distinct sites visited."""
+        rows = self._slice(self.visit_scan, self.scans(days, until_days))
+        return len(np.unique(self.visit_site[rows]))
+
+    def prevalence(self, days=None, until_days=0, tracking_type=None):
+        """Returns the number of distinct sites each tracker was seen on,
+        as an array indexed by tracker ID."""
+        rows = self._slice(self.obs_scan, self.scans(days, until_days))
+        trackers, sites = self.obs_tracker[rows], self.obs_site[rows]
+
+        if tracking_type is not None:
+            wanted = self.obs_type[rows] == self.tracking_types.get(tracking_type, -1)
+            trackers, sites = trackers[wanted], sites[wanted]
+
+        pairs = np.unique(trackers * self.num_site_ids + sites)
+        return np.bincount(pairs // self.num_site_ids, minlength=len(self.trackers))
+
+    def top(self, counts, limit=None):
+        """Returns (tracker base, count) tuples for trackers
+        with non-zero counts, highest counts first."""
+        ranked = np.argsort(-counts, kind='stable')
+        ranked = ranked[counts[ranked] > 0][:limit]
+        return [(self.trackers[i], counts[i].item()) for i in ranked]
+
+    def rolling_prevalence(self, window_days, step_days, num_windows):
+        """Returns a trackers x windows prevalence matrix, where window
+        number `i` covers the `window_days` days ending `i * step_days`
+        days ago."""
+        return np.stack([self.prevalence(days=i * step_days + window_days,
+                                         until_days=i * step_days)
+                         for i in range(num_windows)], axis=1)
+
+    def period_over_period(self, days, offset_days=None):
+        """Compares prevalence over the last `days` days to prevalence
+        over the same length period `offset_days` (by default, `days`) earlier.
+
+        :return: dict of prevalence ("prev", "curr") and relative
+            (to the most prevalent tracker) prevalence ("rel_prev",
+            "rel_curr", "rel_delta") arrays, indexed by tracker ID
+        """
+        if offset_days is None:
+            offset_days = days
+
+        prev = self.prevalence(days=offset_days + days, until_days=offset_days)
+        curr = self.prevalence(days=days)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rel_prev = np.nan_to_num(prev / prev.max())
+            rel_curr = np.nan_to_num(curr / curr.max())
+
+        return {
+            "prev": prev,
+            "curr": curr,
+            "rel_prev": rel_prev,
+            "rel_curr": rel_curr,
+            # trackers not seen before count as going from nothing to everything
+            "rel_delta": np.where(prev > 0, rel_curr - rel_prev, 1.0),
+        }
+
+    def anomaly_scores(self, recent_days=7, baseline_days=60):
+        """Scores sudden appearances (positive scores) and disappearances
+        (negative scores) of trackers.
+
+        Compares the average number of sites per scan over the last
+        `recent_days` days to the average over the `baseline_days` days
+        before that, in units of baseline standard deviations (plus one,
+        so that trackers with flat baselines don't score infinitely).
+
+        :return: array of scores indexed by tracker ID
+        """
+        def per_scan_stats(scan_range):
+            rows = self._slice(self.count_scan, scan_range)
+            num_scans = max(scan_range[1] - scan_range[0], 1)
+            trackers, counts = self.count_tracker[rows], self.count_sites[rows]
+            sums = np.bincount(trackers, counts, minlength=len(self.trackers))
+            sq_sums = np.bincount(trackers, counts.astype(np.float64) ** 2,
+                                  minlength=len(self.trackers))
+            means = sums / num_scans
+            # scans without the tracker count as zeroes
+            stds = np.sqrt(np.maximum(sq_sums / num_scans - means ** 2, 0))
+            return means, stds
+
+        recent_mean, _ = per_scan_stats(self.scans(recent_days))
+        base_mean, base_std = per_scan_stats(
+            self.scans(recent_days + baseline_days, recent_days))
+
+        return (recent_mean - base_mean) / (base_std + 1)
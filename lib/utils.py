@@ -1,3 +1,4 @@
+import contextlib
 import pathlib
 import subprocess
 
@@ -7,3 +8,59 @@ def run(cmd, cwd=pathlib.Path(__file__).parent.parent.resolve()):
             cmd, cwd=cwd, capture_output=True, check=True, text=True)
 
     return res.stdout.strip()
+
+@contextlib.contextmanager
+def stream(cmd, cwd=pathlib.Path(__file__).parent.parent.resolve()):
+    """Like run(), but for reading large outputs line by line.
+
+    Yields the command's stdout as a file object. It is fine to stop
+    reading early; the command is cleaned up when the context exits.
+    Raises CalledProcessError if the command fails after all of its
+    output was read.
+    """
+    with subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, text=True) as proc:
+        yield proc.stdout
+        # stopping early makes the command fail, which is fine
+        if not proc.stdout.read(1) and proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+@contextlib.contextmanager
+def cat_file(cwd=pathlib.Path(__file__).parent.parent.resolve()):
+    """Yields a BlobReader over a single `git cat-file --batch` process,
+    for reading many blobs without starting a git process for each."""
+    with subprocess.Popen(["git", "cat-file", "--batch"], cwd=cwd,
+                          stdin=subprocess.PIPE, stdout=subprocess.PIPE) as proc:
+        yield BlobReader(proc)
+        proc.stdin.close()
+
+class BlobReader:
+    """Reads blobs from a long-running `git cat-file --batch` process."""
+
+    def __init__(self, proc):
+        self.proc = proc
+
+    def request(self, obj):
+        """Returns the blob's size, or None if the blob doesn't exist."""
+        self.proc.stdin.write(obj.encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if header[-1] == b"missing":
+            return None
+        return int(header[-1])
+
+    def lines(self, size):
+        """Yields the requested blob line by line.
+        The blob must be read to the end."""
+        while size > 0:
+            # the blob may not end in a newline,
+            # so don't read into the newline that follows it
+            line = self.proc.stdout.readline(size)
+            size -= len(line)
+            yield line.decode("utf-8", errors="replace")
+        # blobs are followed by a newline
+        self.proc.stdout.read(1)
+
+    def read(self, size):
+        data = self.proc.stdout.read(size)
+        self.proc.stdout.read(1)
+        return data
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""WebDriver command latency accounting.
+
+Counts and times every WebDriver command (executeScript, findElement,
+getCurrentUrl, ...) a crawler's driver sends, by command name and by
+crawl phase, in fixed log-scale histograms.
+
+Usage: python -m lib.webdriver_stats STATS_JSON [STATS_JSON ...]
+to compare scans (for example, a Chrome and a Firefox scan).
+"""
+
+import argparse
+import bisect
+import contextlib
+import json
+import time
+
+# histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class CommandStats:
+    """Per (phase, command) counts, total and maximum times,
+    and histograms of WebDriver commands."""
+
+    def __init__(self, browser=None):
+        self.browser = browser
+        self.phase = "other"
+        self.stats = {}
+
+    def instrument(self, driver):
+        """Times every command `driver` sends from now on.
+
+        Element methods (click(), get_property(), ...) go through
+        the driver's execute() as well, so they get timed too.
+        """
+        execute = driver.execute
+
+        def timed_execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                self.record(driver_command, time.perf_counter() - start)
+
+        driver.execute = timed_execute
+
+    @contextlib.contextmanager
+    def in_phase(self, phase):
+        """Attributes commands sent within the block to `phase`."""
+        prev_phase = self.phase
+        self.phase = phase
+        try:
+            yield
+        finally:
+            self.phase = prev_phase
+
+    def record(self, command, seconds):
+        key = (self.phase, command)
+        entry = self.stats.get(key)
+        if entry is None:
+            entry = self.stats[key] = {
+                "count": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "histogram": [0] * (len(BUCKETS_MS) + 1),
+            }
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        entry["histogram"][bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+
+    def totals(self, by="command"):
+        """Returns counts and times summed over phases (by="command")
+        or over commands (by="phase"), most time first."""
+        totals = {}
+        for (phase, command), entry in self.stats.items():
+            total = totals.setdefault(command if by == "command" else phase, {
+                "count": 0, "seconds": 0.0})
+            total["count"] += entry["count"]
+            total["seconds"] += entry["seconds"]
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["seconds"]))
+
+    def to_json(self):
+        return {
+            "browser": self.browser,
+            "buckets_ms": list(BUCKETS_MS),
+            "commands": self.totals("command"),
+            "phases": self.totals("phase"),
+            "by_phase": [
+                {"phase": phase, "command": command, **entry}
+                for (phase, command), entry in sorted(
+                    self.stats.items(), key=lambda item: -item[1]["seconds"])
+            ],
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def summary(self, limit=15):
+        """Returns a table of the costliest (phase, command) pairs."""
+        lines = [f"{'phase':<16} {'command':<24} {'count':>8} {'total s':>9} {'mean ms':>9}"]
+        for entry in self.to_json()["by_phase"][:limit]:
+            lines.append(
+                f"{entry['phase']:<16} {entry['command']:<24} {entry['count']:>8} "
+                f"{entry['seconds']:>9.1f} {entry['seconds'] / entry['count'] * 1000:>9.1f}")
+        return "\n".join(lines)
+
+
+def print_comparison(stats_files):
+    """Prints total time and mean latency per command, side by side."""
+    scans = []
+    for path in stats_files:
+        with open(path, encoding="utf-8") as f:
+            scans.append(json.load(f))
+
+    commands = sorted({command for scan in scans for command in scan["commands"]},
+                      key=lambda command: -max(scan["commands"].get(command, {}).get(
+                          "seconds", 0) for scan in scans))
+
+    print(f"{'command':<24}" + "".join(
+        f" {(scan['browser'] or path)[:20]:>20}" for scan, path in zip(scans, stats_files)))
+    for command in commands:
+        cells = []
+        for scan in scans:
+            entry = scan["commands"].get(command)
+            cells.append(f"{entry['seconds']:.0f}s {entry['seconds'] / entry['count'] * 1000:.0f}ms"
+                         if entry else "-")
+        print(f"{command:<24}" + "".join(f" {cell:>20}" for cell in cells))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('stats_files', nargs='+', metavar='STATS_JSON',
+                    help="webdriver_stats.json written by crawler.py --webdriver-stats")
+    print_comparison(ap.parse_args().stats_files)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""Finds log.txt revisions where tracking by a domain was first seen.
+
+    ./log_index.py search doubleclick.net
+
+Searching brings the index up to date first, which takes a while
+the first time around. Afterwards, only new revisions get indexed.
+"""
+
+import argparse
+import pathlib
+
+from lib.log_index import LogIndex
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--index', default="log_index.sqlite3",
+                    help="path to the index database")
+    ap.add_argument('--repo', default=pathlib.Path(__file__).parent.resolve(),
+                    help="path to the badger-sett repository")
+
+    commands = ap.add_subparsers(dest='command', required=True)
+    commands.add_parser('update', help="index new revisions of log.txt")
+    search = commands.add_parser('search', help="search the index")
+    search.add_argument('domain', help="domain (or part of a domain) to look for")
+    search.add_argument('--no-update', action='store_true', default=False,
+                        help="don't index new revisions first")
+
+    args = ap.parse_args()
+
+    index = LogIndex(args.index, args.repo)
+
+    if args.command == 'update' or not args.no_update:
+        num_revisions = index.update()
+        if args.command == 'update':
+            print(f"Indexed {num_revisions} new revisions")
+
+    if args.command == 'search':
+        for rev, date, label, found in index.search(args.domain):
+            if isinstance(found, tuple):
+                found = f"{found[0]}\t{found[1]}"
+            print(f"{rev[:7]}  {date}  {label[:20]:<20}  {found or ''}")
+
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
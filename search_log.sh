@@ -6,6 +6,8 @@
 #
 # Falls back to searching results.json for old revisions
 # where we didn't log new domains in log.txt.
+#
+# The history search uses an index kept up to date by log_index.py.
 
 if [ -z "$1" ] || [ $# -ne 1 ]; then
   echo "Usage: $0 DOMAIN"
@@ -54,6 +56,23 @@ print_results() {
   echo
 }
 
+# Prints an SQL condition matching rows of the site or tracker table
+# whose domain contains the search term.
+#
+# Uses the trigram indexes created by initdb.py; terms shorter
+# than a trigram fall back to a (full table scan) LIKE.
+domain_matches() {
+  local alias="$1" table="$2" field="$3" term="$4"
+
+  if [ ${#term} -ge 3 ]; then
+    # quote as an FTS5 string to match the term as a substring
+    printf "%s.id IN (SELECT rowid FROM %s_fts WHERE %s_fts MATCH '\"%s\"')" \
+      "$alias" "$table" "$table" "${term//\"/\"\"}"
+  else
+    printf "%s.%s LIKE '%%%s%%'" "$alias" "$field" "$term"
+  fi
+}
+
 show_trackers_by_site() {
   local query_results
   query_results=$(sqlite3 badger.sqlite3 -batch \
@@ -67,7 +86,7 @@ show_trackers_by_site() {
       JOIN scan ON scan.id = t.scan_id
       JOIN browser ON browser.id = scan.browser_id
       WHERE scan.start_time > DATETIME('now', '-90 day')
-        AND site.fqdn LIKE '%$1%'
+        AND $(domain_matches site site fqdn "$1")
       GROUP BY site.fqdn, scan.browser_id, scan.daily_scan
       ORDER BY COUNT(DISTINCT tr.base) DESC")
   if [ -n "$query_results" ]; then
@@ -89,7 +108,7 @@ show_sites_by_tracker() {
       JOIN scan ON scan.id = t.scan_id
       JOIN browser ON browser.id = scan.browser_id
       WHERE scan.start_time > DATETIME('now', '-90 day')
-        AND tr.base LIKE '%$1%'
+        AND $(domain_matches tr tracker base "$1")
       GROUP BY tr.base, scan.browser_id, scan.daily_scan
       ORDER BY COUNT(DISTINCT site.fqdn) DESC")
   if [ -n "$query_results" ]; then
@@ -113,7 +132,7 @@ show_most_recent_matches() {
       JOIN browser b ON b.id = scan.browser_id
       JOIN site ON site.id = t.site_id
       LEFT JOIN tracking_type tt ON tt.id = t.tracking_type_id
-      WHERE tr.base LIKE '%$1%'
+      WHERE $(domain_matches tr tracker base "$1")
       GROUP BY scan.daily_scan,
         scan.end_time,
         tr.base
@@ -136,36 +155,4 @@ fi
 
 printf "Searching through git history ...\n\n"
 
-tmp_dir=$(mktemp -d "${TMPDIR:-/tmp}/search_log.XXXXXXXXX")
-trap 'rm -rf "$tmp_dir"' EXIT
-
-for rev in $(git rev-list HEAD -- log.txt); do
-  found=
-  git --no-pager show "$rev":log.txt > "$tmp_dir/log.txt"
-  if grep -Eq '[Nn]ew (domains|trackers) in snitch_map' "$tmp_dir/log.txt"; then
-    found=$(grep -m 1 -nE "[Nn]ew (domains|trackers) in snitch_map.*${1//./\\.}" "$tmp_dir/log.txt" | \
-      cut -d : -f 1)
-
-    if [ -n "$found" ]; then
-      counter=1
-      while ! sed -n "$((found-counter))p" "$tmp_dir/log.txt" | grep -Eq '[Vv]isiting [0-9]+:'; do
-        counter=$((counter+1))
-        [ "$((found-counter))" -eq 0 ] && break
-      done
-
-      if [ "$((found-counter))" -eq 0 ]; then
-        found=detected-but-unable-to-find-visiting-line
-      else
-        found=$(sed -n "$((found-counter))p" "$tmp_dir/log.txt" | sed -E 's/.*isiting ([0-9]+): (.*)/\1\t\2/')
-      fi
-    fi
-
-  elif git --no-pager show "$rev":results.json | grep -Eq "^[ ]+\"[^\"]*$1[^\"]*\": \{$"; then
-    found=detected-according-to-results-json
-  fi
-
-  printf "%s  %-20.20s  %s\n" \
-    "$(git show -s --format="%h  %ci" "$rev")" \
-    "$(git show -s --format="%s" "$rev" | sed -e 's/^.*(//' -e 's/).*$//' -e 's/\(Add data \|Update seed data: \|master \|from \)//g' | rev | cut -d ' ' -f 1,2 | rev)" \
-    "$found"
-done
+"$(dirname "$0")/log_index.py" search "$1"
@@ -1,62 +1,76 @@
 #!/usr/bin/env python3
 
+import argparse
+import pathlib
 import sqlite3
+import sys
 
+from datetime import datetime, timedelta, timezone
 
-def print_prevalence_summary(cur):
-    cur.execute("""
-        SELECT COUNT(DISTINCT initial_site_id)
-        FROM scan_sites
-        JOIN scan ON scan.id = scan_id
-        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
-            AND scan.start_time > DATETIME('now', '-365 day')""")
-    total_sites = cur.fetchone()[0]
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
 
-    print("\nThe most prevalent (seen tracking on the greatest number of websites)"
-        "\nthird-party tracking domains over the last 365 days:\n")
-    cur.execute("""
-        SELECT t.base, COUNT(DISTINCT tr.site_id) AS num_sites
-        FROM tracking tr
-        JOIN scan ON scan.id = tr.scan_id
-        JOIN tracker t ON t.id = tr.tracker_id
-        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
-            AND scan.start_time > DATETIME('now', '-365 day')
-        GROUP BY t.base
-        ORDER BY num_sites DESC
-        LIMIT 40""")
-    top_prevalence = None
-    col_width = None
-    for row in cur.fetchall():
-        if not top_prevalence:
-            top_prevalence = row[1]
-            col_width = len(str(top_prevalence))
+# pylint: disable-next=wrong-import-position
+from lib.sketch import estimate_prevalence, estimate_total_sites # noqa:E402
+# pylint: disable-next=wrong-import-position
+from lib.timeseries import TrackerSeries # noqa:E402
+
+
+def print_rows(rows, total_sites, top_prevalence, col_width):
+    for base, num_sites in rows:
         # total site count, site count for tracking domain
-        print(f"  {total_sites}  {row[1]:>{col_width}}  "
+        print(f"  {total_sites}  {num_sites:>{col_width}}  "
             # absolute prevalence
-            f"{round(row[1] / total_sites, 2):.2f}  "
+            f"{round(num_sites / total_sites, 2):.2f}  "
             # relative prevalence, tracking domain
-            f"{round(row[1] / top_prevalence, 2):.2f}  {row[0]}")
+            f"{round(num_sites / top_prevalence, 2):.2f}  {base}")
+
+
+def print_prevalence_summary(series, days=365):
+    total_sites = series.total_sites(days=days)
+
+    print("\nThe most prevalent (seen tracking on the greatest number of websites)"
+        f"\nthird-party tracking domains over the last {days} days:\n")
+    rows = series.top(series.prevalence(days=days), limit=40)
+    if not rows:
+        return
+    top_prevalence = rows[0][1]
+    col_width = len(str(top_prevalence))
+    print_rows(rows, total_sites, top_prevalence, col_width)
 
     print("\nThe most prevalent canvas fingerprinters over same date range:\n")
-    cur.execute("""
-        SELECT t.base, COUNT(DISTINCT tr.site_id) AS num_sites
-        FROM tracking tr
-        JOIN scan ON scan.id = tr.scan_id
-        JOIN tracker t ON t.id = tr.tracker_id
-        JOIN tracking_type tt ON tt.id = tr.tracking_type_id
-        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
-            AND tt.name = 'canvas' AND scan.start_time > DATETIME('now', '-365 day')
-        GROUP BY t.base
-        ORDER BY num_sites DESC
-        LIMIT 20""")
-    for row in cur.fetchall():
-        print(f"  {total_sites}  {row[1]:>{col_width}}  "
-            f"{round(row[1] / total_sites, 2):.2f}  "
-            f"{round(row[1] / top_prevalence, 2):.2f}  {row[0]}")
+    print_rows(series.top(series.prevalence(days=days, tracking_type="canvas"), limit=20),
+               total_sites, top_prevalence, col_width)
+    print()
+
+
+def print_prevalence_estimates(cur, days=365):
+    """Like print_prevalence_summary(), but merges the HyperLogLog sketches
+    stored by initdb.py instead of counting distinct sites exactly."""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    scan_filter = {"since": since, "no_blocking": True, "daily_scan": True}
+    total_sites = estimate_total_sites(cur, **scan_filter)
+
+    print("\nThe most prevalent (seen tracking on the greatest number of websites)"
+        f"\nthird-party tracking domains over the last {days} days (estimated):\n")
+    rows = sorted(estimate_prevalence(cur, **scan_filter).items(),
+                  key=lambda row: row[1], reverse=True)[:40]
+    if not rows:
+        return
+    print_rows(rows, total_sites, rows[0][1], len(str(rows[0][1])))
     print()
 
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--days', type=int, default=365,
+                    help="summarize the last DAYS days")
+    ap.add_argument('--estimate', action='store_true', default=False,
+                    help="estimate from site count sketches (fast, ~1%% error)")
+    args = ap.parse_args()
+
     with sqlite3.connect("badger.sqlite3", detect_types=sqlite3.PARSE_DECLTYPES) as db:
-        cur = db.cursor()
-        print_prevalence_summary(cur)
+        if args.estimate:
+            print_prevalence_estimates(db.cursor(), args.days)
+        else:
+            print_prevalence_summary(TrackerSeries(db.cursor()), args.days)
@@ -0,0 +1,26 @@
+#!/usr/bin/env bash
+
+# Runs a report from sql/server.py and prints it as a table.
+#
+# Asks the query service if one is running (see ./sql/server.py serve),
+# otherwise runs the report directly against badger.sqlite3.
+#
+# Usage: ./sql/query.sh REPORT [KEY=VALUE ...]
+
+if [ -z "$1" ]; then
+  echo "Usage: $0 REPORT [KEY=VALUE ...]"
+  exit 1
+fi
+
+report="$1"
+shift
+
+query_url="${BADGER_QUERY_URL:-http://127.0.0.1:8642}/reports/$report?format=psv"
+for param in "$@"; do
+  query_url="$query_url&$param"
+done
+
+{
+  curl -sf "$query_url" 2>/dev/null || \
+    "$(dirname "$0")/server.py" run "$report" "$@"
+} | column -s '|' -t
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+
+"""Read-only HTTP/JSON query service over badger.sqlite3.
+
+Keeps a pool of read-only connections with the report queries below
+compiled and cached, and caches report results until the database
+changes (as reported by PRAGMA data_version), or for at most a few
+minutes, since reports are relative to the current time.
+
+Start the server (from the repository root):
+
+    ./sql/server.py serve
+
+Then query it:
+
+    curl 'http://localhost:8642/reports'
+    curl 'http://localhost:8642/reports/prevalence?days=90&limit=10'
+    curl 'http://localhost:8642/reports/new?format=psv' | column -s '|' -t
+
+Reports can also be run without a server, which is what sql/query.sh
+falls back to:
+
+    ./sql/server.py run gone days=30
+"""
+
+import argparse
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+
+REPORTS = {
+    "prevalence": ({"days": 365, "limit": 40, "tracking_type": None}, """
+        SELECT t.base, COUNT(DISTINCT tr.site_id) AS num_sites
+        FROM tracking tr
+        JOIN scan ON scan.id = tr.scan_id
+        JOIN tracker t ON t.id = tr.tracker_id
+        LEFT JOIN tracking_type tt ON tt.id = tr.tracking_type_id
+        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
+            AND scan.start_time > DATETIME('now', '-' || :days || ' day')
+            AND (:tracking_type IS NULL OR tt.name = :tracking_type)
+        GROUP BY t.base
+        ORDER BY num_sites DESC
+        LIMIT :limit"""),
+
+    "total-sites": ({"days": 365, "until_days": 0}, """
+        SELECT COUNT(DISTINCT initial_site_id) AS num_sites,
+            COUNT(DISTINCT scan_id) AS num_scans
+        FROM scan_sites
+        JOIN scan ON scan.id = scan_id
+        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
+            AND scan.start_time >= DATETIME('now', '-' || :days || ' day')
+            AND scan.start_time < DATETIME('now', '-' || :until_days || ' day')"""),
+
+    "trends": ({"prev_days": 60, "curr_days": 30}, """
+        SELECT t.base,
+            COUNT(DISTINCT CASE WHEN scan.start_time < DATETIME('now', '-' || :curr_days || ' day')
+                THEN tr.site_id END) AS num_sites_prev,
+            COUNT(DISTINCT CASE WHEN scan.start_time >= DATETIME('now', '-' || :curr_days || ' day')
+                THEN tr.site_id END) AS num_sites
+        FROM tracking tr
+        JOIN scan ON scan.id = tr.scan_id
+        JOIN tracker t ON t.id = tr.tracker_id
+        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
+            AND scan.start_time >= DATETIME('now', '-' || :prev_days || ' day')
+        GROUP BY t.base
+        ORDER BY num_sites DESC"""),
+
+    "new": ({"days": 30, "limit": 30}, """
+        SELECT t.base,
+            COUNT(DISTINCT site.id) num_sites,
+            COUNT(DISTINCT s.id) num_scans
+        FROM tracker t
+        JOIN tracking tr ON tr.tracker_id = t.id
+        JOIN scan s ON s.id = tr.scan_id
+        JOIN site ON site.id = tr.site_id
+        WHERE s.daily_scan = 1
+            AND s.start_time > DATETIME('now', '-' || :days || ' day')
+            AND t.id NOT IN (SELECT t2.id
+                FROM tracker t2
+                JOIN tracking tr2 ON tr2.tracker_id = t2.id
+                JOIN scan s2 ON s2.id = tr2.scan_id
+                WHERE s2.daily_scan = 1
+                    AND s2.start_time > DATETIME('now', '-12 month')
+                    AND s2.start_time <= DATETIME('now', '-' || :days || ' day'))
+        GROUP BY t.id
+        ORDER BY num_sites DESC, num_scans DESC
+        LIMIT :limit"""),
+
+    "gone": ({"days": 30, "limit": 30}, """
+        SELECT t.base,
+            COUNT(DISTINCT site.id) num_sites,
+            COUNT(DISTINCT s.id) num_scans
+        FROM tracker t
+        JOIN tracking tr ON tr.tracker_id = t.id
+        JOIN scan s ON s.id = tr.scan_id
+        JOIN site ON site.id = tr.site_id
+        WHERE s.daily_scan = 1
+            AND s.start_time > DATETIME('now', '-12 month')
+            AND s.start_time <= DATETIME('now', '-' || :days || ' day')
+            AND t.id NOT IN (SELECT t2.id
+                FROM tracker t2
+                JOIN tracking tr2 ON tr2.tracker_id = t2.id
+                JOIN scan s2 ON s2.id = tr2.scan_id
+                WHERE s2.daily_scan = 1
+                    AND s2.start_time > DATETIME('now', '-' || :days || ' day'))
+        GROUP BY t.id
+        ORDER BY num_sites DESC, num_scans DESC
+        LIMIT :limit"""),
+
+    "slowest-sites": ({"days": 2, "min_duration": 60}, """
+        SELECT browser.name AS browser,
+            scan.region,
+            scan_sites.start_time AS visit_start,
+            CASE WHEN scan_sites.status_id = 1 THEN '-' ELSE site_status.name END AS status,
+            start_site.fqdn AS initial_site_fqdn,
+            CASE WHEN end_site.fqdn = start_site.fqdn THEN '-' ELSE end_site.fqdn END AS final_site_fqdn,
+            (CAST(STRFTIME('%s', scan_sites.end_time) AS INTEGER) -
+                CAST(STRFTIME('%s', scan_sites.start_time) AS INTEGER)) AS visit_duration
+        FROM scan_sites
+        JOIN site AS start_site ON start_site.id = scan_sites.initial_site_id
+        JOIN site AS end_site ON end_site.id = scan_sites.final_site_id
+        JOIN site_status ON site_status.id = scan_sites.status_id
+        JOIN scan ON scan.id = scan_sites.scan_id
+        JOIN browser ON browser.id = scan.browser_id
+        WHERE scan.start_time > DATETIME('now', '-' || :days || ' day')
+            AND visit_duration > :min_duration
+        ORDER BY visit_duration DESC, visit_start DESC"""),
+
+    "errors": ({}, """
+        SELECT STRFTIME('%Y', scan.start_time) AS year,
+            browser.name AS browser,
+            error.name AS 'error name',
+            COUNT(*) AS num
+        FROM error
+        JOIN scan_sites ON error_id = error.id
+        JOIN scan ON scan.id = scan_sites.scan_id
+        JOIN browser ON browser.id = scan.browser_id
+        WHERE scan.daily_scan = 1
+        GROUP BY year, browser.name, error.name
+        ORDER BY year DESC, num DESC"""),
+
+    "crashes": ({}, """
+        SELECT STRFTIME('%Y', scan.start_time) AS year,
+            browser.name AS browser,
+            error.name AS 'crash name',
+            COUNT(*) AS num
+        FROM scan_crashes
+        JOIN error ON error.id = scan_crashes.error_id
+        JOIN scan ON scan.id = scan_crashes.scan_id
+        JOIN browser ON browser.id = scan.browser_id
+        WHERE scan.daily_scan = 1
+        GROUP BY year, browser.id, error.id
+        ORDER BY year DESC, num DESC"""),
+}
+
+
+class QueryService:
+    """Runs reports over a pool of read-only connections,
+    caching results until the database changes or `cache_ttl` seconds
+    pass, for the `cache_size` most recently used reports."""
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, db_path, pool_size=4, cache_ttl=600, cache_size=256,
+                 clock=time.monotonic):
+        self.db_path = db_path
+
+        self.pool = queue.Queue()
+        for _ in range(pool_size):
+            self.pool.put(self.connect())
+
+        # PRAGMA data_version values are only comparable
+        # when they come from the same connection
+        self.watcher = self.connect()
+        self.data_version = None
+
+        # (report name, params) -> (expiration time, columns, rows)
+        self.cache = OrderedDict()
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def connect(self):
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                               check_same_thread=False,
+                               cached_statements=len(REPORTS) * 2)
+
+    def check_data_version(self):
+        """Clears the result cache if the database changed."""
+        with self.lock:
+            data_version = self.watcher.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self.data_version:
+                self.data_version = data_version
+                self.cache.clear()
+
+    def run(self, name, **params):
+        """Returns (columns, rows, cached) for the given report."""
+        if name not in REPORTS:
+            raise KeyError(name)
+
+        defaults, sql = REPORTS[name]
+        unknown = set(params) - set(defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+        # query string values are strings; convert to the defaults' types
+        params = {**defaults, **{
+            key: type(defaults[key])(val) if defaults[key] is not None else val
+            for key, val in params.items()}}
+
+        self.check_data_version()
+
+        key = (name, tuple(sorted(params.items())))
+        with self.lock:
+            if key in self.cache:
+                expires, columns, rows = self.cache[key]
+                if expires > self.clock():
+                    self.cache.move_to_end(key)
+                    return columns, rows, True
+                del self.cache[key]
+
+        conn = self.pool.get()
+        try:
+            cur = conn.execute(sql, params)
+            columns = [col[0] for col in cur.description]
+            rows = cur.fetchall()
+        finally:
+            self.pool.put(conn)
+
+        with self.lock:
+            self.cache[key] = (self.clock() + self.cache_ttl, columns, rows)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return columns, rows, False
+
+
+def format_psv(columns, rows):
+    """Formats results like `sqlite3 -batch -header` does."""
+    return "".join("|".join("" if val is None else str(val) for val in row) + "\n"
+                   for row in [columns] + rows)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def respond(self, status, body, content_type="application/json"):
+            body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self): # noqa:N802 pylint:disable=invalid-name
+            url = urlparse(self.path)
+            params = dict(parse_qsl(url.query))
+            fmt = params.pop("format", "json")
+
+            if url.path.rstrip("/") == "/reports":
+                self.respond(200, json.dumps(
+                    {name: defaults for name, (defaults, _) in REPORTS.items()}))
+                return
+
+            name = url.path.rpartition("/reports/")[2]
+
+            start = time.perf_counter()
+            try:
+                columns, rows, cached = service.run(name, **params)
+            except KeyError:
+                self.respond(404, json.dumps({"error": f"Unknown report: {name}"}))
+                return
+            except (ValueError, sqlite3.Error) as ex:
+                self.respond(400, json.dumps({"error": str(ex)}))
+                return
+
+            if fmt == "psv":
+                self.respond(200, format_psv(columns, rows), "text/plain; charset=utf-8")
+            else:
+                self.respond(200, json.dumps({
+                    "columns": columns,
+                    "rows": rows,
+                    "cached": cached,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+                }))
+
+        def log_message(self, format, *args): # pylint:disable=redefined-builtin
+            if not self.server.quiet:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--db', default="badger.sqlite3",
+                    help="path to the database")
+
+    commands = ap.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="start the query service")
+    serve.add_argument('--host', default="127.0.0.1")
+    serve.add_argument('--port', type=int, default=8642)
+    serve.add_argument('--pool-size', type=int, default=4,
+                       help="number of read-only database connections")
+    serve.add_argument('--cache-ttl', type=float, default=600,
+                       help="how long to cache report results for, in seconds")
+    serve.add_argument('--cache-size', type=int, default=256,
+                       help="how many report results to cache")
+    serve.add_argument('--quiet', action='store_true', default=False,
+                       help="don't log requests")
+
+    run = commands.add_parser('run', help="run a report without a server")
+    run.add_argument('report', choices=REPORTS.keys())
+    run.add_argument('params', nargs='*', metavar='KEY=VALUE')
+
+    args = ap.parse_args()
+
+    if args.command == 'run':
+        service = QueryService(args.db, pool_size=1)
+        try:
+            columns, rows, _ = service.run(
+                args.report, **dict(p.split("=", 1) for p in args.params))
+        except ValueError as ex:
+            print(ex, file=sys.stderr)
+            sys.exit(1)
+        try:
+            sys.stdout.write(format_psv(columns, rows))
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # output was piped into something like `head`
+            sys.stderr.close()
+        return
+
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(QueryService(args.db, args.pool_size,
+                                                           args.cache_ttl, args.cache_size)))
+    server.quiet = args.quiet
+    print(f"Serving {args.db} on http://{args.host}:{args.port}/reports")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,39 @@
 #!/usr/bin/env python3
 
+import argparse
+import pathlib
 import sqlite3
+import sys
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
 
-def print_trends(cur):
-    # the date ranges
-    date_prev = "60 day"
-    date_curr = "30 day"
-
-    cur.execute(f"""
-        SELECT COUNT(DISTINCT initial_site_id),
-            COUNT(DISTINCT scan_id)
-        FROM scan_sites
-        JOIN scan ON scan.id = scan_id
-        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
-            AND scan.start_time >= DATETIME('now', '-{date_prev}')
-            AND scan.start_time < DATETIME('now', '-{date_curr}')""")
-    total_sites_prev, total_scans_prev = cur.fetchone()
-
-    cur.execute(f"""
-        SELECT t.base, COUNT(DISTINCT tr.site_id) AS num_sites
-        FROM tracking tr
-        JOIN scan ON scan.id = tr.scan_id
-        JOIN tracker t ON t.id = tr.tracker_id
-        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
-            AND scan.start_time >= DATETIME('now', '-{date_prev}')
-            AND scan.start_time < DATETIME('now', '-{date_curr}')
-        GROUP BY t.base
-        ORDER BY num_sites DESC""")
-
-    prev = { row[0]: row[1] for row in cur.fetchall() }
+# pylint: disable-next=wrong-import-position
+from lib.timeseries import TrackerSeries # noqa:E402
+
+
+# pylint: disable-next=too-many-locals
+def print_trends(series, days=30, offset_days=None):
+    if offset_days is None:
+        offset_days = days
+
+    total_sites_prev = series.total_sites(days=offset_days + days, until_days=offset_days)
+    total_scans_prev = series.num_scans(days=offset_days + days, until_days=offset_days)
+    total_sites = series.total_sites(days=days)
+    total_scans = series.num_scans(days=days)
+
+    periods = series.period_over_period(days, offset_days)
+
+    prev = series.top(periods['prev'])
     if not prev:
         print("Not enough past data for selected date range")
         return
-    top_prevalence_prev = next(iter(prev.values()))
-
-    cur.execute(f"""
-        SELECT COUNT(DISTINCT initial_site_id),
-            COUNT(DISTINCT scan_id)
-        FROM scan_sites
-        JOIN scan ON scan.id = scan_id
-        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
-            AND scan.start_time >= DATETIME('now', '-{date_curr}')""")
-    total_sites, total_scans = cur.fetchone()
-
-    cur.execute(f"""
-        SELECT t.base, COUNT(DISTINCT tr.site_id) AS num_sites
-        FROM tracking tr
-        JOIN scan ON scan.id = tr.scan_id
-        JOIN tracker t ON t.id = tr.tracker_id
-        WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
-            AND scan.start_time >= DATETIME('now', '-{date_curr}')
-        GROUP BY t.base
-        ORDER BY num_sites DESC""")
+    top_tracker_prev, top_prevalence_prev = prev[0]
 
     top_prevalence = None
 
-    for row in cur.fetchall():
+    for base, num_sites in series.top(periods['curr']):
         if not top_prevalence:
-            top_prevalence = row[1]
+            top_prevalence = num_sites
 
             print(f"Comparing {total_scans_prev} scans to {total_scans} scans")
 
@@ -69,40 +44,45 @@ def print_trends(cur):
 
             # absolute change in most prevalent domain
             print("\nMost prevalent tracker:")
-            print(next(iter(prev.keys())), top_prevalence_prev)
-            print(f"{row[0]} {top_prevalence} ({round((top_prevalence - top_prevalence_prev) / top_prevalence_prev * 100, 2):+}%)\n")
+            print(top_tracker_prev, top_prevalence_prev)
+            print(f"{base} {top_prevalence} ({round((top_prevalence - top_prevalence_prev) / top_prevalence_prev * 100, 2):+}%)\n")
 
             print("Notable changes in relative tracker prevalence:")
             print("NUM_SITES_OLD  NUM_SITES  REL_PREVALENCE  REL_PREV_CHANGE  TRACKER")
 
-        rel_prevalence = row[1] / top_prevalence
+        tracker_id = series.tracker_ids[base]
+        rel_prevalence = periods['rel_curr'][tracker_id]
 
         if rel_prevalence < 0.01:
             continue
 
-        delta = 1.0
-        prevalence_prev = prev.get(row[0], None)
-        if prevalence_prev:
-            rel_prevalence_prev = prevalence_prev / top_prevalence_prev
-            delta = rel_prevalence - rel_prevalence_prev
+        delta = periods['rel_delta'][tracker_id]
 
         if abs(delta) < 0.04:
             continue
 
         print("  "
             # num sites (previous)
-            f"{prevalence_prev if prevalence_prev else 0:>4}  "
+            f"{periods['prev'][tracker_id]:>4}  "
             # num sites
-            f"{row[1]:>4}  "
+            f"{num_sites:>4}  "
             # relative prevalence
             f"{round(rel_prevalence, 2):.2f}  "
             # change from previous
             f"{round(delta, 2) * 100:>3.0f}%  "
             # tracking domain
-            f"{row[0]}")
+            f"{base}")
 
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--days', type=int, default=30,
+                    help="compare the last DAYS days ...")
+    ap.add_argument('--offset-days', type=int, default=None,
+                    help="... to the same number of days OFFSET_DAYS days earlier "
+                    "(default: DAYS)")
+    args = ap.parse_args()
+
     with sqlite3.connect("badger.sqlite3", detect_types=sqlite3.PARSE_DECLTYPES) as db:
-        cur = db.cursor()
-        print_trends(cur)
+        print_trends(TrackerSeries(db.cursor()), args.days, args.offset_days)
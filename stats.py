@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""Prints summary stats for every scan in the history of log.txt.
+
+Walks history once, reading log.txt and results.json blobs through
+a single git process. Stats get cached by blob ID, so that reruns
+only process scans committed since.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import re
+import subprocess
+import sys
+
+from datetime import datetime
+
+from lib.basedomain import extract
+from lib.utils import cat_file, run
+
+
+# bump when changing what gets computed
+STATS_VERSION = 1
+
+# with the other caches, rather than in a shared temp dir
+# where anyone could leave fake stats for us to load
+_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "lib", "lists", ".cache", "stats")
+
+re_patterns = {
+    "browser": re.compile("browser: ([A-Za-z]+)"),
+    "number": re.compile("[0-9,]+"),
+    "restart": re.compile("[Rr]estarting browser( )?\\.\\.\\."),
+}
+
+
+def parse_log(lines):
+    """Returns stats for a scan from its log.txt lines, in a single pass."""
+    stats = {
+        "browser": "",
+        "num_domains": "",
+        "errors": "",
+        "num_timeouts": 0,
+        "num_antibot": 0,
+        "num_restarts": 0,
+        "start_time": None,
+        "end_time": None,
+    }
+
+    for line in lines:
+        if stats['start_time'] is None:
+            stats['start_time'] = line[:19]
+
+        if "Timed out loading " in line:
+            stats['num_timeouts'] += 1
+        if "security page" in line:
+            stats['num_antibot'] += 1
+        if "estarting browser" in line and re_patterns['restart'].search(line):
+            stats['num_restarts'] += 1
+
+        if "browser: " in line and not stats['browser']:
+            if match := re_patterns['browser'].search(line):
+                stats['browser'] = match.group(1).lower()
+        elif "domains to crawl" in line:
+            if match := re_patterns['number'].search(line):
+                stats['num_domains'] = match.group(0)
+        elif "Finished scan" in line:
+            stats['end_time'] = line[:19]
+
+        if "errored on" in line:
+            stats['errors'] = line.split()[-1].replace("(", "").replace(")", "")
+
+    return stats
+
+
+def count_blocked(results):
+    """Returns the number of base domains blocked in results.json,
+    or None if the results look invalid (see validate.py)."""
+    if not isinstance(results, dict) or not results.get('snitch_map') or \
+            not results.get('action_map'):
+        return None
+
+    snitch_map = results['snitch_map']
+    blocked = set()
+    for domain in results['action_map']:
+        base = extract(domain).registered_domain or domain
+        if len(snitch_map.get(base, ())) >= 3:
+            blocked.add(base)
+
+    return len(blocked)
+
+
+def get_revisions(repo_dir):
+    """Returns (commit hash, git info, log.txt blob ID, results.json blob ID)
+    tuples for revisions of log.txt, newest first."""
+    revisions = [line.split("\0") for line in run(
+        ["git", "log", "--format=%H%x00%h  %ci", "HEAD", "--", "log.txt"],
+        cwd=repo_dir).split("\n") if line]
+
+    # look up all blob IDs with a single git process
+    objects = "".join(f"{rev}:log.txt\n{rev}:results.json\n" for rev, _ in revisions)
+    blob_ids = [line.split()[0] if not line.endswith(" missing") else None
+                for line in subprocess.run(
+                    ["git", "cat-file", "--batch-check"], cwd=repo_dir, input=objects,
+                    capture_output=True, check=True, text=True).stdout.splitlines()]
+
+    return [(rev, git_info, blob_ids[i * 2], blob_ids[i * 2 + 1])
+            for i, (rev, git_info) in enumerate(revisions)]
+
+
+def get_stats(blobs, log_blob, results_blob):
+    """Returns stats for a scan, from the on-disk cache if possible."""
+    cache_file = os.path.join(_cache_dir, f"{STATS_VERSION}-{log_blob}-{results_blob}.json")
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    stats = parse_log(blobs.lines(blobs.request(log_blob)))
+
+    stats['num_blocked'] = None
+    if results_blob:
+        try:
+            stats['num_blocked'] = count_blocked(json.loads(
+                blobs.read(blobs.request(results_blob))))
+        except json.JSONDecodeError:
+            pass
+
+    os.makedirs(_cache_dir, exist_ok=True)
+    with open(cache_file + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(stats, f)
+    os.replace(cache_file + ".tmp", cache_file)
+
+    return stats
+
+
+def percent_of(num, total):
+    try:
+        return f"{num * 100 / int(total.replace(',', '')):.1f}%"
+    except (ValueError, ZeroDivisionError):
+        return "?%"
+
+
+def format_duration(start_time, end_time):
+    try:
+        duration = datetime.fromisoformat(end_time) - datetime.fromisoformat(start_time)
+    except (TypeError, ValueError):
+        return ""
+    return f"{int(duration.total_seconds() / 3600)} hours"
+
+
+def format_row(stats, git_info):
+    num_domains = stats['num_domains']
+    num_blocked = stats['num_blocked']
+    rates = (f" ({percent_of(stats['num_timeouts'], num_domains)}, "
+             f"{percent_of(stats['num_antibot'], num_domains)})")
+    return (f"{stats['browser']:<11}"
+            f"{num_domains:<8}"
+            f"{'' if num_blocked is None else num_blocked:<10}"
+            f"{stats['errors']:>6}{rates:<18}"
+            f"{stats['num_restarts']:<9}"
+            f"{format_duration(stats['start_time'], stats['end_time']):<12}"
+            f"{git_info:<14}")
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--repo', default=pathlib.Path(__file__).parent.resolve(),
+                    help="path to the badger-sett repository")
+    args = ap.parse_args()
+
+    print(f"{'BROWSER':<11}{'SITES':<8}{'TRACKERS':<10}{'ERRORS (TMOs, ANTIBOT)':<24}"
+          f"{'CRASHES':<9}{'DURATION':<12}{'GIT INFO':<14}")
+
+    with cat_file(cwd=args.repo) as blobs:
+        for _, git_info, log_blob, results_blob in get_revisions(args.repo):
+            if not log_blob:
+                continue
+            print(format_row(get_stats(blobs, log_blob, results_blob), git_info))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
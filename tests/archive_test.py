@@ -0,0 +1,96 @@
+import random
+import sqlite3
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import initdb
+
+from lib.archive import Archive, export
+
+
+class TestArchive:
+
+    @pytest.fixture
+    def cur(self):
+        sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+        with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as db:
+            cur = db.cursor()
+            initdb.create_tables(cur)
+            yield cur
+
+    def add_scans(self, cur, num_scans, start=datetime(2026, 1, 1)):
+        rng = random.Random(num_scans)
+        for i in range(num_scans):
+            start_time = start + timedelta(days=i)
+            scan_id = initdb.get_scan_id(
+                cur, start_time, start_time + timedelta(hours=5), "sfo1", 100,
+                rng.choice(["chrome", "firefox"]), rng.random() < 0.5, True)
+            for _ in range(200):
+                tracking_type = rng.choice([None, "canvas", "pixelcookieshare"])
+                if tracking_type and tracking_type not in initdb.tracking_types:
+                    initdb.tracking_types[tracking_type] = initdb.get_id(
+                        cur, "tracking_type", "name", tracking_type)
+                cur.execute("INSERT INTO tracking (scan_id, tracker_id, site_id, tracking_type_id) "
+                            "VALUES (?,?,?,?)", (
+                                scan_id,
+                                initdb.get_id(cur, "tracker", "base", f"tracker{rng.randrange(30)}.com"),
+                                initdb.get_id(cur, "site", "fqdn", f"site{rng.randrange(80)}.com"),
+                                initdb.tracking_types[tracking_type] if tracking_type else None))
+
+    def test_matches_sql(self, cur, tmp_path):
+        self.add_scans(cur, 10)
+        assert export(cur, tmp_path) == 10
+        # add more scans to test incremental exports
+        self.add_scans(cur, 5, start=datetime(2026, 2, 1))
+        assert export(cur, tmp_path) == 5
+
+        archive = Archive(tmp_path)
+        since = datetime(2026, 1, 5)
+
+        cur.execute("""
+            SELECT t.base, COUNT(DISTINCT tr.site_id) AS num_sites
+            FROM tracking tr
+            JOIN scan ON scan.id = tr.scan_id
+            JOIN tracker t ON t.id = tr.tracker_id
+            WHERE scan.no_blocking = 1 AND scan.start_time > ?
+            GROUP BY t.base""", (since,))
+        expected = dict(cur.fetchall())
+        assert dict(archive.prevalence(since=since, no_blocking=True)) == expected
+
+        cur.execute("""
+            SELECT t.base, MIN(scan.start_time), MAX(scan.start_time)
+            FROM tracking tr
+            JOIN scan ON scan.id = tr.scan_id
+            JOIN tracker t ON t.id = tr.tracker_id
+            WHERE scan.browser_id = 1
+            GROUP BY t.base""")
+        expected = {base: (datetime.fromisoformat(first), datetime.fromisoformat(last))
+                    for base, first, last in cur.fetchall()}
+        assert archive.first_last_seen(browsers=["firefox"]) == expected
+
+        cur.execute("""
+            SELECT t.base, COUNT(DISTINCT tr.site_id)
+            FROM tracking tr
+            JOIN tracker t ON t.id = tr.tracker_id
+            JOIN (SELECT DISTINCT tr2.scan_id, tr2.site_id
+                FROM tracking tr2
+                JOIN tracker t2 ON t2.id = tr2.tracker_id
+                WHERE t2.base = 'tracker1.com') AS v
+              ON v.scan_id = tr.scan_id AND v.site_id = tr.site_id
+            WHERE t.base != 'tracker1.com'
+            GROUP BY t.base""")
+        expected = dict(cur.fetchall())
+        assert dict(archive.co_occurrence("tracker1.com")) == expected
+
+    def test_rebuilt_db(self, cur, tmp_path):
+        self.add_scans(cur, 3)
+        export(cur, tmp_path)
+
+        initdb.tracking_types.clear()
+        initdb.create_tables(cur)
+        self.add_scans(cur, 2, start=datetime(2026, 3, 1))
+
+        assert export(cur, tmp_path) == 2
+        assert len(Archive(tmp_path).scans) == 2
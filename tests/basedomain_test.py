@@ -0,0 +1,87 @@
+import os
+import pkgutil
+import random
+
+import pytest
+import tldextract
+
+from tldextract.suffix_list import extract_tlds_from_suffix_list
+
+from lib import basedomain
+
+
+SNAPSHOT = pkgutil.get_data("tldextract", ".tld_set_snapshot").decode("utf-8")
+
+
+def hostnames():
+    yield from (
+        "", ".", "..", "com", "example.com", "www.example.com", "WWW.Example.COM",
+        "example.com.", "a..example.com", "forums.bbc.co.uk", "bbc.co.uk", "co.uk",
+        "www.ck", "a.www.ck", "foo.ck", "a.foo.ck", "ck",
+        "city.kawasaki.jp", "a.city.kawasaki.jp", "foo.kawasaki.jp", "a.foo.kawasaki.jp",
+        "example.blogspot.com", "blogspot.com", "s3.amazonaws.com",
+        "xn--bcher-kva.example", "www.xn--bcher-kva.ch", "xn--p1ai", "a.xn--p1ai",
+        "xn--invalid-.com", "bücher.ch", "example.рф",
+        "127.0.0.1", "256.1.1.1", "1.2.3", "localhost", "internal.local",
+        "https://user@www.example.co.uk:8080/path?q#f", "//example.org/x",
+    )
+
+    rng = random.Random(1)
+    public_suffixes, private_suffixes = extract_tlds_from_suffix_list(SNAPSHOT)
+    for suffix in rng.sample(public_suffixes + private_suffixes, 2000):
+        suffix = suffix.lstrip("!*.")
+        yield suffix
+        yield f"example.{suffix}"
+        yield f"www.Example.{suffix}"
+        yield f"a.b.{suffix}."
+
+
+class TestBasedomain:
+
+    @pytest.fixture(autouse=True)
+    def snapshot_psl(self, monkeypatch):
+        monkeypatch.setattr(basedomain, "_psl", basedomain.compile_psl(SNAPSHOT))
+        basedomain.extract.cache_clear()
+        yield
+        basedomain.extract.cache_clear()
+
+    def test_matches_tldextract(self):
+        reference = tldextract.TLDExtract(
+            cache_dir=False, suffix_list_urls=None, include_psl_private_domains=True)
+        for hostname in hostnames():
+            assert basedomain.extract(hostname) == reference(hostname), hostname
+
+    def test_registered_domains(self):
+        domains = list(hostnames())
+        assert basedomain.registered_domains(iter(domains)) == [
+            basedomain.extract(domain).registered_domain for domain in domains]
+
+
+class TestPslCache:
+
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(basedomain, "_cache_dir", str(tmp_path))
+        monkeypatch.setattr(basedomain, "_psl", None)
+        return tmp_path
+
+    def test_refresh(self, cache_dir, monkeypatch):
+        monkeypatch.setattr(basedomain, "_fetch_psl", lambda: "com\n*.ck\n!www.ck\n")
+        version = basedomain.psl_version()
+        assert os.listdir(cache_dir) == [f"psl-trie-v{basedomain.TRIE_VERSION}.pickle"]
+
+        # cached, and fresh
+        monkeypatch.setattr(basedomain, "_psl", None)
+        monkeypatch.setattr(basedomain, "_fetch_psl", lambda: pytest.fail("fetched"))
+        assert basedomain.psl_version() == version
+
+        # outdated, and the refresh fails
+        os.utime(cache_dir / os.listdir(cache_dir)[0], (0, 0))
+        monkeypatch.setattr(basedomain, "_psl", None)
+        monkeypatch.setattr(basedomain, "_fetch_psl", lambda: None)
+        assert basedomain.psl_version() == version
+
+    def test_snapshot_fallback(self, cache_dir, monkeypatch):
+        monkeypatch.setattr(basedomain, "_fetch_psl", lambda: None)
+        assert basedomain.psl_version() == basedomain.compile_psl(SNAPSHOT)[0]
+        assert not os.listdir(cache_dir)
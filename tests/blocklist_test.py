@@ -0,0 +1,299 @@
+import os
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from lib.lists import adblocker
+from lib.lists.adblocker import Adblocker
+from lib.lists.blocklist import Blocklist
+from lib.lists.index import ListIndex, listed, unblocked
+
+
+LAST_MODIFIED = "Mon, 05 Jan 2026 10:00:00 GMT"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves `server.lists` (path -> body) with ETag/Last-Modified
+    validators, answering matching conditional requests with 304s."""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        time.sleep(self.server.delay)
+
+        body = self.server.lists.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hash(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args): # pylint:disable=arguments-differ
+        pass
+
+
+class TestBlocklist:
+
+    @pytest.fixture
+    def server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.lists = {}
+        server.requests = []
+        server.delay = 0
+        server.url = f"http://127.0.0.1:{server.server_address[1]}"
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def blocklist(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Blocklist, "cache_dir", str(tmp_path))
+        return Blocklist()
+
+    def test_conditional_fetch(self, server, blocklist, tmp_path):
+        server.lists["/list.txt"] = "||example.com^\n"
+        filename = str(tmp_path / "list.txt")
+
+        blocklist.fetch(server.url + "/list.txt", filename)
+        with open(filename, encoding="utf-8") as f:
+            assert f.read() == "||example.com^\n"
+        assert "If-None-Match" not in server.requests[-1][1]
+
+        # unexpired: no request at all
+        blocklist.fetch(server.url + "/list.txt", filename)
+        assert len(server.requests) == 1
+
+        # expired but unchanged: 304, and the expiration clock restarts
+        os.utime(filename, (0, 0))
+        blocklist.fetch(server.url + "/list.txt", filename, expire_cache_hrs=1)
+        assert len(server.requests) == 2
+        assert server.requests[-1][1]["If-Modified-Since"] == LAST_MODIFIED
+        assert blocklist.exists_and_unexpired(filename, 1)
+        with open(filename, encoding="utf-8") as f:
+            assert f.read() == "||example.com^\n"
+
+        # expired and changed
+        server.lists["/list.txt"] = "||example.net^\n"
+        blocklist.fetch(server.url + "/list.txt", filename, expire_cache_hrs=0)
+        with open(filename, encoding="utf-8") as f:
+            assert f.read() == "||example.net^\n"
+        assert not os.path.exists(filename + ".tmp")
+
+    def test_failed_fetch(self, server, blocklist, tmp_path):
+        server.lists["/list.txt"] = "||example.com^\n"
+        filename = str(tmp_path / "list.txt")
+        blocklist.fetch(server.url + "/list.txt", filename)
+
+        del server.lists["/list.txt"]
+        blocklist.fetch(server.url + "/list.txt", filename, expire_cache_hrs=0)
+
+        # the outdated copy gets moved out of the way
+        assert not os.path.exists(filename)
+        with open(filename + ".bak", encoding="utf-8") as f:
+            assert f.read() == "||example.com^\n"
+
+    def test_fetch_all(self, server, blocklist, tmp_path):
+        server.delay = 0.5
+        lists = []
+        for i in range(blocklist.max_concurrent_fetches):
+            server.lists[f"/list{i}.txt"] = f"||example{i}.com^\n"
+            lists.append((f"{server.url}/list{i}.txt", str(tmp_path / f"list{i}.txt")))
+
+        start = time.monotonic()
+        blocklist.fetch_all(lists)
+        assert time.monotonic() - start < server.delay * len(lists) / 2
+
+        for i, (_, filename) in enumerate(lists):
+            with open(filename, encoding="utf-8") as f:
+                assert f.read() == f"||example{i}.com^\n"
+
+
+class TestProcessedCache:
+
+    @pytest.fixture
+    def adblocker_lists(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Blocklist, "cache_dir", str(tmp_path))
+        monkeypatch.setattr(Adblocker, "bases", set())
+        monkeypatch.setattr(Adblocker, "domains", set())
+        # lists are already downloaded and unexpired
+        lists = {"one.txt": "||ads.example.com^\n||tracker.example.net^$third-party\n",
+                 "two.txt": "! comment\n||metrics.example.org^\n||cdn.example.co.uk^\n"}
+        for filename, text in lists.items():
+            (tmp_path / filename).write_text(text, encoding="utf-8")
+        monkeypatch.setattr(Adblocker, "list_urls", tuple(
+            (f"http://127.0.0.1:9/{filename}", filename) for filename in lists))
+        return tmp_path
+
+    def test_roundtrip(self, adblocker_lists, monkeypatch):
+        parsed = Adblocker()
+        assert parsed.ready
+        bases, domains = set(parsed.bases), set(parsed.domains)
+        assert bases == {"example.com", "example.net", "example.co.uk"}
+
+        def ingest_lists(_, filenames):
+            raise AssertionError(f"reprocessed {filenames}")
+
+        with monkeypatch.context() as m:
+            m.setattr(Adblocker, "ingest_lists", ingest_lists)
+            cached = Adblocker()
+        assert cached.ready
+        assert (cached.bases, cached.domains) == (bases, domains)
+
+        # changing a list invalidates the cache
+        with open(adblocker_lists / "two.txt", "a", encoding="utf-8") as f:
+            f.write("||example.org^\n")
+        assert Adblocker().bases == bases | {"example.org"}
+
+    @pytest.mark.usefixtures("adblocker_lists")
+    def test_no_fork_with_threads(self, monkeypatch):
+        def fork(*args, **kwargs):
+            raise AssertionError("forked while other threads were running")
+
+        monkeypatch.setattr(adblocker, "ProcessPoolExecutor", fork)
+        monkeypatch.setattr(adblocker.os, "cpu_count", lambda: 4)
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        try:
+            assert Adblocker().bases == {"example.com", "example.net", "example.co.uk"}
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_corrupt_cache(self, adblocker_lists):
+        bases = set(Adblocker().bases)
+        (adblocker_lists / "Adblocker.processed.pickle").write_bytes(b"garbage")
+        assert Adblocker().bases == bases
+
+
+class TestAdblockerParser:
+
+    RULES = (
+        "! Title: test list",
+        "||ads.example.com^",
+        "||ads.example.com^$third-party",
+        "||tracker.example.net^$script,third-party",
+        "||example.org",
+        "||pixel.example.co.uk^$image",
+        "||metrics.example.info^",
+        "||bad_domain.example.biz^",
+        "||localhost^",
+        "||cdn.example.io/path/script.js",
+        "@@||allowed.example.com^",
+        "example.com##.ad",
+        "  ||indented.example.com^",
+        "||popup.example.dev^$popup,third-party",
+    )
+
+    def test_matches_sequential_parser(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Adblocker, "bases", set())
+        monkeypatch.setattr(Adblocker, "domains", set())
+        # several chunks per list
+        monkeypatch.setattr(Adblocker, "chunk_size", 3)
+
+        filenames = []
+        for i in range(3):
+            filename = str(tmp_path / f"list{i}.txt")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("\n".join(self.RULES[i:] + (f"||site{i}.example.edu^",)) + "\n")
+            filenames.append(filename)
+        empty = str(tmp_path / "empty.txt")
+        with open(empty, "w", encoding="utf-8") as f:
+            f.write("! nothing here\n")
+        filenames.append(empty)
+
+        adblocker = Adblocker.__new__(Adblocker)
+        assert adblocker.ingest_lists(filenames)
+        parsed = (set(Adblocker.bases), set(Adblocker.domains))
+
+        Adblocker.bases.clear()
+        Adblocker.domains.clear()
+        counts = []
+        for filename in filenames:
+            with open(filename, encoding="utf-8") as f:
+                counts.append(sum(adblocker.process_line(line.rstrip()) for line in f))
+
+        assert parsed == (Adblocker.bases, Adblocker.domains)
+        assert [stats["domains"] for stats in adblocker.list_stats] == counts
+        assert counts[0] > 3 and counts[-1] == 0
+
+    def test_missing_list(self, tmp_path):
+        adblocker = Adblocker.__new__(Adblocker)
+        assert not adblocker.ingest_lists([str(tmp_path / "missing.txt")])
+
+
+class StubList(Blocklist):
+
+    def __init__(self):
+        self.bases = {"example.com", "example.net", "example.org"}
+        self.bases_unblocked = {"example.net"}
+        self.processed_key = "stub"
+        self.ready = True
+
+
+class ChangedStubList(StubList):
+
+    def __init__(self):
+        super().__init__()
+        self.bases_unblocked = set()
+        self.processed_key = "changed"
+
+
+class StubAdblocker(Blocklist):
+
+    def __init__(self):
+        self.bases = {"example.com", "example.info"}
+        self.processed_key = "adblocker"
+        self.ready = True
+
+
+class TestListIndex:
+
+    @pytest.fixture
+    def index_cls(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Blocklist, "cache_dir", str(tmp_path))
+        monkeypatch.setattr(ListIndex, "lists", (StubAdblocker, StubList))
+        return ListIndex
+
+    def test_masks(self, index_cls):
+        index = index_cls()
+        adblocker, other = index.blocklists
+
+        blocked = adblocker.bases | (other.bases - other.bases_unblocked)
+        for base in adblocker.bases | other.bases | {"example.edu"}:
+            mask = index.get(base)
+            assert bool(mask & listed(0)) == (base in adblocker.bases)
+            assert not mask & unblocked(0)
+            assert bool(mask & listed(1)) == (base in other.bases)
+            assert bool(mask & unblocked(1)) == (base in other.bases_unblocked)
+            assert bool(mask & ListIndex.BLOCKED) == (base in blocked)
+
+    def test_cache(self, index_cls, monkeypatch):
+        masks = index_cls().masks
+
+        def build(_, blocklists):
+            raise AssertionError(f"rebuilt from {blocklists}")
+
+        with monkeypatch.context() as m:
+            m.setattr(ListIndex, "build", classmethod(build))
+            assert index_cls().masks == masks
+
+        # a list changed
+        monkeypatch.setattr(ListIndex, "lists", (StubAdblocker, ChangedStubList))
+        assert index_cls().masks != masks
@@ -0,0 +1,158 @@
+import json
+import multiprocessing
+import sqlite3
+import time
+
+from datetime import datetime
+
+import crawler
+import initdb
+
+from lib.coordinator import BatchQueue, Coordinator, WorkerClient, parse_address
+
+
+AUTHKEY = b"test"
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_worker(address, stall=False):
+    """Visits sites without a browser, like Crawler.crawl_batches();
+    a stalling worker hangs on the second site of its first batch."""
+    client = WorkerClient(address, AUTHKEY)
+    snitch_map = {}
+    num_visits = 0
+    while batch := client.take():
+        batch_id, domains = batch
+        log_lines = []
+        for domain in domains:
+            if stall and num_visits == 1:
+                time.sleep(60)
+            num_visits += 1
+            log_lines.append(f"2026-08-21 12:00:{num_visits:02d},000 Visiting {num_visits}: {domain}\n")
+            log_lines.append(f"2026-08-21 12:00:{num_visits:02d},500 Visited {domain} on https://{domain}/\n")
+            snitch_map.setdefault("tracker.net", []).append(domain)
+            client.progress(batch_id)
+        client.complete(batch_id, {"action_map": {}, "snitch_map": snitch_map}, "".join(log_lines))
+    client.finish("")
+
+
+class TestBatchQueue:
+
+    def test_batches(self):
+        queue = BatchQueue([f"site{i}.com" for i in range(5)], batch_size=2)
+        assert queue.batches == [["site0.com", "site1.com"], ["site2.com", "site3.com"], ["site4.com"]]
+
+        assert queue.take(0) == (0, ["site0.com", "site1.com"])
+        assert queue.take(1) == (1, ["site2.com", "site3.com"])
+        assert queue.take(0) == (2, ["site4.com"])
+        assert queue.take(2) is None
+
+        for worker, batch_id in ((1, 1), (0, 0), (0, 2)):
+            assert not queue.done
+            assert queue.complete(worker, batch_id)
+        assert queue.done
+        assert not queue.complete(0, 0)
+
+    def test_stalled_worker(self):
+        clock = FakeClock()
+        queue = BatchQueue(["a.com", "b.com", "c.com", "d.com"], batch_size=3,
+                           stall_timeout=10, clock=clock)
+        assert queue.take(0) == (0, ["a.com", "b.com", "c.com"])
+        assert queue.take(1) == (1, ["d.com"])
+        assert queue.complete(1, 1)
+
+        # progress keeps the lease going
+        clock.now = 9
+        queue.progress(0, 0)
+        clock.now = 15
+        assert queue.take(1) is None
+
+        # worker 0 is stuck on b.com; a.com's results
+        # would only come with the completed batch
+        clock.now = 20
+        assert queue.take(1) == (0, ["a.com", "b.com", "c.com"])
+        assert queue.num_reassigned == 1
+
+        # progress from the stuck worker doesn't count anymore,
+        # and it doesn't get to complete the batch
+        queue.progress(0, 0)
+        assert queue.leases[0][1] == 0
+        assert not queue.complete(0, 0)
+        assert queue.complete(1, 0)
+        assert queue.done
+
+    def test_late_completion(self):
+        clock = FakeClock()
+        queue = BatchQueue(["a.com"], stall_timeout=10, clock=clock)
+        queue.take(0)
+        clock.now = 10
+        assert queue.take(1) == (0, ["a.com"])
+        # the original worker finishing first is fine too
+        clock.now = 30
+        queue.take(2)
+        assert queue.complete(2, 0)
+        assert not queue.complete(1, 0)
+        assert queue.done
+
+    def test_parse_address(self):
+        assert parse_address("7000") == ("127.0.0.1", 7000)
+        assert parse_address("0.0.0.0:7000") == ("0.0.0.0", 7000)
+
+
+class TestCoordinator:
+
+    def test_scan(self, tmp_path, monkeypatch):
+        scan_dir = tmp_path / "output" / "firefox-1755777600"
+        scan_dir.mkdir(parents=True)
+        sites = [f"site{i}.com" for i in range(23)]
+
+        coordinator = Coordinator(BatchQueue(sites, batch_size=3, stall_timeout=1),
+                                  str(scan_dir), authkey=AUTHKEY)
+        coordinator.start()
+
+        workers = [multiprocessing.Process(target=fake_worker, args=(coordinator.address, i == 0))
+                   for i in range(3)]
+        for worker in workers:
+            worker.start()
+
+        assert coordinator.wait(30)
+        workers[0].terminate()
+        for worker in workers:
+            worker.join(10)
+        coordinator.close()
+        assert coordinator.queue.num_reassigned == 1
+
+        results = {}
+        for path in scan_dir.glob("results.???.json"):
+            with path.open(encoding="utf-8") as f:
+                results[path.name] = json.load(f)
+        assert len(results) == 2
+        assert sorted(site for result in results.values()
+                      for site in result["snitch_map"]["tracker.net"]) == sorted(sites)
+
+        # what initdb.py looks for in distributed scans
+        monkeypatch.setattr(crawler, "get_git_info", lambda path: {"branch": "master"})
+        cr = crawler.Crawler(crawler.create_argument_parser().parse_args(
+            ["firefox", str(len(sites)), "--exclude-failures-since=off"]))
+        crawler.write_run_settings(cr, scan_dir)
+        (scan_dir / "results-noblocking.json").write_text("{}")
+
+        monkeypatch.setattr(initdb, "is_mdfp_first_party", lambda site, tracker: False)
+        sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+        with sqlite3.connect(":memory:") as db:
+            cur = db.cursor()
+            initdb.create_tables(cur)
+            initdb.ingest_distributed_scans(tmp_path, cur)
+
+            assert cur.execute("SELECT num_sites, region, no_blocking, daily_scan "
+                               "FROM scan").fetchall() == [(len(sites), "local", 1, 0)]
+            assert cur.execute("SELECT COUNT(*) FROM scan_sites").fetchone()[0] == len(sites)
+            assert cur.execute("SELECT COUNT(*) FROM tracking").fetchone()[0] == len(sites)
@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import initdb
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+class TestIngestLog:
+
+    @pytest.fixture
+    def cur(self):
+        sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+        with sqlite3.connect(":memory:") as db:
+            cur = db.cursor()
+            initdb.create_tables(cur)
+            yield cur
+
+    def dump_tables(self, cur):
+        return {table: [list(row) for row in cur.execute(f"SELECT * FROM {table}")]
+                for table in ("site", "error", "scan_sites", "scan_crashes")}
+
+    @pytest.mark.parametrize("as_string", [False, True])
+    def test_golden(self, cur, as_string):
+        with open(FIXTURES_DIR / "ingest_log.txt", encoding="utf-8") as f:
+            end_time = initdb.ingest_log(cur, 1, f.read() if as_string else f)
+
+        with open(FIXTURES_DIR / "ingest_log.golden.json", encoding="utf-8") as f:
+            expected = json.load(f)
+
+        assert self.dump_tables(cur) == expected
+        assert end_time == datetime(2026, 8, 21, 12, 7, 12)
+
+    @pytest.mark.parametrize("line, expected", [
+        ("2026-08-21 12:06:20,000 InsecureCertificateException on x.com: Reached error page",
+         "InsecureCertificateException"),
+        ("2026-08-21 12:06:40,000 Timed out loading extension page", "Extension timeout"),
+        ("2026-08-21 12:06:40,000 Timed out loading x.com", "Timeout"),
+        # the first legacy error found anywhere in the line wins
+        ("2026-08-21 12:06:40,000 Closed all windows somehow; Invalid session", "Closed all windows somehow"),
+        ("2026-08-21 12:06:40,000 Invalid session; Closed all windows somehow", "Closed all windows somehow"),
+        ("2026-08-21 12:06:40,000 Failed to open new window (NoSuchWindowException)",
+         "Failed to open new window (NoSuchWindowException)"),
+        ("2026-08-21 12:06:40,000 Successfully restarted", None)])
+    def test_get_error_string(self, line, expected):
+        assert initdb.get_error_string(line) == expected
+
+    def test_parse_ts(self):
+        line = "2026-08-21 12:06:40,000 Successfully restarted"
+        assert initdb.parse_ts(line) == datetime.strptime(line[:19], "%Y-%m-%d %H:%M:%S")
+
+
+class TestSearchIndexes:
+
+    @pytest.fixture
+    def cur(self):
+        with sqlite3.connect(":memory:") as db:
+            cur = db.cursor()
+            initdb.create_tables(cur)
+            yield cur
+
+    def search(self, cur, table, term):
+        cur.execute(f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ? ORDER BY rowid",
+                    (f'"{term}"',))
+        return [row[0] for row in cur.fetchall()]
+
+    def test_indexes_existing_and_new_rows(self, cur):
+        site_ids = [initdb.get_id(cur, "site", "fqdn", fqdn)
+                    for fqdn in ("example.com", "news.example.org")]
+        initdb.create_indexes(cur)
+        site_ids.append(initdb.get_id(cur, "site", "fqdn", "Example.net"))
+        tracker_id = initdb.get_id(cur, "tracker", "base", "doubleclick.net")
+
+        assert self.search(cur, "site", "example") == site_ids
+        assert self.search(cur, "site", "ws.exa") == [site_ids[1]]
+        assert self.search(cur, "site", "doubleclick") == []
+        assert self.search(cur, "tracker", "eclick.n") == [tracker_id]
+
+    def test_create_indexes_is_idempotent(self, cur):
+        initdb.create_indexes(cur)
+        initdb.create_indexes(cur)
+        initdb.get_id(cur, "tracker", "base", "doubleclick.net")
+        assert self.search(cur, "tracker", "double") == [1]
+
+    def test_rebuild_drops_indexes(self, cur):
+        initdb.create_indexes(cur)
+        initdb.get_id(cur, "tracker", "base", "doubleclick.net")
+        initdb.create_tables(cur)
+        initdb.create_indexes(cur)
+        assert self.search(cur, "tracker", "double") == []
@@ -0,0 +1,77 @@
+import pytest
+
+from selenium.common.exceptions import JavascriptException
+
+import crawler
+
+
+class FakeDriver:
+
+    def __init__(self, ready_states):
+        self.current_url = "https://example.com/"
+        self.ready_states = iter(ready_states)
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        if script == crawler.NAVIGATE_TO_LINK_JS:
+            self.current_url = args[0]
+            return None
+        if "readyState" in script:
+            ready_state = next(self.ready_states)
+            if isinstance(ready_state, Exception):
+                raise ready_state
+            return ready_state
+        return None
+
+
+class TestLinkNavigation:
+
+    LINK = ("https://example.com/news/2026/a-long-article-title", object())
+
+    @pytest.fixture
+    def cr(self, monkeypatch):
+        cr = crawler.Crawler(crawler.create_argument_parser().parse_args(
+            ["firefox", "10", "--exclude-failures-since=off", "--link-navigation=direct"]))
+        monkeypatch.setattr(cr, "pick_internal_link", lambda: self.LINK)
+        cr.scrolled = False
+        monkeypatch.setattr(cr, "scroll_page", lambda: setattr(cr, "scrolled", True))
+        return cr
+
+    def test_navigate(self, cr):
+        cr.driver = FakeDriver([
+            ["https://example.com/", "complete"],
+            [self.LINK[0], "loading"],
+            [self.LINK[0], "complete"],
+        ])
+        cr.navigate_to_internal_link()
+
+        assert cr.driver.scripts[0] == (crawler.NAVIGATE_TO_LINK_JS, self.LINK)
+        assert len(cr.driver.scripts) == 4
+        assert cr.scrolled
+
+    def test_document_unloaded(self, cr, caplog):
+        cr.driver = FakeDriver([
+            JavascriptException("Document was unloaded"),
+            [self.LINK[0], "complete"],
+        ])
+        cr.navigate_to_internal_link()
+
+        assert len(cr.driver.scripts) == 3
+        assert cr.scrolled
+        assert "Failed to visit link" not in caplog.text
+
+    def test_load_timeout(self, cr, monkeypatch):
+        monkeypatch.setattr(crawler, "LINK_TIMEOUT", 0.2)
+        cr.driver = FakeDriver(iter(lambda: [self.LINK[0], "loading"], None))
+        cr.navigate_to_internal_link()
+
+        assert cr.driver.scripts[-1][0] == "window.stop();"
+        assert cr.scrolled
+
+    def test_worker_command(self):
+        args = crawler.create_argument_parser().parse_args(
+            ["firefox", "10", "--link-navigation=direct", "--no-link-clicking"])
+        cmd = crawler.worker_command(args, "127.0.0.1:7000", "out")
+        assert cmd[cmd.index("--link-navigation") + 1] == "direct"
+        assert "--no-link-clicking" in cmd
@@ -0,0 +1,89 @@
+import time
+
+from lib.linters import mdfp
+from lib.linters.domains import DomainIndex
+from lib.linters.runner import run_linters
+
+
+class TestDomainIndex:
+
+    def test_from_results(self):
+        domains = DomainIndex.from_results({
+            "snitch_map": {"cdn.example.co.uk": ["www.foo.com", "1.2.3.4"]},
+            "fp_scripts": {"fp.tracker.net": ["/fp.js"]},
+        })
+        assert len(domains) == 4
+        assert domains.get("cdn.example.co.uk") == ("example.co.uk", "example")
+        assert domains.get("www.foo.com") == ("foo.com", "foo")
+        assert domains.get("1.2.3.4") == ("1.2.3.4", "1.2.3.4")
+        assert domains.base("fp.tracker.net") == "tracker.net"
+        # not indexed up front
+        assert domains.root("localhost") == "localhost"
+        assert len(domains) == 5
+
+    def test_mdfp_roots(self):
+        domains = DomainIndex()
+        sites = ["example.com", "www.example.de", "example.fr", "other.com"]
+        assert mdfp.get_site_roots(sites, domains.root) == mdfp.get_site_roots(sites)
+        assert mdfp.get_shared_base_root("static.example-cdn.com", domains.root) == "example"
+
+
+class TestRunner:
+
+    def test_output_order(self, capsys):
+        def slow(results, _domains):
+            time.sleep(0.1)
+            return [f"slow {len(results['snitch_map'])}"]
+
+        def fast(_results, domains):
+            return ["fast", domains.base("www.example.com")]
+
+        timings = run_linters({"snitch_map": {"example.com": []}},
+                              (("slow", slow), ("fast", fast)))
+
+        captured = capsys.readouterr()
+        assert captured.out == "slow 1\nfast\nexample.com\n"
+        assert "slow 0.1" in captured.err
+        assert list(timings) == ["domain index", "slow", "fast"]
+        assert timings["slow"] >= 0.1
+
+    def test_mdfp_lint(self):
+        results = {"snitch_map": {
+            "example-static.net": ["example.com", "example.de", "example.fr"],
+            "tracker.com": ["a.com", "b.com", "c.com"],
+        }}
+        lines = mdfp.lint(results, DomainIndex.from_results(results))
+        assert len(lines) == 2
+        assert "MDFP candidates" in lines[0]
+        assert "tracker.com" not in lines[1]
+
+    def test_mdfp_large_trackers(self):
+        sites = [f"site{i}.com" for i in range(100)]
+        results = {"snitch_map": {
+            # a third of the sites share a root
+            "shared.net": sites[:60] + [f"s{i}.example.com" for i in range(30)],
+            # the tracker's root is inside three site roots
+            "cdn-widget.com": sites + ["widgets.com", "mywidget.com", "widget.de"],
+            # the shared root is not common enough
+            "unshared.net": sites + [f"s{i}.example.com" for i in range(10)],
+        }}
+        domains = DomainIndex.from_results(results)
+
+        lines = mdfp.lint(results, domains)
+        assert len(lines) == 3
+        assert lines[1].startswith("  cdn-\x1b")
+        assert "example" in lines[2] and "shared.net" in lines[2]
+
+        lines = mdfp.lint(results, domains, time_budget=0)
+        assert len(lines) == 3
+        assert lines[1].startswith("  cdn-\x1b")
+        assert "skipped 3" in lines[2]
+
+    def test_root_index(self):
+        roots = ["widget", "widgets", "mywidget", "other", "wid"]
+        root_index = mdfp.RootIndex(roots)
+        candidates = root_index.candidates("widget")
+        assert {root for root in candidates if "widget" in root} == \
+            {"widget", "widgets", "mywidget"}
+        assert "other" not in candidates
+        assert not root_index.candidates("zzz")
@@ -0,0 +1,125 @@
+import json
+import subprocess
+
+import pytest
+
+from lib.log_index import LogIndex, get_label, parse_log
+
+
+LOG_WITH_NEW_DOMAINS = """\
+2026-08-21 12:00:59,037 Visiting 1: icims.com
+2026-08-21 12:01:10,886 New domains in snitch_map: nr-data.net
+2026-08-21 12:01:10,886 Visiting 2: foo.com
+2026-08-21 12:01:53,900 New domains in snitch_map: tracker.com, x.com
+2026-08-21 12:02:06,932 New domains in snitch_map: tracker.com
+"""
+
+
+class TestLogIndex:
+
+    @pytest.fixture
+    def repo(self, tmp_path):
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        self.git(repo, "init", "-q")
+        self.git(repo, "config", "user.email", "test@example.com")
+        self.git(repo, "config", "user.name", "test")
+        return repo
+
+    def git(self, repo, *args):
+        subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+    def commit(self, repo, subject, log_txt, action_map=None):
+        # every commit must change log.txt to count as a revision
+        (repo / "log.txt").write_text(log_txt or f"{subject}\n", encoding="utf-8")
+        (repo / "results.json").write_text(json.dumps(
+            {"action_map": {domain: {} for domain in action_map or []}},
+            indent=2), encoding="utf-8")
+        self.git(repo, "add", "-A")
+        self.git(repo, "commit", "-q", "-m", subject)
+
+    def found(self, index, term):
+        return [(label, found) for _, _, label, found in index.search(term)]
+
+    def test_parse_log(self):
+        detections, found = parse_log(LOG_WITH_NEW_DOMAINS.splitlines())
+        assert found
+        assert detections == {
+            "nr-data.net": (2, 1, "icims.com"),
+            "tracker.com": (4, 2, "foo.com"),
+            "x.com": (4, 2, "foo.com"),
+        }
+
+        detections, found = parse_log(["2026-08-21 12:00:59,037 New domains in snitch_map: x.com"])
+        assert detections == {"x.com": (1, None, None)}
+
+        assert parse_log(["Visiting 1: icims.com"]) == ({}, False)
+
+    @pytest.mark.parametrize("subject, expected", [
+        ("Add data v2025.1.1 from Chrome (master chrome ca)", "chrome ca"),
+        ("Update seed data: 2025.1.1 (firefox)", "firefox"),
+        ("Merge branch 'foo'", "branch 'foo'"),
+    ])
+    def test_get_label(self, subject, expected):
+        assert get_label(subject) == expected
+
+    def test_search(self, repo, tmp_path):
+        self.commit(repo, "Add data v1 (master chrome us)", "", ["a.tracker.com", "b.com"])
+        self.commit(repo, "Add data v2 (master firefox ca)", "", ["a.tracker.com"])
+        self.commit(repo, "Add data v3 (master firefox us)", "", ["b.com"])
+        self.commit(repo, "Add data v4 (master chrome us)", "", ["a.tracker.com"])
+        self.commit(repo, "Add data v5 (master edge us)", LOG_WITH_NEW_DOMAINS, ["a.tracker.com"])
+        self.commit(repo, "Add data v6 (master chrome eu)",
+                    "2026-08-21 12:02:06,932 New domains in snitch_map: x.com\n")
+
+        index = LogIndex(tmp_path / "index.sqlite3", repo)
+        assert index.update() == 6
+        assert index.update() == 0
+
+        results_json = "detected-according-to-results-json"
+        assert self.found(index, "tracker.com") == [
+            ("chrome eu", None),
+            ("edge us", (2, "foo.com")),
+            ("chrome us", results_json),
+            ("firefox us", None),
+            ("firefox ca", results_json),
+            ("chrome us", results_json),
+        ]
+        assert [found for _, found in self.found(index, "x.com")] == [
+            "detected-but-unable-to-find-visiting-line", (2, "foo.com"), None, None, None, None]
+        assert [found for _, found in self.found(index, "icims")] == [None] * 6
+
+    def test_incremental_update(self, repo, tmp_path):
+        self.commit(repo, "Add data v1 (master chrome us)", "", ["b.com"])
+        self.commit(repo, "Add data v2 (master chrome us)", "", ["b.com"])
+
+        index = LogIndex(tmp_path / "index.sqlite3", repo)
+        assert index.update() == 2
+
+        self.commit(repo, "Add data v3 (master chrome us)", "", ["b.com"])
+        self.commit(repo, "Add data v4 (master chrome us)", LOG_WITH_NEW_DOMAINS)
+        assert index.update() == 2
+
+        rebuilt = LogIndex(tmp_path / "rebuilt.sqlite3", repo)
+        rebuilt.update()
+        for term in ("b.com", "tracker.com", "nr-data"):
+            assert index.search(term) == rebuilt.search(term)
+
+        # results.json runs got extended rather than duplicated
+        index.cur.execute("SELECT first_revision_id, last_revision_id FROM results_run "
+                          "JOIN domain ON domain.id = domain_id WHERE name = 'b.com'")
+        assert index.cur.fetchall() == [(1, 3)]
+
+    def test_rewritten_history(self, repo, tmp_path):
+        self.commit(repo, "Add data v1 (master chrome us)", "", ["b.com"])
+        self.commit(repo, "Add data v2 (master chrome us)", "", ["b.com"])
+
+        index = LogIndex(tmp_path / "index.sqlite3", repo)
+        index.update()
+
+        self.git(repo, "reset", "-q", "--hard", "HEAD~1")
+        self.commit(repo, "Add data v2 (master firefox us)", "", ["c.com"])
+
+        assert index.update() == 2
+        assert self.found(index, "b.com") == [
+            ("firefox us", None), ("chrome us", "detected-according-to-results-json")]
@@ -0,0 +1,29 @@
+from benchmarks.offline_crawl import parse_log
+
+
+LOG = """\
+2026-08-21 12:00:00,001 Visiting 1: a.com
+2026-08-21 12:00:01,002 Clicking on https://a.com/news
+2026-08-21 12:00:02,003 Visited a.com on https://a.com/news
+2026-08-21 12:00:03,004 Visiting 2: b.com
+2026-08-21 12:00:04,005 WebDriverException on b.com: Reached error page
+2026-08-21 12:00:05,006 Visiting 3: c.com
+2026-08-21 12:00:06,007 MaxRetryError loading c.com: connection refused
+2026-08-21 12:00:07,008 WebDriverException loading extension page: oops
+2026-08-21 12:00:08,009 Visiting 4: d.com
+2026-08-21 12:00:09,010 ReadTimeoutError loading d.com: timed out
+2026-08-21 12:00:10,011 Visiting 5: e.com
+2026-08-21 12:00:11,012 Timed out loading e.com on https://e.com/
+2026-08-21 12:00:12,013 Visiting 6: f.com
+2026-08-21 12:00:13,014 Navigating to https://f.com/about
+2026-08-21 12:00:14,015 Visited f.com
+2026-08-21 12:00:15,016 Finished scan. Visited 2 sites and errored on 4 (66.7%)
+"""
+
+
+class TestParseLog:
+
+    def test_parse_log(self, tmp_path):
+        log_path = tmp_path / "log.txt"
+        log_path.write_text(LOG, encoding="utf-8")
+        assert parse_log(log_path) == (["a.com", "f.com"], 4, 2)
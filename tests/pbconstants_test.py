@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from lib import pbconstants
+
+
+class TestPBConstants:
+
+    @pytest.fixture
+    def pb_dir(self, tmp_path, monkeypatch):
+        pb_dir = tmp_path / "privacybadger"
+        (pb_dir / "src" / "js").mkdir(parents=True)
+        for source_file in ("multiDomainFirstParties.js", "constants.js"):
+            (pb_dir / "src" / "js" / source_file).write_text("export default {};\n")
+        for cmd in (["git", "init", "-q"], ["git", "add", "."],
+                    ["git", "-c", "user.name=test", "-c", "user.email=test@example.com",
+                     "commit", "-q", "-m", "init"]):
+            subprocess.run(cmd, cwd=pb_dir, check=True)
+
+        monkeypatch.setattr(pbconstants, "_pb_dir", str(pb_dir))
+        monkeypatch.setattr(pbconstants, "_cache_dir", str(tmp_path / "cache"))
+        monkeypatch.setattr(pbconstants, "_constants", None)
+        return pb_dir
+
+    def test_cache_key(self, pb_dir):
+        key = pbconstants.get_cache_key()
+        assert key.startswith(pbconstants.get_pb_commit_hash())
+        assert pbconstants.get_cache_key() == key
+
+        # uncommitted edits count
+        (pb_dir / "src/js/constants.js").write_text("export default { FP_CDN_DOMAINS: [] };\n")
+        assert pbconstants.get_cache_key() != key
+
+    def test_cache_key_without_checkout(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pbconstants, "_pb_dir", str(tmp_path / "missing"))
+        assert pbconstants.get_cache_key() is None
+
+    def test_get_fp_cdn_domains(self, pb_dir, tmp_path, monkeypatch):
+        calls = []
+
+        def extract_constants():
+            calls.append(True)
+            return {"mdfp": [["example.com", "example.net"]],
+                    "fp_cdn_domains": ["cdn.example.org"]}
+
+        monkeypatch.setattr(pbconstants, "extract_constants", extract_constants)
+
+        assert pbconstants.get_fp_cdn_domains() == frozenset(["cdn.example.org"])
+        assert pbconstants.get_mdfp()["example.net"] == frozenset(["example.com", "example.net"])
+
+        # now from the on-disk cache
+        monkeypatch.setattr(pbconstants, "_constants", None)
+        assert pbconstants.get_fp_cdn_domains() == frozenset(["cdn.example.org"])
+        assert len(calls) == 1
+        cache_file = os.path.join(tmp_path, "cache", f"{pbconstants.get_cache_key()}.json")
+        with open(cache_file, encoding="utf-8") as f:
+            assert json.load(f)["fp_cdn_domains"] == ["cdn.example.org"]
+
+        # but not after editing Privacy Badger
+        (pb_dir / "src/js/constants.js").write_text("// edited\n")
+        monkeypatch.setattr(pbconstants, "_constants", None)
+        pbconstants.get_fp_cdn_domains()
+        assert len(calls) == 2
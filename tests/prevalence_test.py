@@ -0,0 +1,95 @@
+import random
+import sqlite3
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import initdb
+
+from lib.prevalence import PrevalenceSnapshot, write_snapshot
+
+
+NOW = datetime(2026, 6, 1, 12, 0, 0)
+
+
+class TestPrevalenceSnapshot:
+
+    @pytest.fixture
+    def cur(self):
+        sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+        with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as db:
+            cur = db.cursor()
+            initdb.create_tables(cur)
+            self.add_scans(cur)
+            yield cur
+
+    def add_scans(self, cur):
+        rng = random.Random(1)
+
+        # one scan a day over the last 400 days
+        for i in range(400):
+            start_time = NOW - timedelta(days=400 - i)
+            scan_id = initdb.get_scan_id(
+                cur, start_time, start_time + timedelta(hours=5), "sfo1", 50,
+                rng.choice(["chrome", "firefox", "edge"]), rng.random() < 0.8, True)
+
+            for site_num in rng.sample(range(200), 10):
+                site_id = initdb.get_id(cur, "site", "fqdn", f"site{site_num}.com")
+                cur.execute("INSERT INTO scan_sites VALUES (?,?,?,1,NULL,?,?)",
+                            (scan_id, site_id, site_id, start_time, start_time))
+                for _ in range(rng.randrange(3)):
+                    base = f"tracker{int(rng.paretovariate(1.1))}.com"
+                    cur.execute("INSERT INTO tracking VALUES (?,?,?,NULL)", (
+                        scan_id, site_id, initdb.get_id(cur, "tracker", "base", base)))
+
+    def sql_prevalence(self, cur, days):
+        since = NOW - timedelta(days=days or 10000)
+        cur.execute("""
+            SELECT t.base, COUNT(DISTINCT tr.site_id), MIN(scan.start_time),
+                MAX(scan.start_time), GROUP_CONCAT(DISTINCT b.name)
+            FROM tracking tr
+            JOIN scan ON scan.id = tr.scan_id
+            JOIN browser b ON b.id = scan.browser_id
+            JOIN tracker t ON t.id = tr.tracker_id
+            WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
+                AND scan.start_time >= ? AND scan.start_time < ?
+            GROUP BY t.base""", (since, NOW))
+        return {base: row for base, *row in cur.fetchall()}
+
+    def test_matches_sql(self, cur, tmp_path):
+        path = str(tmp_path / "prevalence.bin")
+        num_trackers = write_snapshot(cur, path, windows=(30, 365, None), now=NOW)
+
+        all_time = self.sql_prevalence(cur, None)
+        assert num_trackers == len(all_time)
+
+        counts = {days: self.sql_prevalence(cur, days) for days in (30, 365)}
+        with PrevalenceSnapshot(path) as snapshot:
+            assert snapshot.windows == [30, 365, None]
+            assert snapshot.generated == NOW
+
+            for base, (num_sites, first_seen, last_seen, browsers) in all_time.items():
+                entry = snapshot.get(base)
+                assert entry.sites == (
+                    counts[30].get(base, [0])[0], counts[365].get(base, [0])[0], num_sites)
+                assert str(entry.first_seen) == first_seen
+                assert str(entry.last_seen) == last_seen
+                assert sorted(entry.browsers) == sorted(browsers.split(","))
+
+            assert snapshot.get("example.com") is None
+
+    def test_empty(self, tmp_path):
+        path = str(tmp_path / "prevalence.bin")
+        with sqlite3.connect(":memory:") as db:
+            initdb.create_tables(db.cursor())
+            assert write_snapshot(db.cursor(), path) == 0
+
+        with PrevalenceSnapshot(path) as snapshot:
+            assert snapshot.get("example.com") is None
+
+    def test_not_a_snapshot(self, tmp_path):
+        path = tmp_path / "prevalence.bin"
+        path.write_bytes(b"x" * 100)
+        with pytest.raises(ValueError):
+            PrevalenceSnapshot(str(path))
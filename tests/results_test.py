@@ -0,0 +1,176 @@
+import io
+import json
+import random
+import subprocess
+
+import pytest
+
+from lib import jsonstream
+from lib.results import get_blocked, get_revisions, load_revision, load_slim
+from lib.utils import cat_file
+
+
+def random_value(rng, depth=0):
+    r = rng.random()
+    if depth > 3 or r < 0.3:
+        return rng.choice([1, -2.5e10, 12345678901234567890, "x\"y\\", "é", True, None])
+    if r < 0.6:
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {f"k{i}é": random_value(rng, depth + 1) for i in range(rng.randrange(4))}
+
+
+def results(rng, num_domains):
+    return {
+        "version": 1,
+        "action_map": {f"d{i}.example.com": {
+            "heuristicAction": rng.choice(["block", "cookieblock", "allow", ""]),
+            "dnt": rng.random() < 0.1,
+            "nextUpdateTime": 0,
+        } for i in range(num_domains)},
+        "snitch_map": {f"d{i}.example.com": [f"site{j}.com" for j in range(rng.randrange(5))]
+                       for i in range(num_domains)},
+        "tracking_map": {f"d{i}.example.com": {"site1.com": ["canvas"], "sité.com": []}
+                         for i in range(num_domains // 2)},
+        "fp_scripts": {"d1.example.com": ["/fp.js"]},
+        "settings_map": {"example.com": {"disabled": True}},
+    }
+
+
+class TestJsonStream:
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 20])
+    def test_roundtrip(self, chunk_size):
+        rng = random.Random(chunk_size)
+        for _ in range(100):
+            obj = {f"top{i}": random_value(rng) for i in range(rng.randrange(6))}
+            text = json.dumps(obj, indent=rng.choice([None, 1]),
+                              ensure_ascii=rng.random() < 0.5)
+
+            parsed = {}
+            for key, value in jsonstream.iter_object(io.StringIO(text), chunk_size):
+                if isinstance(value, jsonstream.ObjectStream):
+                    value = dict(value)
+                parsed[key] = value
+            assert parsed == obj, text
+
+    @pytest.mark.parametrize("chunk_size", [7, 64])
+    def test_numbers_across_chunks(self, chunk_size):
+        # bare numbers, cut off at every offset
+        for pad in range(chunk_size * 2):
+            obj = {"m": {"pad": "a" * pad, "v": 12.5, "w": -3.25e-7, "x": 1E+30},
+                   "n": 6.02e23, "o": 12.5}
+            text = json.dumps(obj)
+
+            parsed = {}
+            for key, value in jsonstream.iter_object(io.StringIO(text), chunk_size):
+                if isinstance(value, jsonstream.ObjectStream):
+                    value = dict(value)
+                parsed[key] = value
+            assert parsed == obj, text
+
+    def test_number_at_default_chunk_boundary(self):
+        start, end = '{"m": {"pad": "', '", "v": 12'
+        text = start + "a" * ((1 << 20) - 1 - len(start) - len(end)) + end + '.5}}'
+        assert text.index(".") == (1 << 20) - 1
+        assert dict(next(jsonstream.iter_object(io.StringIO(text)))[1]) == \
+            json.loads(text)["m"]
+
+    def test_skips_unconsumed(self):
+        text = json.dumps({"a": {"b": {"c": 1}}, "d": 2, "e": {}})
+        assert [key for key, _ in jsonstream.iter_object(io.StringIO(text), 3)] == \
+            ["a", "d", "e"]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            list(jsonstream.iter_object(io.StringIO('{"a": [1, 2}'), 4))
+
+
+class TestLoadSlim:
+
+    @pytest.fixture
+    def write(self, tmp_path):
+        def write(obj, name="results.json", **kwargs):
+            path = tmp_path / name
+            path.write_text(json.dumps(obj, **kwargs), encoding="utf-8")
+            return str(path)
+        return write
+
+    def test_slim(self, write):
+        full = results(random.Random(1), 100)
+        slim, size, _ = load_slim(write(full, indent=2))
+
+        assert size == len(json.dumps(full))
+        assert slim.keys() == full.keys() - {"settings_map"}
+        assert slim["version"] == 1
+        for key in ("snitch_map", "fp_scripts"):
+            assert slim[key] == full[key]
+        assert {domain: entry["heuristicAction"] for domain, entry in slim["action_map"].items()} \
+            == {domain: entry["heuristicAction"] for domain, entry in full["action_map"].items()}
+        assert {base: list(sites) for base, sites in slim["tracking_map"].items()} \
+            == {base: list(sites) for base, sites in full["tracking_map"].items()}
+
+    def test_digest(self, write):
+        full = results(random.Random(1), 100)
+        _, _, digest = load_slim(write(full))
+
+        reordered = {key: dict(reversed(value.items())) if isinstance(value, dict) else value
+                     for key, value in reversed(full.items())}
+        assert load_slim(write(reordered, "reordered.json"))[2] == digest
+
+        full["action_map"]["d1.example.com"]["dnt"] = not full["action_map"]["d1.example.com"]["dnt"]
+        assert load_slim(write(full, "changed.json"))[2] != digest
+
+
+class TestRevisions:
+
+    @pytest.fixture
+    def repo(self, tmp_path):
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        self.git(repo, "init", "-q")
+        self.git(repo, "config", "user.email", "test@example.com")
+        self.git(repo, "config", "user.name", "test")
+        return repo
+
+    def git(self, repo, *args):
+        subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+    def commit(self, repo, subject, results=None):
+        if results is None:
+            (repo / "log.txt").write_text(subject, encoding="utf-8")
+        else:
+            (repo / "results.json").write_text(json.dumps(results), encoding="utf-8")
+        self.git(repo, "add", "-A")
+        self.git(repo, "commit", "-q", "-m", subject)
+
+    def test_get_blocked(self):
+        sites = ["a.com", "b.com", "c.com"]
+        blocked = get_blocked({
+            "action_map": {"example.com": {}, "cdn.example.com": {}, "www.example.co.uk": {},
+                           "rare.com": {}, "unknown.com": {}},
+            "snitch_map": {"example.com": sites, "example.co.uk": sites, "rare.com": sites[:2]},
+        })
+        assert blocked == {
+            "example.com": ["example.com", "cdn.example.com"],
+            "example.co.uk": ["www.example.co.uk"],
+        }
+
+    def test_revisions(self, repo):
+        self.commit(repo, "first", {"action_map": {"a.com": {}}, "snitch_map": {}})
+        self.commit(repo, "unrelated")
+        self.commit(repo, "second", {"action_map": {"b.com": {}}, "snitch_map": {},
+                                     "tracking_map": {"b.com": {}}})
+        self.commit(repo, "third", {"action_map": {"c.com": {}}, "snitch_map": {}})
+
+        revisions = get_revisions("HEAD~3..HEAD", cwd=repo)
+        assert [subject for _, _, subject in revisions] == ["second", "third"]
+
+        with cat_file(cwd=repo) as reader:
+            assert load_revision(reader, revisions[0][0] + "^") == \
+                {"action_map": {"a.com": {}}, "snitch_map": {}}
+            assert load_revision(reader, revisions[0][0]) == \
+                {"action_map": {"b.com": {}}, "snitch_map": {}}
+            assert load_revision(reader, "HEAD~4") is None
+
+        assert [subject for _, _, subject in get_revisions("HEAD", cwd=repo)] == \
+            ["first", "second", "third"]
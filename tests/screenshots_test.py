@@ -0,0 +1,122 @@
+import base64
+import logging
+import os
+
+from importlib.util import find_spec
+
+import pytest
+
+import crawler
+
+from lib.screenshots import ScreenshotWriter
+
+
+def encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+class FakeDriver:
+
+    current_url = "https://example.com/"
+
+    def __init__(self, frames):
+        self.frames = iter(frames)
+
+    def get_screenshot_as_base64(self):
+        return encode(next(self.frames))
+
+
+class TestScreenshotWriter:
+
+    def test_save(self, tmp_path):
+        writer = ScreenshotWriter(str(tmp_path))
+        futures = [writer.submit(name, encode(frame)) for name, frame in (
+            ("1-a", b"frame one"), ("2-b", b"frame two"), ("3-c", b"frame one"))]
+        writer.close()
+
+        paths = [future.result() for future in futures]
+        assert paths == [str(tmp_path / f"{name}.png") for name in ("1-a", "2-b", "3-c")]
+        assert (tmp_path / "1-a.png").read_bytes() == b"frame one"
+        assert (tmp_path / "2-b.png").read_bytes() == b"frame two"
+        assert (tmp_path / "3-c.png").read_bytes() == b"frame one"
+
+        # the duplicate doesn't take up any more space
+        assert os.stat(paths[0]).st_ino == os.stat(paths[2]).st_ino
+        assert writer.stats["screenshots"] == 3
+        assert writer.stats["duplicates"] == 1
+        assert writer.stats["written_bytes"] == len(b"frame one") + len(b"frame two")
+
+    def test_same_name(self, tmp_path):
+        writer = ScreenshotWriter(str(tmp_path))
+        for frame in (b"frame", b"frame"):
+            writer.submit("123-a-com", encode(frame))
+        writer.close()
+
+        assert os.listdir(tmp_path) == ["123-a-com.png"]
+        assert (tmp_path / "123-a-com.png").read_bytes() == b"frame"
+
+    def test_replace_link(self, tmp_path):
+        writer = ScreenshotWriter(str(tmp_path), num_workers=1)
+        for name, frame in (("1-a", b"frame one"), ("1-b", b"frame one"),
+                            ("1-b", b"frame two"), ("1-c", b"frame one")):
+            writer.submit(name, encode(frame))
+        writer.close()
+
+        # replacing 1-b doesn't touch 1-a, which it was linked to
+        assert (tmp_path / "1-a.png").read_bytes() == b"frame one"
+        assert (tmp_path / "1-b.png").read_bytes() == b"frame two"
+        assert (tmp_path / "1-c.png").read_bytes() == b"frame one"
+        assert sorted(os.listdir(tmp_path)) == ["1-a.png", "1-b.png", "1-c.png"]
+
+    def test_failure(self, tmp_path, caplog):
+        writer = ScreenshotWriter(str(tmp_path / "missing"), logger=logging.getLogger())
+        futures = [writer.submit(name, encode(b"frame")) for name in ("1-a", "2-a")]
+        writer.close()
+
+        assert [future.result() for future in futures] == [None, None]
+        assert writer.stats["failed"] == 1
+        assert "Failed to save screenshot 1-a" in caplog.text
+
+    @pytest.mark.skipif(find_spec("PIL") is not None, reason="Pillow is installed")
+    def test_reencode_requires_pillow(self, tmp_path):
+        with pytest.raises(ValueError):
+            ScreenshotWriter(str(tmp_path), "jpeg")
+        with pytest.raises(ValueError):
+            ScreenshotWriter(str(tmp_path), scale=0.5)
+
+    def test_reencode(self, tmp_path):
+        Image = pytest.importorskip("PIL.Image")
+        png = tmp_path / "in.png"
+        Image.new("RGB", (400, 300), "red").save(png)
+
+        writer = ScreenshotWriter(str(tmp_path), "jpeg", scale=0.5)
+        path = writer.submit("out", encode(png.read_bytes())).result()
+        writer.close()
+
+        assert path.endswith("out.jpg")
+        with Image.open(path) as image:
+            assert (image.format, image.size) == ("JPEG", (200, 150))
+
+
+class TestTakeScreenshot:
+
+    def test_take_screenshot(self, tmp_path):
+        cr = crawler.Crawler(crawler.create_argument_parser().parse_args(
+            ["firefox", "10", "--exclude-failures-since=off", "--take-screenshots",
+             "--out-dir", str(tmp_path)]))
+        cr.driver = FakeDriver([b"page", b"page"])
+        cr.take_screenshot("Example.com-" + cr.driver.current_url)
+        cr.take_screenshot("example.org")
+        cr.save_screenshots()
+
+        names = sorted(os.listdir(tmp_path / "screenshots"))
+        assert len(names) == 2
+        assert names[0].endswith("-example-com-https---example-com-.png")
+        assert cr.screenshots.stats["duplicates"] == 1
+
+    def test_worker_command(self):
+        args = crawler.create_argument_parser().parse_args(
+            ["firefox", "10", "--take-screenshots", "--screenshot-format=webp"])
+        cmd = crawler.worker_command(args, "127.0.0.1:7000", "out")
+        assert cmd[cmd.index("--screenshot-format") + 1] == "webp"
+        assert cmd[cmd.index("--screenshot-scale") + 1] == "1.0"
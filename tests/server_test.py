@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+import initdb
+
+from sql.server import QueryService
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestQueryService:
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        db_path = tmp_path / "badger.sqlite3"
+        with sqlite3.connect(db_path) as db:
+            initdb.create_tables(db.cursor())
+        return db_path
+
+    def test_cache_ttl(self, db_path):
+        clock = FakeClock()
+        service = QueryService(db_path, pool_size=1, cache_ttl=60, clock=clock)
+
+        assert not service.run("errors")[2]
+        clock.now = 59
+        assert service.run("errors")[2]
+        # reports are relative to the current time
+        clock.now = 60
+        assert not service.run("errors")[2]
+
+    def test_cache_size(self, db_path):
+        service = QueryService(db_path, pool_size=1, cache_size=2)
+
+        for days in (1, 2, 3):
+            service.run("new", days=days)
+        assert len(service.cache) == 2
+        assert service.run("new", days=3)[2]
+        assert not service.run("new", days=1)[2]
+
+    def test_data_version(self, db_path):
+        service = QueryService(db_path, pool_size=1)
+        service.run("errors")
+        with sqlite3.connect(db_path) as db:
+            db.execute("INSERT INTO error (name) VALUES ('TimeoutException')")
+        assert not service.run("errors")[2]
@@ -0,0 +1,99 @@
+import random
+import sqlite3
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import initdb
+
+from lib import sketch
+
+
+def assert_within_bounds(estimated, exact):
+    # the documented 99.7% bound, plus some slack for tiny counts
+    assert abs(estimated - exact) <= exact * 0.025 + 1, (estimated, exact)
+
+
+class TestSketch:
+
+    @pytest.mark.parametrize("num_sites", [0, 1, 10, 100, 1000, 10000, 100000])
+    def test_estimate(self, num_sites):
+        rng = np.random.default_rng(num_sites)
+        site_ids = rng.choice(10 ** 9, num_sites, replace=False)
+        assert_within_bounds(sketch.estimate(sketch.sketch(site_ids)), num_sites)
+
+    def test_merge_is_lossless(self):
+        rng = np.random.default_rng(1)
+        site_ids = rng.choice(10 ** 6, 5000, replace=False)
+        parts = [sketch.to_bytes(sketch.sketch(part))
+                 for part in np.array_split(site_ids, 7)]
+        # overlapping sets
+        parts.append(sketch.to_bytes(sketch.sketch(site_ids[:100])))
+
+        _, merged = sketch.merge_blobs(parts, [3] * len(parts))
+        assert np.array_equal(merged, sketch.sketch(site_ids))
+
+
+class TestStoredSketches:
+
+    @pytest.fixture
+    def cur(self):
+        sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+        with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as db:
+            cur = db.cursor()
+            initdb.create_tables(cur)
+            yield cur
+
+    def add_scans(self, cur, num_scans, start=datetime(2026, 1, 1)):
+        rng = random.Random(num_scans)
+        for i in range(num_scans):
+            start_time = start + timedelta(days=i)
+            scan_id = initdb.get_scan_id(
+                cur, start_time, start_time + timedelta(hours=5),
+                rng.choice(["sfo1", "ams3"]), 100,
+                rng.choice(["chrome", "firefox"]), True, True)
+            for site_num in rng.sample(range(3000), 1000):
+                site_id = initdb.get_id(cur, "site", "fqdn", f"site{site_num}.com")
+                cur.execute("INSERT INTO scan_sites VALUES (?,?,?,1,NULL,?,?)",
+                            (scan_id, site_id, site_id, start_time, start_time))
+                for _ in range(rng.randrange(3)):
+                    cur.execute("INSERT INTO tracking VALUES (?,?,?,NULL)", (
+                        scan_id, site_id, initdb.get_id(
+                            cur, "tracker", "base", f"tracker{int(rng.paretovariate(1))}.com")))
+
+    @pytest.mark.parametrize("scan_filter, sql", [
+        ({}, "1"),
+        ({"since": "2026-01-05"}, "scan.start_time >= '2026-01-05'"),
+        ({"browsers": ["firefox"]}, "scan.browser_id = 1"),
+        ({"regions": ["ams3"], "until": "2026-01-09"},
+         "scan.region = 'ams3' AND scan.start_time < '2026-01-09'"),
+    ])
+    def test_matches_sql(self, cur, scan_filter, sql):
+        self.add_scans(cur, 6)
+        assert sketch.update_sketches(cur) == 6
+        self.add_scans(cur, 4, start=datetime(2026, 1, 7))
+        assert sketch.update_sketches(cur) == 4
+        assert sketch.update_sketches(cur) == 0
+
+        cur.execute(f"""
+            SELECT t.base, COUNT(DISTINCT tr.site_id)
+            FROM tracking tr
+            JOIN scan ON scan.id = tr.scan_id
+            JOIN tracker t ON t.id = tr.tracker_id
+            WHERE {sql}
+            GROUP BY t.base""")
+        exact = dict(cur.fetchall())
+        estimated = sketch.estimate_prevalence(cur, **scan_filter)
+        assert estimated.keys() == exact.keys()
+        for base, num_sites in exact.items():
+            assert_within_bounds(estimated[base], num_sites)
+
+        cur.execute(f"""
+            SELECT COUNT(DISTINCT initial_site_id)
+            FROM scan_sites
+            JOIN scan ON scan.id = scan_id
+            WHERE {sql}""")
+        exact = cur.fetchone()[0]
+        assert_within_bounds(sketch.estimate_total_sites(cur, **scan_filter), exact)
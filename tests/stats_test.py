@@ -0,0 +1,96 @@
+import json
+import subprocess
+
+from pathlib import Path
+
+import pytest
+
+import stats
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+class TestStats:
+
+    @pytest.fixture
+    def repo(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(stats, "_cache_dir", str(tmp_path / "cache"))
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        for args in (("init", "-q"),
+                     ("config", "user.email", "test@example.com"),
+                     ("config", "user.name", "test")):
+            subprocess.run(["git", *args], cwd=repo, check=True)
+        return repo
+
+    def commit(self, repo, log_txt, results):
+        (repo / "log.txt").write_text(log_txt, encoding="utf-8")
+        (repo / "results.json").write_text(json.dumps(results), encoding="utf-8")
+        subprocess.run(["git", "add", "-A"], cwd=repo, check=True)
+        subprocess.run(["git", "commit", "-q", "-m", "Add data"], cwd=repo, check=True)
+
+    def test_parse_log(self):
+        with open(FIXTURES_DIR / "ingest_log.txt", encoding="utf-8") as f:
+            assert stats.parse_log(f) == {
+                "browser": "firefox",
+                "num_domains": "12",
+                "errors": "66.7%",
+                "num_timeouts": 3,
+                "num_antibot": 1,
+                "num_restarts": 6,
+                "start_time": "2026-08-21 12:00:43",
+                "end_time": "2026-08-21 12:07:10",
+            }
+
+    def test_count_blocked(self):
+        results = {
+            "action_map": {
+                "example.com": {},
+                "a.example.com": {},
+                "b.example.com": {},
+                "example.net": {},
+            },
+            "snitch_map": {
+                "example.com": ["a.com", "b.com", "c.com"],
+                "example.net": ["a.com", "b.com"],
+            }
+        }
+        assert stats.count_blocked(results) == 1
+        assert stats.count_blocked({"action_map": {}, "snitch_map": {}}) is None
+
+    def test_format_row(self):
+        row = stats.format_row({
+            "browser": "chrome",
+            "num_domains": "6,000",
+            "errors": "10.5%",
+            "num_timeouts": 300,
+            "num_antibot": 60,
+            "num_restarts": 2,
+            "start_time": "2026-08-21 12:00:43",
+            "end_time": "2026-08-22 10:59:59",
+            "num_blocked": 900,
+        }, "abc1234  2026-08-22 11:00:00 +0000")
+        assert row == ("chrome     6,000   900        10.5% (5.0%, 1.0%)     2        "
+                       "22 hours    abc1234  2026-08-22 11:00:00 +0000")
+
+    def test_history(self, repo, monkeypatch):
+        results = {"action_map": {"example.com": {}},
+                   "snitch_map": {"example.com": ["a.com", "b.com", "c.com"]}}
+        self.commit(repo, "  browser: Chrome\n", results)
+        self.commit(repo, (FIXTURES_DIR / "ingest_log.txt").read_text(encoding="utf-8"), {})
+
+        revisions = stats.get_revisions(repo)
+        assert len(revisions) == 2
+
+        with stats.cat_file(cwd=repo) as blobs:
+            newest = [stats.get_stats(blobs, log_blob, results_blob)
+                      for _, _, log_blob, results_blob in revisions]
+        assert [s['browser'] for s in newest] == ["firefox", "chrome"]
+        assert [s['num_blocked'] for s in newest] == [None, 1]
+
+        # cached stats don't get recomputed
+        monkeypatch.setattr(stats, "parse_log", None)
+        with stats.cat_file(cwd=repo) as blobs:
+            assert [stats.get_stats(blobs, log_blob, results_blob)
+                    for _, _, log_blob, results_blob in revisions] == newest
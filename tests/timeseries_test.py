@@ -0,0 +1,127 @@
+import random
+import sqlite3
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import initdb
+
+from lib.timeseries import TrackerSeries
+
+
+NOW = datetime(2026, 6, 1, 12, 0, 0)
+
+
+class TestTrackerSeries:
+
+    @pytest.fixture
+    def cur(self):
+        sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+        with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as db:
+            cur = db.cursor()
+            initdb.create_tables(cur)
+            self.add_scans(cur)
+            yield cur
+
+    def add_scans(self, cur):
+        rng = random.Random(1)
+        canvas = initdb.get_id(cur, "tracking_type", "name", "canvas")
+
+        # one scan every 12 hours over the last 90 days
+        for i in range(180):
+            start_time = NOW - timedelta(days=90) + timedelta(hours=12 * i)
+            scan_id = initdb.get_scan_id(
+                cur, start_time, start_time + timedelta(hours=5), "sfo1", 100,
+                rng.choice(["chrome", "firefox"]), rng.random() < 0.8, rng.random() < 0.9)
+
+            for site_num in rng.sample(range(100), 40):
+                site_id = initdb.get_id(cur, "site", "fqdn", f"site{site_num}.com")
+                cur.execute("INSERT INTO scan_sites VALUES (?,?,?,1,NULL,?,?)",
+                            (scan_id, site_id, site_id, start_time, start_time))
+
+                trackers = [f"tracker{int(rng.paretovariate(1.2))}.com"
+                            for _ in range(rng.randrange(4))]
+                # shows up in the last week only
+                if i >= 166:
+                    trackers.append("newcomer.com")
+                # disappears in the last week
+                elif rng.random() < 0.5:
+                    trackers.append("goner.com")
+
+                for base in trackers:
+                    cur.execute("INSERT INTO tracking VALUES (?,?,?,?)", (
+                        scan_id, site_id, initdb.get_id(cur, "tracker", "base", base),
+                        canvas if rng.random() < 0.2 else None))
+
+    def sql_prevalence(self, cur, since, until=NOW, tracking_type=None):
+        cur.execute("""
+            SELECT t.base, COUNT(DISTINCT tr.site_id)
+            FROM tracking tr
+            JOIN scan ON scan.id = tr.scan_id
+            JOIN tracker t ON t.id = tr.tracker_id
+            LEFT JOIN tracking_type tt ON tt.id = tr.tracking_type_id
+            WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
+                AND scan.start_time >= ? AND scan.start_time < ?
+                AND (? IS NULL OR tt.name = ?)
+            GROUP BY t.base""", (since, until, tracking_type, tracking_type))
+        return dict(cur.fetchall())
+
+    @pytest.mark.parametrize("days, until_days, tracking_type", [
+        (30, 0, None),
+        (60, 30, None),
+        (365, 0, "canvas"),
+        (None, 0, None),
+    ])
+    def test_matches_sql(self, cur, days, until_days, tracking_type):
+        series = TrackerSeries(cur, now=NOW)
+
+        since = NOW - timedelta(days=days or 10000)
+        until = NOW - timedelta(days=until_days)
+
+        counts = series.prevalence(days, until_days, tracking_type)
+        assert dict(series.top(counts)) == self.sql_prevalence(
+            cur, since, until, tracking_type)
+
+        cur.execute("""
+            SELECT COUNT(DISTINCT initial_site_id), COUNT(DISTINCT scan_id)
+            FROM scan_sites
+            JOIN scan ON scan.id = scan_id
+            WHERE scan.no_blocking = 1 AND scan.daily_scan = 1
+                AND scan.start_time >= ? AND scan.start_time < ?""", (since, until))
+        assert (series.total_sites(days, until_days),
+                series.num_scans(days, until_days)) == cur.fetchone()
+
+    def test_top(self, cur):
+        series = TrackerSeries(cur, now=NOW)
+        top = series.top(series.prevalence(30), limit=5)
+        assert len(top) == 5
+        assert [count for _, count in top] == sorted((count for _, count in top), reverse=True)
+
+    def test_rolling_prevalence(self, cur):
+        series = TrackerSeries(cur, now=NOW)
+        rolling = series.rolling_prevalence(window_days=14, step_days=7, num_windows=4)
+        assert rolling.shape == (len(series.trackers), 4)
+        for i in range(4):
+            assert np.array_equal(rolling[:, i], series.prevalence(i * 7 + 14, i * 7))
+
+    def test_period_over_period(self, cur):
+        series = TrackerSeries(cur, now=NOW)
+        periods = series.period_over_period(7, offset_days=28)
+
+        assert np.array_equal(periods['prev'], series.prevalence(35, 28))
+        assert np.array_equal(periods['curr'], series.prevalence(7))
+
+        newcomer = series.tracker_ids["newcomer.com"]
+        assert periods['rel_delta'][newcomer] == 1.0
+        goner = series.tracker_ids["goner.com"]
+        assert periods['rel_delta'][goner] == -periods['rel_prev'][goner]
+
+    def test_anomaly_scores(self, cur):
+        series = TrackerSeries(cur, now=NOW)
+        scores = series.anomaly_scores(recent_days=7, baseline_days=60)
+
+        ranked = np.argsort(scores)
+        assert series.trackers[ranked[-1]] == "newcomer.com"
+        assert series.trackers[ranked[0]] == "goner.com"
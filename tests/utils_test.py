@@ -0,0 +1,49 @@
+import subprocess
+
+import pytest
+
+from lib.utils import cat_file, stream
+
+
+class TestStream:
+
+    def test_lines(self):
+        with stream(["printf", "a\\nb\\n"]) as lines:
+            assert list(lines) == ["a\n", "b\n"]
+
+    def test_stop_early(self):
+        with stream(["seq", "1000000"]) as lines:
+            assert next(lines) == "1\n"
+
+    def test_failure(self):
+        with pytest.raises(subprocess.CalledProcessError):
+            with stream(["git", "show", "no-such-rev:log.txt"]) as lines:
+                assert not list(lines)
+
+
+class TestCatFile:
+
+    BLOBS = ("no trailing newline\nlast line", "one\ntwo\n", "", "x")
+
+    @pytest.fixture
+    def repo(self, tmp_path):
+        subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+        return tmp_path
+
+    def hash_blob(self, repo, text):
+        return subprocess.run(["git", "hash-object", "-w", "--stdin"], cwd=repo, input=text,
+                              capture_output=True, check=True, text=True).stdout.strip()
+
+    def test_lines(self, repo):
+        hashes = [self.hash_blob(repo, text) for text in self.BLOBS]
+        with cat_file(cwd=repo) as blobs:
+            for blob_hash, text in zip(hashes * 2, self.BLOBS * 2):
+                assert list(blobs.lines(blobs.request(blob_hash))) == \
+                    text.splitlines(keepends=True)
+            assert blobs.request("0" * 40) is None
+
+    def test_read(self, repo):
+        hashes = [self.hash_blob(repo, text) for text in self.BLOBS]
+        with cat_file(cwd=repo) as blobs:
+            for blob_hash, text in zip(hashes, self.BLOBS):
+                assert blobs.read(blobs.request(blob_hash)) == text.encode("utf-8")
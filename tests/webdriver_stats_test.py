@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import crawler
+
+from lib.webdriver_stats import BUCKETS_MS, CommandStats, print_comparison
+
+
+class FakeDriver:
+
+    def __init__(self):
+        self.commands = []
+
+    def execute(self, driver_command, params=None):
+        self.commands.append(driver_command)
+        if driver_command == "fail":
+            raise RuntimeError(driver_command)
+        return {"value": params}
+
+
+class TestCommandStats:
+
+    def test_instrument(self):
+        stats = CommandStats("firefox")
+        driver = FakeDriver()
+        stats.instrument(driver)
+
+        assert driver.execute("getCurrentUrl") == {"value": None}
+        with stats.in_phase("load"):
+            driver.execute("get", {"url": "http://example.com/"})
+            with stats.in_phase("scroll"):
+                driver.execute("executeScript")
+                driver.execute("executeScript")
+            driver.execute("getCurrentUrl")
+            with pytest.raises(RuntimeError):
+                driver.execute("fail")
+
+        assert driver.commands == ["getCurrentUrl", "get", "executeScript",
+                                   "executeScript", "getCurrentUrl", "fail"]
+        assert stats.phase == "other"
+        assert {key: entry["count"] for key, entry in stats.stats.items()} == {
+            ("other", "getCurrentUrl"): 1,
+            ("load", "get"): 1,
+            ("scroll", "executeScript"): 2,
+            ("load", "getCurrentUrl"): 1,
+            ("load", "fail"): 1,
+        }
+        assert stats.totals()["getCurrentUrl"]["count"] == 2
+        assert stats.totals("phase")["load"]["count"] == 3
+
+    def test_histogram(self):
+        stats = CommandStats()
+        for seconds in (0.0005, 0.001, 0.003, 0.003, 60):
+            stats.record("executeScript", seconds)
+
+        entry = stats.stats[("other", "executeScript")]
+        assert entry["count"] == 5
+        assert entry["max_seconds"] == 60
+        assert entry["histogram"][:3] == [2, 0, 2]
+        assert entry["histogram"][len(BUCKETS_MS)] == 1
+        assert sum(entry["histogram"]) == 5
+
+    def test_save_and_compare(self, tmp_path, capsys):
+        paths = []
+        for browser, seconds in (("chrome", 0.01), ("firefox", 0.1)):
+            stats = CommandStats(browser)
+            with stats.in_phase("load"):
+                stats.record("get", seconds * 100)
+            stats.record("executeScript", seconds)
+            paths.append(str(tmp_path / f"{browser}.json"))
+            stats.save(paths[-1])
+
+        with open(paths[1], encoding="utf-8") as f:
+            saved = json.load(f)
+        assert saved["browser"] == "firefox"
+        assert list(saved["commands"]) == ["get", "executeScript"]
+        assert saved["by_phase"][0]["phase"] == "load"
+
+        print_comparison(paths)
+        out = capsys.readouterr().out.splitlines()
+        assert out[0].split() == ["command", "chrome", "firefox"]
+        assert out[1].split() == ["get", "1s", "1000ms", "10s", "10000ms"]
+        assert out[2].split() == ["executeScript", "0s", "10ms", "0s", "100ms"]
+
+    def test_crawler_phase(self):
+        args = ["firefox", "10", "--exclude-failures-since=off"]
+        cr = crawler.Crawler(crawler.create_argument_parser().parse_args(args))
+        assert cr.command_stats is None
+        with cr.phase("load"):
+            pass
+
+        cr = crawler.Crawler(crawler.create_argument_parser().parse_args(
+            args + ["--webdriver-stats"]))
+        with cr.phase("load"):
+            assert cr.command_stats.phase == "load"
@@ -2,44 +2,242 @@
 
 import argparse
 import json
+import pathlib
 import sys
 
-from collections import defaultdict
-
 import colorama
 
-from lib.basedomain import extract
-
-from lib.lists.adblocker import Adblocker
-from lib.lists.ddg import DDG
-from lib.lists.disconnect import Disconnect
-from lib.lists.ghostery import Ghostery
+from lib.lists.index import ListIndex, listed, unblocked
+from lib.prevalence import SNAPSHOT_FILENAME, PrevalenceSnapshot
+from lib.results import get_blocked, get_revisions, load_revision, load_slim
+from lib.utils import cat_file
 
-from lib.linters.mdfp import print_warnings as flag_potential_mdfp_domains
-from lib.linters.unblocked import print_warnings as list_unblocked_canvas_fingerprinters
-from lib.linters.site_outliers import print_warnings as list_suspicious_site_domains
+from lib.linters.runner import run_linters
 
 
 ap = argparse.ArgumentParser()
 ap.add_argument('old_path', nargs='?')
-ap.add_argument('new_path')
+ap.add_argument('new_path', nargs='?')
 ap.add_argument('--badger-only', action='store_true', default=False)
+ap.add_argument('--stream', action='store_true', default=False,
+                help="parse the JSON incrementally, keeping only what gets "
+                "reported on (for very large results)")
+ap.add_argument('--range', metavar='REV_RANGE',
+                help="compare every revision of results.json in the given "
+                "git revision range (for example, HEAD~30..HEAD) to the one before it")
+ap.add_argument('--repo', default=pathlib.Path(__file__).parent.resolve(),
+                help="path to the badger-sett repository, for --range")
+ap.add_argument('--prevalence', default=SNAPSHOT_FILENAME,
+                help="path to the tracker prevalence snapshot written by "
+                "initdb.py, for annotating blocked domains (if it exists)")
 args = ap.parse_args()
 
-if args.old_path:
-    with open(args.old_path, encoding='utf-8') as f:
-        old_js = json.load(f)
+# a lone positional argument is the new results
+if args.old_path and not args.new_path:
+    args.old_path, args.new_path = None, args.old_path
+
+if not args.range and not args.new_path:
+    ap.error("the path to the new results is required")
+
+empty_js = {
+    "action_map": {},
+    "snitch_map": {},
+}
+
+colorama.init()
+C_GREEN = colorama.Style.BRIGHT + colorama.Fore.GREEN
+C_RED = colorama.Style.BRIGHT + colorama.Fore.RED
+C_YELLOW = colorama.Style.BRIGHT + colorama.Fore.YELLOW
+C_RESET = colorama.Style.RESET_ALL
+
+prevalence_snapshot = None
+if pathlib.Path(args.prevalence).is_file():
+    prevalence_snapshot = PrevalenceSnapshot(args.prevalence)
+
+
+def format_otherlists(base):
+    """Marks the lists that have the domain, in yellow where
+    the list says to not block it."""
+    mask = list_index.get(base)
+    if not mask:
+        return "    "
+    return "".join(
+        f"{C_YELLOW}⊙{C_RESET}" if mask & unblocked(i) else (
+            "⊙" if mask & listed(i) else " ")
+        for i in range(len(ListIndex.lists)))
+
+
+def format_prevalence(base):
+    """Summarizes how widespread the tracker has been across past scans."""
+    if not prevalence_snapshot:
+        return ""
+    entry = prevalence_snapshot.get(base)
+    if not entry:
+        return " [not seen before]"
+    sites = "/".join(str(num_sites) for num_sites in entry.sites)
+    return (f" [{sites} sites, {entry.first_seen:%Y-%m-%d}–{entry.last_seen:%Y-%m-%d}, "
+            f"{' '.join(entry.browsers)}]")
+
+
+def print_prevalence_legend():
+    if not prevalence_snapshot:
+        return
+    windows = "/".join(f"{days}d" if days else "all time"
+                       for days in prevalence_snapshot.windows)
+    print(f"Prevalence as of {prevalence_snapshot.generated:%Y-%m-%d} ({args.prevalence}): "
+          f"[sites over the last {windows}, first–last seen, browsers]\n")
+
+
+def print_action_map_counts(old_js, new_js):
+    old_keys = set(old_js['action_map'].keys())
+    new_keys = set(new_js['action_map'].keys())
+
+    overlap = old_keys & new_keys
+    # pylint: disable-next=consider-using-f-string
+    print("New action map has %d new domains and dropped %d old domains\n" %
+          (len(new_keys - overlap), len(old_keys - overlap)))
+
+
+def print_diff(old_js, new_js, blocked_old, blocked_new):
+    if blocked_old:
+        # pylint: disable-next=consider-using-f-string
+        print("\nCount of blocked base domains went from {} to {} ({:+0.2f}%)".format(
+            len(blocked_old), len(blocked_new),
+            (len(blocked_new) - len(blocked_old)) / len(blocked_old) * 100
+        ))
+
+    print_newly_blocked(new_js, blocked_new.keys() - blocked_old.keys(), blocked_new)
+    print_no_longer_blocked(old_js, blocked_old.keys() - blocked_new.keys(), blocked_old)
+
+
+def print_newly_blocked(new_js, newly_blocked, blocked_new):
+    print(f"\n{C_GREEN}++{C_RESET} Newly blocked domains ({len(newly_blocked)}):\n")
+    for base in sorted(newly_blocked):
+        otherlists = ""
+        if args.badger_only:
+            if list_index.get(base) & ListIndex.BLOCKED:
+                continue
+        else:
+            otherlists = format_otherlists(base)
+        cookieblocked = ""
+        if base in new_js['action_map']:
+            if new_js['action_map'][base]['heuristicAction'] == "cookieblock":
+                cookieblocked = f"{C_YELLOW}❋{C_RESET}"
+        out = f" {otherlists} {cookieblocked}{C_GREEN}{base}{C_RESET}{format_prevalence(base)}"
+        if base in new_js['snitch_map']:
+            sites = ", ".join(new_js['snitch_map'][base])
+            sites = sites.replace(".edu", "." + C_YELLOW + "edu" + C_RESET)
+            sites = sites.replace(".org", "." + C_YELLOW + "org" + C_RESET)
+            sites = sites.replace(".gov", "." + C_RED + "gov" + C_RESET)
+            sites = sites.replace(".mil", "." + C_RED + "mil" + C_RESET)
+            out = out + " on " + sites
+        print(out)
+
+        subdomains = blocked_new[base]
+        if len(subdomains) > 1 or subdomains[0] != base:
+            for y in sorted(subdomains):
+                if y == base:
+                    continue
+                out = "        • {}{}" if not args.badger_only else "    • {}{}"
+                if y in new_js['snitch_map']:
+                    out = out + " on " + ", ".join(new_js['snitch_map'][y])
+                cookieblocked = ""
+                # cookieblocked if it or any parent domain up to base is cookieblocked
+                domain_parts = y.split('.')
+                exploded_subdomains = (s for s in (
+                        '.'.join(domain_parts[idx:])
+                        for idx, _ in enumerate(domain_parts))
+                    if len(s) >= len(base))
+                if any(sub for sub in exploded_subdomains
+                       if new_js['action_map'].get(sub, {}).get('heuristicAction', "") == "cookieblock"):
+                    cookieblocked = f"{C_YELLOW}❋{C_RESET}"
+                print(out.format(cookieblocked, y))
+
+
+def print_no_longer_blocked(old_js, no_longer_blocked, blocked_old):
+    if no_longer_blocked:
+        print(f"\n{C_RED}--{C_RESET} No longer blocked domains ({len(no_longer_blocked)}):\n")
+    for base in sorted(no_longer_blocked):
+        otherlists = ""
+        if args.badger_only:
+            if list_index.get(base) & ListIndex.BLOCKED:
+                continue
+        else:
+            otherlists = format_otherlists(base)
+        out = f" {otherlists} {C_RED}{base}{C_RESET}{format_prevalence(base)}"
+        if base in old_js['snitch_map']:
+            out = out + " on " + ", ".join(old_js['snitch_map'][base])
+        print(out)
+
+        subdomains = blocked_old[base]
+        if len(subdomains) > 1 or subdomains[0] != base:
+            for y in sorted(subdomains):
+                if y == base:
+                    continue
+                out = "        • {}" if not args.badger_only else "    • {}"
+                if y in old_js['snitch_map']:
+                    out = out + " on " + ", ".join(old_js['snitch_map'][y])
+                print(out.format(y))
+
+
+def print_range(rev_range):
+    """Prints what changed with every revision of results.json in the range.
+
+    Every revision gets loaded and has its blocked domains worked out
+    once, to serve as both the new and then the old side of a comparison.
+    """
+    revisions = get_revisions(rev_range, cwd=args.repo)
+    if not revisions:
+        print(f"No changes to results.json in {rev_range}")
+        sys.exit(1)
+
+    with cat_file(cwd=args.repo) as reader:
+        old_js = load_revision(reader, revisions[0][0] + "^") or empty_js
+        blocked_old = get_blocked(old_js)
+
+        for rev, date, subject in revisions:
+            new_js = load_revision(reader, rev)
+            if new_js is None:
+                print(f"\n{C_YELLOW}{rev[:10]}{C_RESET} {date} {subject}: results.json removed")
+                continue
+            blocked_new = get_blocked(new_js)
+
+            print(f"\n{C_YELLOW}{rev[:10]}{C_RESET} {date} {subject}\n")
+            print_action_map_counts(old_js, new_js)
+            print_diff(old_js, new_js, blocked_old, blocked_new)
+
+            old_js, blocked_old = new_js, blocked_new
+
+    print("")
+
+
+if args.range:
+    list_index = ListIndex()
+    print_prevalence_legend()
+    print_range(args.range)
+    sys.exit(0)
+
+if args.stream:
+    old_js, old_digest = empty_js, None
+    if args.old_path:
+        old_js, _, old_digest = load_slim(args.old_path, maps=('action_map', 'snitch_map'))
+    new_js, size_bytes, new_digest = load_slim(args.new_path)
+
+    # make sure new JSON is not the same as old JSON
+    assert old_digest != new_digest
 else:
-    old_js = {
-        "action_map": {},
-        "snitch_map": {},
-    }
+    old_js = empty_js
+    if args.old_path:
+        with open(args.old_path, encoding='utf-8') as f:
+            old_js = json.load(f)
 
-with open(args.new_path, encoding='utf-8') as f:
-    new_js = json.load(f)
+    with open(args.new_path, encoding='utf-8') as f:
+        new_js = json.load(f)
 
-# make sure new JSON is not the same as old JSON
-assert old_js != new_js
+    # make sure new JSON is not the same as old JSON
+    assert old_js != new_js
+
+    size_bytes = len(json.dumps(new_js))
 
 # make sure the JSON is structured correctly
 for k in ['action_map', 'snitch_map']:
@@ -54,172 +252,23 @@ if not new_js['action_map'].keys():
     print("Error: Action map empty.")
     sys.exit(1)
 
-colorama.init()
-C_GREEN = colorama.Style.BRIGHT + colorama.Fore.GREEN
-C_RED = colorama.Style.BRIGHT + colorama.Fore.RED
-C_YELLOW = colorama.Style.BRIGHT + colorama.Fore.YELLOW
-C_RESET = colorama.Style.RESET_ALL
-
-adblocker = Adblocker()
-ddg = DDG()
-disconnect = Disconnect()
-ghostery = Ghostery()
+list_index = ListIndex()
 
-ddg_blocked = ddg.bases - ddg.bases_unblocked
-disconnect_blocked = disconnect.bases - disconnect.bases_unblocked
-ghostery_blocked = ghostery.bases - ghostery.bases_unblocked
-
-combined_blocked = ddg_blocked | disconnect_blocked | ghostery_blocked
-combined_blocked_with_adblocker_lists = adblocker.bases | combined_blocked
+print_prevalence_legend()
 
 # warn when BADGER_JSON_NEW is close to or exceeds QUOTA_BYTES
-size_bytes = len(json.dumps(new_js))
 if size_bytes >= (5242880 / 100 * 80):
     size_mb = round(size_bytes / 1024 / 1024, 2)
     print(f"{C_RED}WARNING{C_RESET}: {args.new_path} serializes to {size_mb} MB\n")
 
-old_keys = set(old_js['action_map'].keys())
-new_keys = set(new_js['action_map'].keys())
-
-overlap = old_keys & new_keys
-# pylint: disable-next=consider-using-f-string
-print("New action map has %d new domains and dropped %d old domains\n" %
-      (len(new_keys - overlap), len(old_keys - overlap)))
-
-blocked_old = defaultdict(list)
-for domain in old_js['action_map'].keys():
-    base = extract(domain).registered_domain
-    if not base:
-        base = domain
-    if base in old_js['snitch_map']:
-        if len(old_js['snitch_map'][base]) >= 3:
-            blocked_old[base].append(domain)
-
-new_domains = defaultdict(list)
-blocked_new = defaultdict(list)
-for domain in new_js['action_map'].keys():
-    base = extract(domain).registered_domain
-    if not base:
-        # IP address, a no-dots string (Privacy Badger bug), or
-        # https://github.com/john-kurkowski/tldextract/issues/178
-        print(f"Failed to extract base domain for {domain}")
-        base = domain
-    new_domains[base].append(domain)
-    if base in new_js['snitch_map']:
-        if len(new_js['snitch_map'][base]) >= 3:
-            blocked_new[base].append(domain)
-    else:
-        # TODO happens with s3.amazonaws.com, why?
-        print(f"Failed to find {base} (eTLD+1 of {domain}) in snitch_map")
-
-blocked_bases_old = set(blocked_old.keys())
-blocked_bases_new = set(blocked_new.keys())
-
-if args.badger_only:
-    badger_only_new = blocked_bases_new - combined_blocked_with_adblocker_lists
-    if blocked_bases_old:
-        badger_only_old = blocked_bases_old - combined_blocked_with_adblocker_lists
-
-if blocked_bases_old:
-    # pylint: disable-next=consider-using-f-string
-    print("\nCount of blocked base domains went from {} to {} ({:+0.2f}%)".format(
-        len(blocked_bases_old), len(blocked_bases_new),
-        (len(blocked_bases_new) - len(blocked_bases_old)) / len(blocked_bases_old) * 100
-    ))
-
-newly_blocked = blocked_bases_new - blocked_bases_old
-print(f"\n{C_GREEN}++{C_RESET} Newly blocked domains ({len(newly_blocked)}):\n")
-for base in sorted(newly_blocked):
-    if args.badger_only:
-        if base not in badger_only_new:
-            continue
-
-    otherlists = ""
-    if not args.badger_only:
-        otherlists = "    "
-        if base in adblocker.bases or base in ddg.bases or base in disconnect.bases or base in ghostery.bases:
-            otherlists = "".join((
-                "⊙" if base in adblocker.bases else " ",
-                f"{C_YELLOW}⊙{C_RESET}" if base in ddg.bases_unblocked else (
-                    "⊙" if base in ddg.bases else " "),
-                f"{C_YELLOW}⊙{C_RESET}" if base in disconnect.bases_unblocked else (
-                    "⊙" if base in disconnect.bases else " "),
-                f"{C_YELLOW}⊙{C_RESET}" if base in ghostery.bases_unblocked else (
-                    "⊙" if base in ghostery.bases else " ")))
-    cookieblocked = ""
-    if base in new_js['action_map']:
-        if new_js['action_map'][base]['heuristicAction'] == "cookieblock":
-            cookieblocked = f"{C_YELLOW}❋{C_RESET}"
-    out = f" {otherlists} {cookieblocked}{C_GREEN}{base}{C_RESET}"
-    if base in new_js['snitch_map']:
-        sites = ", ".join(new_js['snitch_map'][base])
-        sites = sites.replace(".edu", "." + C_YELLOW + "edu" + C_RESET)
-        sites = sites.replace(".org", "." + C_YELLOW + "org" + C_RESET)
-        sites = sites.replace(".gov", "." + C_RED + "gov" + C_RESET)
-        sites = sites.replace(".mil", "." + C_RED + "mil" + C_RESET)
-        out = out + " on " + sites
-    print(out)
-
-    subdomains = blocked_new[base]
-    if len(subdomains) > 1 or subdomains[0] != base:
-        for y in sorted(subdomains):
-            if y == base:
-                continue
-            out = "        • {}{}" if not args.badger_only else "    • {}{}"
-            if y in new_js['snitch_map']:
-                out = out + " on " + ", ".join(new_js['snitch_map'][y])
-            cookieblocked = ""
-            # cookieblocked if it or any parent domain up to base is cookieblocked
-            domain_parts = y.split('.')
-            exploded_subdomains = (s for s in (
-                    '.'.join(domain_parts[idx:])
-                    for idx, _ in enumerate(domain_parts))
-                if len(s) >= len(base))
-            if any(sub for sub in exploded_subdomains
-                   if new_js['action_map'].get(sub, {}).get('heuristicAction', "") == "cookieblock"):
-                cookieblocked = f"{C_YELLOW}❋{C_RESET}"
-            print(out.format(cookieblocked, y))
-
-no_longer_blocked = blocked_bases_old - blocked_bases_new
-if no_longer_blocked:
-    print(f"\n{C_RED}--{C_RESET} No longer blocked domains ({len(no_longer_blocked)}):\n")
-for base in sorted(no_longer_blocked):
-    if args.badger_only:
-        if base not in badger_only_old:
-            continue
-
-    otherlists = ""
-    if not args.badger_only:
-        otherlists = "    "
-        if base in adblocker.bases or base in ddg.bases or base in disconnect.bases or base in ghostery.bases:
-            otherlists = "".join((
-                "⊙" if base in adblocker.bases else " ",
-                f"{C_YELLOW}⊙{C_RESET}" if base in ddg.bases_unblocked else (
-                    "⊙" if base in ddg.bases else " "),
-                f"{C_YELLOW}⊙{C_RESET}" if base in disconnect.bases_unblocked else (
-                    "⊙" if base in disconnect.bases else " "),
-                f"{C_YELLOW}⊙{C_RESET}" if base in ghostery.bases_unblocked else (
-                    "⊙" if base in ghostery.bases else " ")))
-    out = f" {otherlists} {C_RED}{base}{C_RESET}"
-    if base in old_js['snitch_map']:
-        out = out + " on " + ", ".join(old_js['snitch_map'][base])
-    print(out)
-
-    subdomains = blocked_old[base]
-    if len(subdomains) > 1 or subdomains[0] != base:
-        for y in sorted(subdomains):
-            if y == base:
-                continue
-            out = "        • {}" if not args.badger_only else "    • {}"
-            if y in old_js['snitch_map']:
-                out = out + " on " + ", ".join(old_js['snitch_map'][y])
-            print(out.format(y))
+print_action_map_counts(old_js, new_js)
 
-flag_potential_mdfp_domains(new_js['snitch_map'])
+blocked_old = get_blocked(old_js)
+blocked_new = get_blocked(new_js, warn=True)
 
-list_unblocked_canvas_fingerprinters(new_js)
+print_diff(old_js, new_js, blocked_old, blocked_new)
 
-list_suspicious_site_domains(new_js['snitch_map'])
+run_linters(new_js)
 
 print("")
 